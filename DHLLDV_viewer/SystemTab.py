@@ -5,7 +5,8 @@ Added by R. Ramsdell 01 September, 2021
 """
 import copy
 
-from DHLLDV.PipeObj import Pipeline, Pipe, OperatingPointError
+from DHLLDV import Profiler
+from DHLLDV.PipeObj import Pipeline, Pipe, PipelineTemplate, OperatingPointError
 from DHLLDV.PumpObj import Pump
 from DHLLDV.SlurryObj import Slurry
 from bokeh.layouts import column, row
@@ -17,33 +18,41 @@ from ExamplePumps import Ladder_Pump, Main_Pump, Ladder_Pump600, Main_Pump500, b
 from unit_conv import unit_conv_US, unit_label_US, unit_conv_SI, unit_label_SI, convert_list
 
 # Example of how to handle ladder pump elevations
-# The ladder pump elev, and thus elev_change, varies with dig depth
-dig_elev = -10      # Depths are positive down, elevations are positive up
-ladder_length = 30
-ladder_pump_location = 10
-MP_elev = 1
-LP_elev = dig_elev + ladder_pump_location * (MP_elev - dig_elev) / ladder_length
-
-
-setups = {"CSD Example w/ Ladder Pump": Pipeline(name="CSD with Ladder Pump",
-                                                 pipe_list=[Pipe(name='Entrance', diameter=0.85, length=0,
-                                                                 total_K=0.5, elev_change=dig_elev),
-                                                            Pipe('LP Suction',
-                                                                 diameter=0.86,
-                                                                 length=ladder_pump_location,
-                                                                 total_K=0.1,
-                                                                 elev_change=LP_elev-dig_elev),
-                                                            copy.copy(Ladder_Pump),
-                                                            Pipe('LP Discharge',
-                                                                 diameter=0.86,
-                                                                 length=ladder_length - ladder_pump_location,
-                                                                 total_K=0.15,
-                                                                 elev_change=MP_elev-LP_elev),
-                                                            Pipe('Hull Suction', 0.86, 6.0, 0.1, 0.0),
-                                                            copy.copy(Main_Pump),
-                                                            Pipe('MP Discharge', 0.762, 20.0, 0.2, -1.0),
-                                                            Pipe('Discharge', 0.762, 2000.0, 1.0, 5.0)],
-                                                 slurry=base_slurry),
+# The ladder pump elev, and thus elev_change, varies with dig depth, update with csd_template.update(dig_elev=-15)
+ladder_params = {'dig_elev': -10,      # Depths are positive down, elevations are positive up
+                 'ladder_length': 30,
+                 'ladder_pump_location': 10,
+                 'MP_elev': 1}
+
+
+def LP_elev(dig_elev, ladder_length, ladder_pump_location, MP_elev):
+    """The elevation of the ladder pump"""
+    return dig_elev + ladder_pump_location * (MP_elev - dig_elev) / ladder_length
+
+
+csd_template = PipelineTemplate(Pipeline(name="CSD with Ladder Pump",
+                                         pipe_list=[Pipe(name='Entrance', diameter=0.85, length=0, total_K=0.5),
+                                                    Pipe('LP Suction', diameter=0.86, total_K=0.1),
+                                                    copy.copy(Ladder_Pump),
+                                                    Pipe('LP Discharge', diameter=0.86, total_K=0.15),
+                                                    Pipe('Hull Suction', 0.86, 6.0, 0.1, 0.0),
+                                                    copy.copy(Main_Pump),
+                                                    Pipe('MP Discharge', 0.762, 20.0, 0.2, -1.0),
+                                                    Pipe('Discharge', 0.762, 2000.0, 1.0, 5.0)],
+                                         slurry=base_slurry),
+                                ladder_params,
+                                {(0, 'elev_change'): lambda dig_elev: dig_elev,
+                                 (1, 'length'): lambda ladder_pump_location: ladder_pump_location,
+                                 (1, 'elev_change'):
+                                     lambda dig_elev, ladder_length, ladder_pump_location, MP_elev:
+                                     LP_elev(dig_elev, ladder_length, ladder_pump_location, MP_elev) - dig_elev,
+                                 (3, 'length'):
+                                     lambda ladder_length, ladder_pump_location: ladder_length - ladder_pump_location,
+                                 (3, 'elev_change'):
+                                     lambda dig_elev, ladder_length, ladder_pump_location, MP_elev:
+                                     MP_elev - LP_elev(dig_elev, ladder_length, ladder_pump_location, MP_elev)})
+
+setups = {"CSD Example w/ Ladder Pump": csd_template.pipeline,
           "Test Pipeline": Pipeline(name="test pipeline",
                                     pipe_list=[Pipe('Entrance', 0.6, 0, 0.5, -4.0),
                                                Pipe(diameter=0.6, length=10.0, total_K=0.1, elev_change=5.0),
@@ -113,7 +122,7 @@ def system_panel(PL):
     pipeline = PL
 
     flow_list = [pipeline.pipesections[-1].flow(v) for v in pipeline.slurry.vls_list]
-    head_lists = list(zip(*[pipeline.calc_system_head(Q) for Q in flow_list]))
+    head_lists = pipeline.system_curve(flow_list)
     im_source = ColumnDataSource(data=dict(Q=convert_list(unit_convs['flow'], flow_list),
                                            v=convert_list(unit_convs['len'], pipeline.slurry.vls_list),
                                            im=convert_list(unit_convs['len'], head_lists[0]),
@@ -179,12 +188,13 @@ def system_panel(PL):
     HQ_plot.axis.minor_tick_out = 0
     HQ_plot.legend.location = "top_left"
 
+    @Profiler.traced
     def update_all(pipeline):
-        """Update the data sources and information boxes"""
+        """Update the data sources and information boxes, see Profiler.traced to trace an update"""
         pipeline.update_slurries()
         this_pipe = Pipe(diameter=pipeline.slurry.Dp)
         flow_list = [this_pipe.flow(v) for v in pipeline.slurry.vls_list]
-        head_lists = list(zip(*[pipeline.calc_system_head(Q) for Q in flow_list]))
+        head_lists = pipeline.system_curve(flow_list)
         im_source.data = dict(Q=convert_list(unit_convs['flow'], flow_list),
                               v=convert_list(unit_convs['len'], pipeline.slurry.vls_list),
                               im=convert_list(unit_convs['len'], head_lists[0]),
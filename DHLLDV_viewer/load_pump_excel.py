@@ -362,7 +362,7 @@ if __name__ == "__main__":
     for i, pl in enumerate([pipeline]):
         s = pl.slurry
         sp_num = (len(pl.pumps)+1)*100 + 10 + (i + 1)
-        head_lists = list(zip(*[pl.calc_system_head(Q) for Q in flow_list]))
+        head_lists = pl.system_curve(flow_list)
 
         HQ_title = f'{pl.name}: length = {pl.total_length:0.0f} Dp={s.Dp*1000:0.0f}mm, d50={s.D50*1000:0.2f}mm, ' \
                    f'Rsd={s.Rsd:0.3f}, Cv={s.Cv:0.3f}, rhom={s.rhom:0.3f}'
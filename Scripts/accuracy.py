@@ -0,0 +1,127 @@
+"""
+accuracy - Measure the accuracy lost and the time saved by the SolverSettings presets
+
+Each quantity is a function that returns an array of results of the iterative solvers. It is calculated with
+each preset (the lru_caches and the Pipeline memo cleared first, so each run is cold) and compared to the
+'reference' preset. The accuracy loss is the largest relative difference from the reference results.
+
+Usage (from the repository root, with src and . on the path):
+    python Scripts/accuracy.py [quantity patterns] [--presets interactive default] [--json out.json]
+"""
+import argparse
+import fnmatch
+import json
+from time import perf_counter
+
+import numpy as np
+
+from DHLLDV import DHLLDV_framework, SolverSettings, stratified
+from DHLLDV.SlurryObj import Slurry
+from Wilson import Wilson_V50
+
+from benchmark import base_pipeline, Dp, d, epsilon, nu, rhol, rhos, Cv, Cv_list
+
+quantities = {}
+
+
+def quantity(func):
+    """Decorator to register a quantity under its function name"""
+    quantities[func.__name__] = func
+    return func
+
+
+@quantity
+def LDV():
+    return [DHLLDV_framework.LDV(None, Dp, d, epsilon, nu, rhol, rhos, c) for c in Cv_list]
+
+
+@quantity
+def vls_FBSB():
+    return [stratified.vls_FBSB(Dp, d, epsilon, nu, rhol, rhos, c) for c in Cv_list]
+
+
+@quantity
+def V50():
+    return [Wilson_V50.V50(Dp, dx, 2*dx, epsilon, nu, rhol, rhos) for dx in np.linspace(0.1, 2.0, 20)/1000]
+
+
+@quantity
+def Cvt_im_curve():
+    s = Slurry(Dp=Dp, D50=d, Cv=Cv)
+    return s.im_curves['Cvt_im']
+
+
+@quantity
+def operating_point():
+    pipeline = base_pipeline()
+    return [pipeline.find_operating_point(pipeline.flow_list)]
+
+
+@quantity
+def pump_limited_speed():
+    pump = base_pipeline().pumps[-1]
+    flows = np.linspace(0.5, 1.5, 11) * max(pump.design_QH_curve) / 2
+    return [pump.find_power_limited_speed(Q) for Q in flows] + [pump.find_torque_limited_speed(Q) for Q in flows]
+
+
+def calculate(name, settings):
+    """Calculate a quantity with the settings, cold
+
+    returns (the results as an array, the time (sec))"""
+    DHLLDV_framework.clear_caches()
+    with DHLLDV_framework.solver_settings(settings):
+        start = perf_counter()
+        result = np.asarray(quantities[name](), dtype=float)
+        return result, perf_counter() - start
+
+
+def accuracy_loss(names, presets=('interactive', 'default'), verbose=True):
+    """Compare the quantities calculated with the presets to the 'reference' preset
+
+    names: the quantity names
+    presets: the preset names (or Settings) to compare
+    returns a dict {quantity name: {preset: {'max_rel_error': the largest relative difference from the reference,
+                                             'time': sec, 'speedup': the reference time / time}}}"""
+    results = {}
+    for name in names:
+        reference, reference_time = calculate(name, 'reference')
+        results[name] = {}
+        for preset in presets:
+            result, elapsed = calculate(name, preset)
+            error = np.abs(result - reference) / np.maximum(np.abs(reference), np.finfo(float).tiny)
+            results[name][str(preset)] = {'max_rel_error': float(np.nanmax(error)),
+                                          'time': elapsed,
+                                          'speedup': reference_time / elapsed if elapsed > 0 else float('inf')}
+            if verbose:
+                r = results[name][str(preset)]
+                label = preset if isinstance(preset, str) else 'custom'
+                print(f'{name:20s} {label:12s} max rel error {r["max_rel_error"]:10.3e}   '
+                      f'{r["time"]*1000:10.3f} ms   x{r["speedup"]:6.2f}')
+    return results
+
+
+def select(patterns):
+    """Return the quantity names matching any of the patterns (fnmatch style), in registered order"""
+    if not patterns:
+        return list(quantities)
+    names = [n for n in quantities if any(fnmatch.fnmatch(n, p) for p in patterns)]
+    if not names:
+        raise ValueError(f'accuracy: No quantities match {patterns}, use from {list(quantities)}')
+    return names
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the accuracy loss of the solver presets')
+    parser.add_argument('patterns', nargs='*', help='quantity names or patterns, default all')
+    parser.add_argument('--presets', nargs='+', default=['interactive', 'default'],
+                        help='presets to compare to the reference preset')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    for preset in args.presets:
+        SolverSettings.resolve(preset)
+    results = accuracy_loss(select(args.patterns), args.presets)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'presets': {p: vars(SolverSettings.presets[p]) for p in ['reference'] + args.presets},
+                       'results': results}, f, indent=2)
@@ -0,0 +1,263 @@
+"""
+benchmark - Time the hot paths of the DHLLDV framework, Slurry, Pipeline and Pump objects
+
+Each scenario is a function that does its setup and returns a function to time. Scenarios are timed:
+    cold: the framework lru_caches cleared and the scenario set up again before every run
+    warm: the scenario set up once and run once before timing, so the caches and memos are full
+The results can be written to a JSON file, and compared to a baseline JSON file from an earlier run.
+
+Usage (from the repository root, with src and . on the path):
+    python Scripts/benchmark.py --list
+    python Scripts/benchmark.py [scenario patterns] [--repeat 5] [--json out.json]
+                                [--baseline baseline.json --threshold 0.25]
+Returns exit code 1 if any scenario is slower than the baseline by more than the threshold.
+
+time_ERHG_graded.py is the slurry_D50_sweep scenario with a cProfile of one run.
+"""
+import argparse
+from copy import deepcopy
+from datetime import datetime
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+import openpyxl
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, stratified
+from DHLLDV.SlurryObj import Slurry
+from DHLLDV_viewer import load_pump_excel, store_pump_excel
+
+excel_fname = os.path.join(os.path.dirname(__file__), '..', 'tests', 'Example_excel_input.xlsx')
+
+# The sand for the framework scenarios
+Dp = 0.762
+d = 0.5/1000
+epsilon = DHLLDV_constants.steel_roughness
+nu = DHLLDV_constants.water_viscosity[20]
+rhol = DHLLDV_constants.water_density[20]
+rhos = 2.65
+Cv = 0.175
+GSD = {0.15: d/2, 0.50: d, 0.85: d*2}
+vls_list = [(i+1)/10. for i in range(100)]
+Cv_list = [(i+1)/100. for i in range(40)]
+
+scenarios = {}
+
+
+def scenario(func):
+    """Decorator to register a scenario under its function name"""
+    scenarios[func.__name__] = func
+    return func
+
+
+def load_pipeline():
+    """Return the pipeline from the example Excel input"""
+    wb = openpyxl.load_workbook(filename=excel_fname, data_only=True)
+    return load_pump_excel.load_pipeline_from_workbook(wb)
+
+
+_base_pipeline = None
+
+
+def base_pipeline():
+    """Return a copy of the example pipeline with an empty memo, the workbook is only loaded once"""
+    global _base_pipeline
+    if _base_pipeline is None:
+        _base_pipeline = load_pipeline()
+    pipeline = deepcopy(_base_pipeline)
+    pipeline._memo.clear()
+    return pipeline
+
+
+@scenario
+def Cvs_Erhg():
+    return lambda: [DHLLDV_framework.Cvs_Erhg(v, Dp, d, epsilon, nu, rhol, rhos, Cv) for v in vls_list]
+
+
+@scenario
+def Cvt_Erhg():
+    return lambda: [DHLLDV_framework.Cvt_Erhg(v, Dp, d, epsilon, nu, rhol, rhos, Cv) for v in vls_list]
+
+
+@scenario
+def LDV():
+    return lambda: [DHLLDV_framework.LDV(None, Dp, d, epsilon, nu, rhol, rhos, c) for c in Cv_list]
+
+
+@scenario
+def vls_FBSB():
+    return lambda: [stratified.vls_FBSB(Dp, d, epsilon, nu, rhol, rhos, c) for c in Cv_list]
+
+
+@scenario
+def Erhg_graded():
+    return lambda: [DHLLDV_framework.Erhg_graded(GSD, v, Dp, epsilon, nu, rhol, rhos, Cv) for v in vls_list]
+
+
+@scenario
+def generate_curves():
+    s = Slurry()
+    return s.generate_curves
+
+
+@scenario
+def slurry_D50_sweep():
+    """The example from time_ERHG_graded.py"""
+    s = Slurry()
+
+    def run():
+        out_head = []
+        for D50 in [0.9, 0.8, 0.7, 0.6, 0.5, 0.4]:
+            s.D50 = D50
+            out_head.append(s.im_curves['graded_Cvt_im'][42])
+        return out_head
+    return run
+
+
+@scenario
+def calc_system_head():
+    pipeline = base_pipeline()
+    return lambda: [pipeline.calc_system_head(Q) for Q in pipeline.flow_list]
+
+
+@scenario
+def find_operating_point():
+    pipeline = base_pipeline()
+    return lambda: pipeline.find_operating_point(pipeline.flow_list)
+
+
+@scenario
+def hydraulic_gradient():
+    pipeline = base_pipeline()
+    Q = pipeline.pipesections[-1].flow(5.0)
+    return lambda: pipeline.hydraulic_gradient(Q)
+
+
+def pump_point(limited):
+    """Return a scenario function for Pump.point with the given limit mode"""
+    def setup():
+        pump = base_pipeline().pumps[-1]
+        pump.limited = limited
+        flows = np.linspace(0.5, 1.5, 21) * max(pump.design_QH_curve) / 2
+        return lambda: [pump.point(Q) for Q in flows]
+    setup.__name__ = f'Pump_point_{limited}'
+    return setup
+
+
+for mode in ('none', 'torque', 'power', 'curve'):
+    scenario(pump_point(mode))
+
+
+@scenario
+def excel_load():
+    return load_pipeline
+
+
+@scenario
+def excel_store():
+    pipeline = base_pipeline()
+    path = tempfile.mkdtemp()
+
+    def run():
+        fname = store_pump_excel.store_to_excel(pipeline, path=path)
+        os.remove(fname)
+    return run
+
+
+def time_scenario(name, repeat=5, number=1):
+    """Time a scenario cold and warm
+
+    name: the scenario name
+    repeat: the number of timings to take of each
+    number: the number of runs in each warm timing
+    returns a dict {'cold': the least cold time (sec),
+                    'warm': the least warm time per run (sec)}"""
+    setup = scenarios[name]
+    cold = []
+    for _ in range(repeat):
+        DHLLDV_framework.clear_caches()
+        run = setup()
+        cold.append(timeit.timeit(run, number=1))
+    run = setup()
+    run()
+    warm = [t / number for t in timeit.repeat(run, number=number, repeat=repeat)]
+    return {'cold': min(cold), 'warm': min(warm)}
+
+
+def run_suite(names, repeat=5, number=1, verbose=True):
+    """Time the named scenarios and return the results, see time_scenario
+
+    returns a dict {'meta': the python, numpy and platform versions and the date,
+                    'results': {scenario name: {'cold': sec, 'warm': sec}}}"""
+    results = {}
+    for name in names:
+        results[name] = time_scenario(name, repeat, number)
+        if verbose:
+            print(f'{name:24s} cold {results[name]["cold"]*1000:10.3f} ms   warm {results[name]["warm"]*1000:10.3f} ms')
+    return {'meta': {'python': sys.version.split()[0],
+                     'numpy': np.__version__,
+                     'platform': platform.platform(),
+                     'date': datetime.now().isoformat(timespec='seconds'),
+                     'repeat': repeat,
+                     'number': number},
+            'results': results}
+
+
+def compare_to_baseline(suite, baseline, threshold=0.25):
+    """Compare the suite results to a baseline
+
+    suite: the results of run_suite
+    baseline: the results of an earlier run_suite, such as from a JSON file
+    threshold: the allowable slowdown, as a fraction of the baseline time
+    returns a list of (scenario name, 'cold' or 'warm', ratio of the time to the baseline) for the regressions"""
+    regressions = []
+    for name, times in suite['results'].items():
+        base_times = baseline['results'].get(name)
+        if base_times is None:
+            continue
+        for run in ('cold', 'warm'):
+            ratio = times[run] / base_times[run] if base_times[run] > 0 else 1.0
+            if ratio > 1 + threshold:
+                regressions.append((name, run, ratio))
+    return regressions
+
+
+def select(patterns):
+    """Return the scenario names matching any of the patterns (fnmatch style), in registered order"""
+    if not patterns:
+        return list(scenarios)
+    names = [n for n in scenarios if any(fnmatch.fnmatch(n, p) for p in patterns)]
+    if not names:
+        raise ValueError(f'benchmark: No scenarios match {patterns}, use from {list(scenarios)}')
+    return names
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the hot paths of DHLLDV')
+    parser.add_argument('patterns', nargs='*', help='scenario names or patterns, default all')
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timings of each scenario')
+    parser.add_argument('--number', type=int, default=1, help='number of runs in each warm timing')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results to this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowable slowdown from the baseline')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(scenarios))
+        sys.exit(0)
+    suite = run_suite(select(args.patterns), args.repeat, args.number)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(suite, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(suite, json.load(f), args.threshold)
+        for name, run, ratio in regressions:
+            print(f'REGRESSION {name} {run}: {ratio:0.2f} times the baseline')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,61 @@
+"""compile_WACS_Hr.py - Compile the WACS pump head reduction tables to src/DHLLDV/WACS_Hr_tables.py
+
+Reads the Hr15 (head reduction at Cv = 0.15) grids from src/Wilson/WACS2_Hr.xlsx (Figure 9.10 of WACS2) and
+src/Wilson/WACS3_Hr.xlsx (the logistic fits to Figure 10.9 of WACS3), and writes them as tuples so openpyxl
+is not needed at runtime. Run from the repository root after changing the workbooks.
+"""
+import os.path
+
+import openpyxl
+
+WACS2_file = os.path.join('src', 'Wilson', 'WACS2_Hr.xlsx')
+WACS3_file = os.path.join('src', 'Wilson', 'WACS3_Hr.xlsx')
+out_file = os.path.join('src', 'DHLLDV', 'WACS_Hr_tables.py')
+
+
+def rounded(x):
+    """Round to 6 significant figures, more than the figures were read to"""
+    return float(f'{x:.6g}')
+
+
+def read_grid(ws, header_row, first_row, last_row, dpart_col, first_col, last_col):
+    """Read a grid of Hr15 with particle size (mm) rows and impeller diameter (m) columns
+
+    Rows and columns are 1-based as in openpyxl, returns (dpart, dimp, Hr15) sorted on dpart and dimp"""
+    dimp = [ws.cell(header_row, c).value for c in range(first_col, last_col + 1)]
+    rows = []
+    for r in range(first_row, last_row + 1):
+        rows.append((ws.cell(r, dpart_col).value, [ws.cell(r, c).value for c in range(first_col, last_col + 1)]))
+    rows.sort()
+    order = sorted(range(len(dimp)), key=lambda i: dimp[i])
+    return (tuple(rounded(d) for d, _ in rows),
+            tuple(rounded(dimp[i]) for i in order),
+            tuple(tuple(rounded(hr[i]) for i in order) for _, hr in rows))
+
+
+def format_table(name, description, dpart, dimp, Hr15):
+    """Return the python source for one table"""
+    lines = [f'# {description}',
+             f'{name} = {{',
+             f"    'dpart': {dpart!r},",
+             f"    'dimp': {dimp!r},",
+             "    'Hr15': ("]
+    lines.extend(f'        {row!r},' for row in Hr15)
+    lines.extend(['    ),', '}', ''])
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    wb2 = openpyxl.load_workbook(WACS2_file, data_only=True)
+    WACS2 = read_grid(wb2['Small New Pumps'], 30, 31, 37, 2, 4, 9)
+    wb3 = openpyxl.load_workbook(WACS3_file, data_only=True)
+    WACS3 = read_grid(wb3['Fig 10.9 fixed params'], 30, 36, 53, 2, 3, 10)
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write('"""WACS_Hr_tables: Pump head reduction grids, Hr at Cv = 0.15\n\n'
+                'Generated from src/Wilson/WACS2_Hr.xlsx and WACS3_Hr.xlsx by Scripts/compile_WACS_Hr.py, '
+                'do not edit.\n'
+                'dpart: particle diameter in mm, dimp: impeller diameter in m, Hr15[dpart][dimp]\n"""\n\n')
+        f.write(format_table('WACS2', 'Figure 9.10 of WACS2, small new pumps', *WACS2))
+        f.write('\n')
+        f.write(format_table('WACS3', 'Logistic fits to Figure 10.9 of WACS3', *WACS3))
+    print(f'Wrote {out_file}')
@@ -0,0 +1,189 @@
+"""
+scaling - Measure how the cost of the main calculations grows with the size of the problem
+
+Each dimension sweeps one size and times a calculation at each size. By default the calculation is run once
+before timing, so the framework lru_caches hold the terms that do not depend on the size and the timing shows
+the growth. With --cold the caches are cleared before each timing. The Pipeline memo is always cleared.
+
+The empirical complexity exponent k is fit to time = c * size**k by least squares on the log-log points, so a
+linear path has k near 1 and a quadratic path (such as hydraulic_gradient over the pipe sections) k near 2.
+
+Usage (from the repository root, with src and . on the path):
+    python Scripts/scaling.py [dimension patterns] [--repeat 3] [--cold] [--json out.json] [--plot scaling.png]
+"""
+import argparse
+from dataclasses import replace
+import fnmatch
+import json
+import sys
+import timeit
+
+import numpy as np
+
+from DHLLDV import DHLLDV_framework
+from DHLLDV.PipeObj import Pipe, Pipeline
+from DHLLDV.PipelineDesign import DesignCandidate, build_candidate
+from DHLLDV.SlurryObj import Slurry
+
+from benchmark import base_pipeline, GSD, Dp, epsilon, nu, rhol, rhos, Cv
+
+try:
+    import matplotlib.pyplot as plt
+except ImportError:
+    print('matplotlib not found')
+    plt = None
+
+dimensions = {}
+
+
+def dimension(name, sizes):
+    """Decorator to register a dimension, the function takes a size and returns a function to time"""
+    def register(func):
+        dimensions[name] = (sizes, func)
+        return func
+    return register
+
+
+def with_curves(pipeline):
+    """Generate the slurry curves of the pipeline, so the timing does not include this fixed cost"""
+    for s in pipeline.slurries.values():
+        s.generate_curves()
+    return pipeline
+
+
+def split_discharge(pipeline, num_sections):
+    """Return a copy of the pipeline with the discharge pipe split into num_sections equal pipes"""
+    last = pipeline.pipesections[-1]
+    pieces = [replace(last, name=f'{last.name} {i + 1}', length=last.length / num_sections,
+                      total_K=last.total_K / num_sections, elev_change=last.elev_change / num_sections)
+              for i in range(num_sections)]
+    return with_curves(Pipeline(name=pipeline.name, pipe_list=pipeline.pipesections[:-1] + pieces,
+                                slurry=pipeline.slurry))
+
+
+@dimension('hydraulic_gradient_sections', [2, 4, 8, 16, 32, 64])
+def hydraulic_gradient_sections(num_sections):
+    pipeline = split_discharge(base_pipeline(), num_sections)
+    Q = pipeline.pipesections[-1].flow(5.0)
+
+    def run():
+        pipeline._memo.clear()
+        return pipeline.hydraulic_gradient(Q)
+    return run
+
+
+@dimension('system_head_sections', [2, 4, 8, 16, 32, 64])
+def system_head_sections(num_sections):
+    pipeline = split_discharge(base_pipeline(), num_sections)
+    flow_list = pipeline.flow_list
+    return lambda: [pipeline.calc_system_head(Q) for Q in flow_list]
+
+
+@dimension('system_curve_pumps', [1, 2, 4, 8, 16])
+def system_curve_pumps(num_boosters):
+    base = base_pipeline()
+    booster = base.pumps[-1]
+    pipeline = with_curves(build_candidate(base, DesignCandidate(base.pipesections[-1].diameter,
+                                                                 num_boosters=num_boosters), booster))
+    flow_list = [Pipe(diameter=pipeline.slurry.Dp).flow(v) for v in pipeline.slurry.vls_list]
+
+    def run():
+        pipeline._memo.clear()
+        return pipeline.system_curve(flow_list)
+    return run
+
+
+@dimension('slurry_vls_points', [10, 20, 40, 80, 160])
+def slurry_vls_points(num_points):
+    s = Slurry(min_index=9, max_index=9 + num_points)
+    return s.generate_curves
+
+
+@dimension('Erhg_graded_fracs', [5, 10, 20, 40, 80])
+def Erhg_graded_fracs(num_fracs):
+    return lambda: [DHLLDV_framework.Erhg_graded(GSD, v, Dp, epsilon, nu, rhol, rhos, Cv, num_fracs=num_fracs)
+                    for v in (2.0, 4.0, 6.0, 8.0)]
+
+
+@dimension('LDV_curves_Cv_points', [6, 12, 24, 48])
+def LDV_curves_Cv_points(cv_points):
+    s = Slurry()
+    d = s.get_dx(0.5)
+    return lambda: s.generate_LDV_curves(d, cv_points=cv_points)
+
+
+def fit_exponent(sizes, times):
+    """Fit time = c * size**k, return (k, c)"""
+    k, log_c = np.polyfit(np.log(sizes), np.log(times), 1)
+    return float(k), float(np.exp(log_c))
+
+
+def measure(name, repeat=3, cold=False):
+    """Time a dimension at each of its sizes
+
+    cold: if True clear the framework lru_caches before each timing, else run once before timing
+
+    returns a dict {'sizes': list of sizes, 'times': list of the least time (sec) at each size,
+                    'exponent': the fitted k, 'coefficient': the fitted c}"""
+    sizes, setup = dimensions[name]
+    times = []
+    for size in sizes:
+        best = float('inf')
+        for _ in range(repeat):
+            DHLLDV_framework.clear_caches()
+            run = setup(size)
+            if cold:
+                DHLLDV_framework.clear_caches()
+            else:
+                run()
+            best = min(best, timeit.timeit(run, number=1))
+        times.append(best)
+    k, c = fit_exponent(sizes, times)
+    return {'sizes': list(sizes), 'times': times, 'exponent': k, 'coefficient': c}
+
+
+def print_table(results):
+    """Print a table of the times and exponents"""
+    for name, r in results.items():
+        print(f'{name}: k = {r["exponent"]:0.2f}')
+        for size, t in zip(r['sizes'], r['times']):
+            print(f'    {size:6d} {t * 1000:12.3f} ms')
+
+
+def plot(results, fname):
+    """Plot the times against the sizes on log-log axes with the fitted lines, and save to fname"""
+    fig, axes = plt.subplots(len(results), 1, figsize=(8, 3 * len(results)), squeeze=False)
+    for ax, (name, r) in zip(axes[:, 0], results.items()):
+        sizes = np.array(r['sizes'])
+        ax.loglog(sizes, r['times'], marker='o', linestyle='none', label='measured')
+        ax.loglog(sizes, r['coefficient'] * sizes**r['exponent'], linestyle='--',
+                  label=f'fit k={r["exponent"]:0.2f}')
+        ax.set_title(name)
+        ax.set_xlabel('size')
+        ax.set_ylabel('time (sec)')
+        ax.grid(True, which='both')
+        ax.legend()
+    fig.tight_layout()
+    fig.savefig(fname)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure how the DHLLDV calculations scale with problem size')
+    parser.add_argument('patterns', nargs='*', help='dimension names or patterns, default all')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timings at each size')
+    parser.add_argument('--cold', action='store_true', help='clear the caches before each timing')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--plot', help='save a plot of the results to this file, needs matplotlib')
+    args = parser.parse_args()
+
+    names = [n for n in dimensions if not args.patterns or any(fnmatch.fnmatch(n, p) for p in args.patterns)]
+    if not names:
+        print(f'scaling: No dimensions match {args.patterns}, use from {list(dimensions)}')
+        sys.exit(1)
+    results = {name: measure(name, args.repeat, args.cold) for name in names}
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.plot and plt:
+        plot(results, args.plot)
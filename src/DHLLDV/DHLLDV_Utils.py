@@ -6,6 +6,11 @@ Created on Oct 23, 2014
 @author: RCRamsdell
 """
 import bisect
+import hashlib
+
+import numpy as np
+from numpy.polynomial import Polynomial
+from scipy.interpolate import PchipInterpolator
 
 
 class interpDict(dict):
@@ -25,12 +30,14 @@ class interpDict(dict):
         self.extrapolate_low = kwargs.setdefault('extrapolate_low', False)
         self.extrapolate_high = kwargs.setdefault('extrapolate_high', False)
         self.tolerance = kwargs.setdefault('tolerance', 0.001)
+        self._keys = None
+        self._arrays = None
 
     def __getitem__(self, key):
         try:
             val = dict.__getitem__(self, key)
         except KeyError:
-            keys = sorted(self.keys())
+            keys = self.sorted_keys
             index = bisect.bisect(keys, key)
             if index and index != len(keys):
                 x1 = keys[index-1]
@@ -38,22 +45,173 @@ class interpDict(dict):
                 y1 = dict.__getitem__(self, x1)
                 y2 = dict.__getitem__(self, x2)
                 val = ((y2-y1)/(x2-x1))*(key-x1)+y1
-            elif index == len(keys) and (self.extrapolate_high or key <= max(keys)*(1+self.tolerance)):
+            elif index == len(keys) and (self.extrapolate_high or key <= keys[-1]*(1+self.tolerance)):
                 x1 = keys[-2]
                 x2 = keys[-1]
                 y1 = dict.__getitem__(self, x1)
                 y2 = dict.__getitem__(self, x2)
                 val = ((y2 - y1) / (x2 - x1)) * (key - x1) + y1
-            elif index == 0 and (self.extrapolate_low or key >= min(keys)*(1-self.tolerance)):
+            elif index == 0 and (self.extrapolate_low or key >= keys[0]*(1-self.tolerance)):
                 x1 = keys[0]
                 x2 = keys[1]
                 y1 = dict.__getitem__(self, x1)
                 y2 = dict.__getitem__(self, x2)
                 val = ((y2 - y1) / (x2 - x1)) * (key - x1) + y1
             else:
-                bounds = f"{min(keys)} - {max(keys)}"
+                bounds = f"{keys[0]} - {keys[-1]}"
                 raise IndexError(f"Key {key} out of range ({bounds})")
         return val
 
     def __setitem__(self, key, val):
         raise KeyError("interpDict is read-only")
+
+    def __reduce__(self):
+        """Rebuild through __init__ when pickled or copied, as __setitem__ is not available"""
+        return _rebuild_curve, (self.__class__, dict(self), self.settings())
+
+    def settings(self):
+        """Return the keyword arguments to build a curve with the same settings"""
+        return {'extrapolate_low': self.extrapolate_low,
+                'extrapolate_high': self.extrapolate_high,
+                'tolerance': self.tolerance}
+
+    def fingerprint(self):
+        """Return a stable hash of the points and settings, see fingerprint
+
+        The hash of the points is built on first use and reused, the dict is read-only"""
+        if getattr(self, '_points_fingerprint', None) is None:
+            self._points_fingerprint = fingerprint(self.__class__.__name__, tuple(sorted(self.items())))
+        return fingerprint(self._points_fingerprint, tuple(self.settings().items()))
+
+    @property
+    def sorted_keys(self):
+        """The keys sorted low to high, built on first use and reused, the dict is read-only"""
+        if getattr(self, '_keys', None) is None:
+            self._keys = sorted(self.keys())
+        return self._keys
+
+    def as_arrays(self):
+        """Return the keys and values as numpy arrays (x, f(x)), sorted on x low to high
+
+        The arrays are built on the first call and reused, the dict is read-only"""
+        if getattr(self, '_arrays', None) is None:
+            keys = self.sorted_keys
+            self._arrays = (np.array(keys, dtype=float),
+                            np.array([dict.__getitem__(self, k) for k in keys], dtype=float))
+        return self._arrays
+
+    def interp(self, x):
+        """Vectorized version of __getitem__, interpolate (or extrapolate) f(x) for an array of x
+
+        Follows the same extrapolate_low, extrapolate_high and tolerance rules as __getitem__
+        x: float or array-like of floats
+        returns a numpy array the same shape as x"""
+        xs, ys = self.as_arrays()
+        x = self.check_range(x)
+        index = np.clip(np.searchsorted(xs, x, side='right'), 1, len(xs)-1)
+        x1 = xs[index-1]
+        x2 = xs[index]
+        y1 = ys[index-1]
+        y2 = ys[index]
+        return ((y2-y1)/(x2-x1))*(x-x1)+y1
+
+    def derivative(self, x):
+        """Return the slope df/dx at x (float or array-like), the slope of the segment containing x"""
+        xs, ys = self.as_arrays()
+        x = self.check_range(x)
+        index = np.clip(np.searchsorted(xs, x, side='right'), 1, len(xs)-1)
+        return (ys[index]-ys[index-1])/(xs[index]-xs[index-1])
+
+    def check_range(self, x):
+        """Raise an IndexError if any x is out of range per the extrapolate_low, extrapolate_high and tolerance rules
+
+        returns x as a numpy array"""
+        xs, ys = self.as_arrays()
+        x = np.asarray(x, dtype=float)
+        too_low = np.zeros(x.shape, dtype=bool) if self.extrapolate_low else x < xs[0]*(1-self.tolerance)
+        too_high = np.zeros(x.shape, dtype=bool) if self.extrapolate_high else x > xs[-1]*(1+self.tolerance)
+        if too_low.any() or too_high.any():
+            bad = x[too_low | too_high].flat[0]
+            raise IndexError(f"Key {bad} out of range ({xs[0]} - {xs[-1]})")
+        return x
+
+    def scaled(self, x_ratio, y_ratio):
+        """Return a new interpDict of the same type and settings with the keys and values scaled
+
+        x_ratio multiplies the keys, y_ratio multiplies the values"""
+        return interpDict({x*x_ratio: y*y_ratio for x, y in self.items()}, **self.settings())
+
+
+class smoothCurve(interpDict):
+    """
+    smoothCurve: An interpDict that uses a smooth fit to its points, with an analytic derivative.
+
+    fit: 'pchip' for a monotone piecewise cubic through the points (scipy.interpolate.PchipInterpolator), or
+         'poly' for a least-squares polynomial of the given degree
+    degree: The degree of the 'poly' fit (default=3)
+    Outside the range of the points the curve is extended linearly along the end slopes, the extrapolate_low,
+    extrapolate_high and tolerance rules are the same as for the interpDict.
+    """
+    def __init__(self, *args, fit='pchip', degree=3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fit = fit
+        self.degree = degree
+        xs, ys = self.as_arrays()
+        if fit == 'pchip':
+            self._f = PchipInterpolator(xs, ys, extrapolate=True)
+            self._dfdx = self._f.derivative()
+        elif fit == 'poly':
+            self._f = Polynomial.fit(xs, ys, degree)
+            self._dfdx = self._f.deriv()
+        else:
+            raise ValueError(f"Unknown curve fit '{fit}', use 'pchip' or 'poly'")
+
+    def __getitem__(self, key):
+        return float(self.interp(key))
+
+    def interp(self, x):
+        """Evaluate the fit at x (float or array-like), returns a numpy array the same shape as x"""
+        xs, ys = self.as_arrays()
+        x = self.check_range(x)
+        x_in = np.clip(x, xs[0], xs[-1])
+        return self._f(x_in) + self._dfdx(x_in)*(x - x_in)
+
+    def settings(self):
+        """Return the keyword arguments to build a curve with the same fit and settings"""
+        return dict(super().settings(), fit=self.fit, degree=self.degree)
+
+    def derivative(self, x):
+        """Return the analytic slope df/dx at x (float or array-like)"""
+        xs, ys = self.as_arrays()
+        return self._dfdx(np.clip(self.check_range(x), xs[0], xs[-1]))
+
+    def scaled(self, x_ratio, y_ratio):
+        """Return a new smoothCurve with the same fit and settings with the keys and values scaled
+
+        x_ratio multiplies the keys, y_ratio multiplies the values"""
+        return smoothCurve({x*x_ratio: y*y_ratio for x, y in self.items()}, **self.settings())
+
+
+def _rebuild_curve(cls, points, settings):
+    """Rebuild a pickled or copied interpDict or smoothCurve"""
+    return cls(points, **settings)
+
+
+def _fingerprint_value(value):
+    """Return the value with numpy arrays replaced by a hash of their content, whose repr is abbreviated"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return 'ndarray', value.shape, _fingerprint_value(value.tolist())
+        return 'ndarray', value.dtype.str, value.shape, hashlib.blake2b(np.ascontiguousarray(value).tobytes(),
+                                                                       digest_size=16).hexdigest()
+    if isinstance(value, (tuple, list)):
+        return type(value)(_fingerprint_value(v) for v in value)
+    return value
+
+
+def fingerprint(*values):
+    """Return a stable hash (hex string) of the values, to key memos on the content of an object
+
+    The values should be numbers, strings, None, numpy arrays or tuples and lists of them, whose repr is the same
+    from run to run. Arrays are hashed by their dtype, shape and content."""
+    return hashlib.blake2b(repr(_fingerprint_value(values)).encode(), digest_size=16).hexdigest()
@@ -7,17 +7,22 @@ Created on Mar 3, 2015
 from . import stratified
 from . import heterogeneous
 from . import homogeneous
+from . import DHLLDV_constants
+from . import ModelOptions
+from . import SolverSettings
+from . import SolverTelemetry
 from .DHLLDV_constants import gravity, particle_ratio, stk_fine
 from math import pi, exp, log10
-import functools
+import contextlib
+import dataclasses
+import sys
+import types
+import warnings
 
-alpha_xi = 0.5    # alpha in Eqn 8.12-9
+import numpy as np
 
-use_sf = True        # use these corrections by default, but can be overridden
-use_sqrtcx = True
 
-
-def Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=False):
+def Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=False, options=None):
     """
     Cvs_Erhg - Calculate the Erhg for the given slurry, using the appropriate model
     vls = average line speed (velocity, m/sec)
@@ -29,12 +34,15 @@ def Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=False):
     rhos = particle density (ton/m3)
     Cvs = insitu volume concentration
     get_dict: if true return the dict with all models.
+    options = The ModelOptions, None for the current options
     """
+    options = ModelOptions.resolve(options)
     Erhg_obj = {'il': homogeneous.fluid_head_loss(vls, Dp, epsilon, nu, rhol),
-                'FB': stratified.fb_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs),
-                'SB':    stratified.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs),
-                'He': heterogeneous.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf, use_sqrtcx),
-                'Ho':   homogeneous.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs),
+                'FB': stratified.fb_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options),
+                'SB':    stratified.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options),
+                'He': heterogeneous.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options.use_sf, options.use_sqrtcx,
+                                         options.musf),
+                'Ho':   homogeneous.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, musf=options.musf),
                 }
 
     if Erhg_obj['FB'] < Erhg_obj['SB']:
@@ -58,7 +66,38 @@ def Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=False):
         return Erhg_obj[Erhg_obj['regime']]
 
 
-def Cvs_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+def Cvs_Erhg_array(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
+    """
+    Vectorized version of Cvs_Erhg with get_dict=True, for an array of vls and a float or array of Cvs
+    returns the dict of all models with arrays, the 'regime' is an array of the model names
+    """
+    options = ModelOptions.resolve(options)
+    vls = np.asarray(vls, dtype=float)
+    Erhg_obj = {'il': homogeneous.fluid_head_loss_array(vls, Dp, epsilon, nu, rhol),
+                'FB': stratified.fb_Erhg_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options),
+                'SB': np.full(vls.shape, stratified.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options)),
+                'He': heterogeneous.Erhg_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options.use_sf,
+                                               options.use_sqrtcx, options.musf),
+                'Ho': homogeneous.Erhg_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, musf=options.musf),
+                }
+
+    regime = np.where(Erhg_obj['FB'] < Erhg_obj['SB'], 'FB', 'SB')
+    Erhg = np.minimum(Erhg_obj['FB'], Erhg_obj['SB'])
+    he = Erhg > Erhg_obj['He']     # False where He is nan, as Cvs_Erhg skips a complex He
+    regime = np.where(he, 'He', regime)
+    Erhg = np.where(he, Erhg_obj['He'], Erhg)
+    Erhg_obj['regime'] = np.where(Erhg < Erhg_obj['Ho'], 'Ho', regime)
+    return Erhg_obj
+
+
+def regime_Erhg(Erhg_obj):
+    """Return the array of the Erhg of the regime at each vls, from the dict of Cvs_Erhg_array or Cvt_Erhg_array"""
+    regime = Erhg_obj['regime']
+    return np.select([regime == r for r in ('FB', 'SB', 'He', 'Ho')],
+                     [Erhg_obj[r] for r in ('FB', 'SB', 'He', 'Ho')])
+
+
+def Cvs_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """
     Return the name of the regime for the given slurry and velocity
     vls = average line speed (velocity, m/sec)
@@ -69,8 +108,9 @@ def Cvs_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
     rhol = density of the fluid (ton/m3)
     rhos = particle density (ton/m3)
     Cvs = insitu volume concentration
+    options = The ModelOptions, None for the current options
     """
-    Erhg_obj = Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
+    Erhg_obj = Cvs_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, get_dict=True, options=options)
     return {'FB': 'fixed bed',
             'SB': 'sliding bed',
             'He': 'heterogeneous',
@@ -78,7 +118,7 @@ def Cvs_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
             }[Erhg_obj['regime']]
 
 
-def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
+def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=None, settings=None, options=None):
     """
     Return the LDV for the given slurry.
     vls: not used, included for consistency sake
@@ -89,7 +129,16 @@ def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
     rhol = density of the fluid (ton/m3)
     rhos = particle density (ton/m3)
     Cvs = insitu volume concentration
+    max_steps = The maximum steps of each stage, default settings.LDV_max_steps
+    settings = The SolverSettings, None for the current settings, or a preset name
+    options = The ModelOptions, None for the current options
     """
+    settings = SolverSettings.resolve(settings)
+    options = ModelOptions.resolve(options)
+    musf, Cvb = options.musf, options.Cvb
+    if max_steps is None:
+        max_steps = settings.LDV_max_steps
+    high, low = 1 + settings.LDV_rtol, 1 - settings.LDV_rtol
     Rsd = (rhos-rhol)/rhol
     fbot = (2*gravity*Rsd*Dp)**0.5
 
@@ -100,13 +149,16 @@ def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
     FL_vs = 1.4*(nu*Rsd*gravity)**(1./3.)*(8/lambdal)**0.5/fbot  # Eqn 8.11-1
     vlsldv = FL_vs*fbot
     steps = 0
-    while not (1.00001 >= vls/vlsldv > 0.99999) and steps < max_steps:
+    t0 = SolverTelemetry.start()
+    while not (high >= vls/vlsldv > low) and steps < max_steps:
         vls = (vls + vlsldv)/2
         Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
         lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
         FL_vs = 1.4*(nu*Rsd*gravity)**(1./3.)*(8/lambdal)**0.5/fbot  # Eqn 8.11-1
         vlsldv = FL_vs*fbot
         steps += 1
+    if t0 is not None:
+        SolverTelemetry.record('LDV', steps, high >= vls/vlsldv > low, vls/vlsldv - 1, t0, 'very small')
 
     # Small Particles
     vls = 4.0
@@ -122,13 +174,16 @@ def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
     FL_ss = alphap * (vt*Cvs*(1-Cvs/KC)**beta/(lambdal*fbot))**(1./3)  # Eqn 8.11-3
     vlsldv = FL_ss*fbot
     steps = 0
-    while not (1.00001 >= vls/vlsldv > 0.99999) and steps < max_steps:
+    t0 = SolverTelemetry.start()
+    while not (high >= vls/vlsldv > low) and steps < max_steps:
         vls = (vls + vlsldv)/2
         Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
         lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
         FL_ss = alphap * (vt*Cvs*(1-Cvs/KC)**beta/(lambdal*fbot))**(1./3)  # Eqn 8.11-3
         vlsldv = FL_ss*fbot
         steps += 1
+    if t0 is not None:
+        SolverTelemetry.record('LDV', steps, high >= vls/vlsldv > low, vls/vlsldv - 1, t0, 'small')
 
     FL_s = max(FL_vs, FL_ss)    # Eqn 8.11-4
 
@@ -141,17 +196,20 @@ def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
     Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
     lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
     FL_r = alphap*((1-Cvs/KC)**beta * Cvs *
-                   (stratified.musf*stratified.Cvb*pi/8)**0.5 * Cvr_ldv**0.5/lambdal)**(1./3)  # Eqn 8.11-6
+                   (musf*Cvb*pi/8)**0.5 * Cvr_ldv**0.5/lambdal)**(1./3)  # Eqn 8.11-6
     vlsldv = FL_r*fbot
     steps = 0
-    while not (1.00001 >= vls/vlsldv > 0.99999) and steps < max_steps:
+    t0 = SolverTelemetry.start()
+    while not (high >= vls/vlsldv > low) and steps < max_steps:
         vls = (vls + vlsldv)/2
         Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
         lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
         FL_r = alphap*((1-Cvs/KC)**beta * Cvs *
-                       (stratified.musf*stratified.Cvb*pi/8)**0.5 * Cvr_ldv**0.5/lambdal)**(1./3)  # Eqn 8.11-6
+                       (musf*Cvb*pi/8)**0.5 * Cvr_ldv**0.5/lambdal)**(1./3)  # Eqn 8.11-6
         vlsldv = FL_r*fbot
         steps += 1
+    if t0 is not None:
+        SolverTelemetry.record('LDV', steps, high >= vls/vlsldv > low, vls/vlsldv - 1, t0, 'large')
 
     # The Upper limit
     d0 = 0.0005*(1.65/Rsd)**0.5  # Eqn 8.11-8
@@ -167,27 +225,30 @@ def LDV(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, max_steps=10):
     Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
     lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
     A = -1
-    B = vt*(1-Cvs/KC)**beta/stratified.musf
-    C = ((8.5**2/lambdal)*(vt/(gravity*d)**0.5)**(10./3)*(nu*gravity)**(2./3))/stratified.musf
+    B = vt*(1-Cvs/KC)**beta/musf
+    C = ((8.5**2/lambdal)*(vt/(gravity*d)**0.5)**(10./3)*(nu*gravity)**(2./3))/musf
     vlsldv = (-1*B - (B**2-4*A*C)**0.5)/(2*A)   # Eqn 8.10-11
     steps = 0
-    while not (1.00001 >= vls/vlsldv > 0.99999) and steps < max_steps:
+    t0 = SolverTelemetry.start()
+    while not (high >= vls/vlsldv > low) and steps < max_steps:
         vls = (vls + vlsldv)/2
         Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
         lambdal = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
         A = -1
-        B = vt*(1-Cvs/KC)**beta/stratified.musf
-        C = ((8.5**2/lambdal)*(vt/(gravity*d)**0.5)**(10./3)*(nu*gravity)**(2./3))/stratified.musf
+        B = vt*(1-Cvs/KC)**beta/musf
+        C = ((8.5**2/lambdal)*(vt/(gravity*d)**0.5)**(10./3)*(nu*gravity)**(2./3))/musf
         vlsldv = (-1*B - (B**2-4*A*C)**0.5)/(2*A)   # Eqn 8.11-11
         steps += 1
+    if t0 is not None:
+        SolverTelemetry.record('LDV', steps, high >= vls/vlsldv > low, vls/vlsldv - 1, t0, 'lower limit')
     FL_ll = vlsldv/fbot  # Eqn 8.11-12
 
     FL = max(FL_ul, FL_ll)  # Eqn 8.11-13
     return FL*fbot
 
 
-@functools.lru_cache(maxsize=1200)
-def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
+@ModelOptions.lru_cache(maxsize=1200)
+def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=None):
     """
     Return the slip ratio (Xi) for the given slurry.
     Dp = Pipe diameter (m)
@@ -197,11 +258,12 @@ def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
     rhol = density of the fluid (ton/m3)
     rhos = particle density (ton/m3)
     Cvt = transport volume concentration
+    options = The ModelOptions, None for the current options
     """
     if vls == 0.0:
         vls = 0.01
     Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
-    Cvb = stratified.Cvb
+    Cvb = options.Cvb
     Cvr = Cvt/Cvb
     vt = heterogeneous.vt_ruby(d, Rsd, nu)  # Particle shape factor assumed for sand for now
     CD = (4/3.)*((gravity*Rsd*d)/vt**2)     # Eqn 4.4-6 without the shape factor
@@ -210,15 +272,15 @@ def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
     bottom = 1. + 0.175*Rep**0.75
     beta = top/bottom   # Eqn 4.6-4
     KC = 0.175*(1+beta)
-    vls_ldv = LDV(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt)
-    vls_lsdv = stratified.vls_lsdv(Dp,  d, epsilon, nu, rhol, rhos, Cvt)
+    vls_ldv = LDV(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
+    vls_lsdv = stratified.vls_lsdv(Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=options)
 
     Re = homogeneous.pipe_reynolds_number(vls, Dp, nu)
     lambda_l = homogeneous.swamee_jain_ff(Re, Dp, epsilon)
     Xi_HeHo = 8.5*(1/lambda_l**0.5)*(vt/(gravity*d)**0.5)**(5./3)*((nu*gravity)**(1/3)/vls)*(vt/vls)  # Eqn 8.12-1
 
     alpha = 0.58*Cvr**-0.42
-    ex1 = -(0.83 + stratified.musf/4 + (Cvr - 0.5 - 0.075*Dp)**2 + (0.025*Dp))
+    ex1 = -(0.83 + options.musf/4 + (Cvr - 0.5 - 0.075*Dp)**2 + (0.025*Dp))
     ex2 = Dp**0.025*(vls_ldv/vls_lsdv)**alpha*Cvr**0.65*(Rsd/1.585)**0.1
     Xi_ldv = (1-Cvr) * exp(ex1*ex2)  # Eqn 8.12-2
     Xi_aldv = Xi_ldv * (vls_ldv/vls)**4
@@ -239,7 +301,7 @@ def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
 
     if vls < vls_t:
         Xi_t = (1 - Cvr) * (1 - (4. / 5.) * (vls / vls_t))  # Eqn 8.12-8
-        Xi_SBHeHo = Xi_th*(1-(vls/vls_t)**alpha_xi) + Xi_t*(vls/vls_t)**alpha_xi  # Eqn 8.12-9
+        Xi_SBHeHo = Xi_th*(1-(vls/vls_t)**options.alpha_xi) + Xi_t*(vls/vls_t)**options.alpha_xi  # Eqn 8.12-9
     else:
         Xi_SBHeHo = Xi_th  # Eqn 8.12-9
     Xi_SBHeHo = max(Xi_SBHeHo, Xi_3LM)  # Eqn 8.12-9
@@ -250,7 +312,51 @@ def slip_ratio(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
     return Xi_SF
 
 
-def Cvs_from_Cvt(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
+def slip_ratio_array(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=None):
+    """
+    Vectorized version of slip_ratio, return an array of the slip ratio (Xi) for an array of vls
+    The LDV and the vls_lsdv do not depend on the vls, they are calculated once.
+    """
+    options = ModelOptions.resolve(options)
+    vls = np.asarray(vls, dtype=float)
+    vls = np.where(vls == 0.0, 0.01, vls)
+    Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
+    Cvb = options.Cvb
+    Cvr = Cvt/Cvb
+    vt = heterogeneous.vt_ruby(d, Rsd, nu)  # Particle shape factor assumed for sand for now
+    vls_ldv = LDV(None, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
+    vls_lsdv = stratified.vls_lsdv(Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=options)
+
+    lambda_l = homogeneous.swamee_jain_ff_array(vls * Dp / nu, Dp, epsilon)
+    Xi_HeHo = 8.5*(1/lambda_l**0.5)*(vt/(gravity*d)**0.5)**(5./3)*((nu*gravity)**(1/3)/vls)*(vt/vls)  # Eqn 8.12-1
+
+    alpha = 0.58*Cvr**-0.42
+    ex1 = -(0.83 + options.musf/4 + (Cvr - 0.5 - 0.075*Dp)**2 + (0.025*Dp))
+    ex2 = Dp**0.025*(vls_ldv/vls_lsdv)**alpha*Cvr**0.65*(Rsd/1.585)**0.1
+    Xi_ldv = (1-Cvr) * exp(ex1*ex2)  # Eqn 8.12-2
+    Xi_aldv = Xi_ldv * (vls_ldv/vls)**4
+    vls_t = (5 * exp(ex1 * ex2)) ** 0.25 * vls_ldv  # Eqn 8.12-7
+
+    Kldv = 1/(1 - Xi_ldv)       # Eqn 7.9-14
+    Xi_fb = 1-((Cvt*vls_ldv)/((Cvb-Kldv*Cvt)*(vls_ldv-vls)+Kldv*Cvt*vls_ldv))  # Eqn 8.12-3
+
+    ex2 = Dp ** 0.025 * (vls / vls_lsdv) ** alpha * Cvr ** 0.65 * (Rsd / 1.585) ** 0.1
+    Xi_3LM = (1 - Cvr) * np.exp(ex1 * ex2)  # Eqn 8.12-4
+
+    Xi_th = np.where(Xi_fb < Xi_aldv, Xi_fb, np.where(Xi_HeHo > Xi_aldv, Xi_HeHo, Xi_aldv))     # Eqn 8.12-5
+
+    Xi_t = (1 - Cvr) * (1 - (4. / 5.) * (vls / vls_t))  # Eqn 8.12-8
+    Xi_SBHeHo = np.where(vls < vls_t,
+                         Xi_th*(1-(vls/vls_t)**options.alpha_xi) + Xi_t*(vls/vls_t)**options.alpha_xi,  # Eqn 8.12-9
+                         Xi_th)
+    Xi_SBHeHo = np.maximum(Xi_SBHeHo, Xi_3LM)  # Eqn 8.12-9
+
+    f = 4./3. - (1./3.)*(d/Dp)/particle_ratio  # Eqn 8.12-10
+    f = min(max(f, 0), 1)
+    return Xi_SBHeHo * f + Xi_3LM*(1-f)    # Eqn 8.12-11
+
+
+def Cvs_from_Cvt(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=None):
     """
     Cvs_from_Cvt - Calculate the Cvs for the given Cvt
     vls = average line speed (velocity, m/sec)
@@ -262,13 +368,14 @@ def Cvs_from_Cvt(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
     rhos = particle density (ton/m3)
     Cvt = transported volume concentration
     get_dict: if true return the dict with all models.
+    options = The ModelOptions, None for the current options
     """
-    Xi = slip_ratio(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt)
+    Xi = slip_ratio(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
     return (1/(1-Xi)) * Cvt  # Eqn 8.12-12
 
 
-@functools.lru_cache(maxsize=2048)
-def Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=False):
+@ModelOptions.lru_cache(maxsize=2048)
+def Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=False, options=None):
     """
     Cvt_Erhg - Calculate the Erhg for the given Cvt, using the appropriate model
     vls = average line speed (velocity, m/sec)
@@ -280,10 +387,11 @@ def Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=False):
     rhos = particle density (ton/m3)
     Cvt = transported volume concentration
     get_dict: if true return the dict with all models.
+    options = The ModelOptions, None for the current options
     """
-    Cvs = Cvs_from_Cvt(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt)
-    Xi = slip_ratio(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt)
-    Erhg_obj = Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
+    Cvs = Cvs_from_Cvt(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
+    Xi = slip_ratio(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
+    Erhg_obj = Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True, options=options)
     for regime in ["FB", "SB", "He", "Ho"]:
         Erhg_obj[regime] = Erhg_obj[regime]*1/(1-Xi)    # Eqn 8.12-12
     if Erhg_obj['regime'] == "FB":
@@ -299,7 +407,26 @@ def Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=False):
         return Erhg_obj[Erhg_obj['regime']]
 
 
-def Cvt_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
+def Cvt_Erhg_array(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=None):
+    """
+    Vectorized version of Cvt_Erhg with get_dict=True, for an array of vls
+    returns the dict of all models with arrays, the 'regime' is an array of the model names, see regime_Erhg
+    """
+    options = ModelOptions.resolve(options)
+    Xi = slip_ratio_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvt, options=options)
+    Cvs = (1/(1-Xi)) * Cvt  # Eqn 8.12-12
+    Erhg_obj = Cvs_Erhg_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options)
+    for regime in ["FB", "SB", "He", "Ho"]:
+        Erhg_obj[regime] = Erhg_obj[regime]*1/(1-Xi)    # Eqn 8.12-12
+    # Use min of SB, He if in fixed bed region, text after Eqn 8.12-12
+    Erhg_obj['regime'] = np.where(Erhg_obj['regime'] == 'FB',
+                                  np.where(Erhg_obj['SB'] < Erhg_obj['He'], 'SB', 'He'),
+                                  Erhg_obj['regime'])
+    Erhg_obj['Xi'] = Xi
+    return Erhg_obj
+
+
+def Cvt_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, options=None):
     """
     Return the name of the regime for the given slurry and velocity in the Cvt case
     vls = average line speed (velocity, m/sec)
@@ -310,8 +437,9 @@ def Cvt_regime(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt):
     rhol = density of the fluid (ton/m3)
     rhos = particle density (ton/m3)
     Cvs = insitu volume concentration
+    options = The ModelOptions, None for the current options
     """
-    Erhg_obj = Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=True)
+    Erhg_obj = Cvt_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvt, get_dict=True, options=options)
     return {'FB': 'fixed bed',
             'SB': 'sliding bed',
             'He': 'heterogeneous',
@@ -397,7 +525,8 @@ def create_fracs(GSD, Dp, nu, rhol, rhos, num_fracs=10):
     return new_GSD
 
 
-def Erhg_graded(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num_fracs=10, get_dict=False):
+def Erhg_graded(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num_fracs=10, get_dict=False,
+                options=None):
     """
     Erhg_graded - Calculate the Erhg for the given slurry, using the appropriate model
     GSD = Particle size distribution dict: {x:d_x, y:d_y, ...}, len(GSD>2)
@@ -412,10 +541,11 @@ def Erhg_graded(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num
     num_fracs = The number of fractions to divide the GSD, if not >0, use the GSD as is,
                 assuming that the bottom fraction is the peudoliquid
     get_dict: Whether to return a dict, or a single number
+    options = The ModelOptions, None for the current options
     """
     Rsd = (rhos - rhol) / rhol  # Eqn 8.2-1
     if num_fracs:
-        GSD = create_fracs(GSD, Dp, nu, rhol, rhos)
+        GSD = create_fracs(GSD, Dp, nu, rhol, rhos, num_fracs)
     fracs = sorted(GSD.keys())
 
     X = fracs[0]
@@ -443,9 +573,9 @@ def Erhg_graded(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num
         dx = 10**logdx
         fracx = fnext - flow
         if Cvt_eq_Cvs:
-            Erhg_x = Cvt_Erhg(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, get_dict=True)
+            Erhg_x = Cvt_Erhg(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, get_dict=True, options=options)
         else:
-            Erhg_x = Cvs_Erhg(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, get_dict=True)
+            Erhg_x = Cvs_Erhg(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, get_dict=True, options=options)
         regime = Erhg_x['regime']
         il_x = Erhg_x['il']
         i_mxi = Erhg_x[regime] * Rsd_x * Cv_r + il_x
@@ -473,5 +603,122 @@ def Erhg_graded(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num
         return Erhg
 
 
+def Erhg_graded_array(GSD, vls, Dp, epsilon, nu, rhol, rhos, Cv, Cvt_eq_Cvs=False, num_fracs=10, options=None):
+    """
+    Vectorized version of Erhg_graded, return an array of the Erhg for an array of vls
+    Each fraction is calculated for all the vls at once with Cvt_Erhg_array or Cvs_Erhg_array, the other
+    arguments as Erhg_graded
+    """
+    options = ModelOptions.resolve(options)
+    vls = np.asarray(vls, dtype=float)
+    Rsd = (rhos - rhol) / rhol  # Eqn 8.2-1
+    if num_fracs:
+        GSD = create_fracs(GSD, Dp, nu, rhol, rhos, num_fracs)
+    fracs = sorted(GSD.keys())
+
+    X = fracs[0]
+    rhox = rhol + rhol*(X*Cv*Rsd)/(1-Cv+Cv*X)    # Eqn 8.15-3
+    Cv_x = (X*Cv)/(1-Cv+Cv*X)
+    Cv_r = (1 - X) * Cv                           # Eqn 8.15-5
+    mu_l = nu * rhol
+    mu_x = mu_l*(1 + 2.5*Cv_x + 10.05*Cv_x**2 + 0.00273*exp(16.6*Cv_x))   # Eqn 8.15-6
+    nu_x = mu_x / rhox                              # Eqn 8.15-7
+    Rsd_x = (rhos - rhox)/rhox
+
+    im_x = np.zeros(vls.shape)
+    for flow, fnext in zip(fracs[:-1], fracs[1:]):
+        dx = 10**((log10(GSD[flow]) + log10(GSD[fnext]))/2.0)
+        if Cvt_eq_Cvs:
+            Erhg_x = Cvt_Erhg_array(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, options=options)
+        else:
+            Erhg_x = Cvs_Erhg_array(vls, Dp, dx, epsilon, nu_x, rhox, rhos, Cv_r, options=options)
+        im_x += (fnext - flow) * (regime_Erhg(Erhg_x) * Rsd_x * Cv_r + Erhg_x['il'])
+    im_x /= (1-X)
+    im = rhox*im_x/rhol
+    il = homogeneous.fluid_head_loss_array(vls, Dp, epsilon, nu, rhol)
+    return (im - il)/(Rsd*Cv)
+
+
+def clear_caches():
+    """Clear the lru_caches of the framework, stratified and homogeneous functions, and the Wilson model if loaded"""
+    wilson = [sys.modules[name] for name in ('Wilson.Wilson_V50', 'Wilson.Wilson_Stratified') if name in sys.modules]
+    for module in [sys.modules[__name__], stratified, heterogeneous, homogeneous] + wilson:
+        for f in vars(module).values():
+            if hasattr(f, 'cache_clear'):
+                f.cache_clear()
+
+
+@contextlib.contextmanager
+def solver_settings(settings, **overrides):
+    """Context manager to use other SolverSettings in this thread, yields the Settings
+
+    settings: a preset name or a SolverSettings.Settings
+    overrides: Settings fields to change, see SolverSettings.resolve
+    The settings are part of the lru_cache keys, so the caches are not cleared. Other threads are not affected."""
+    token = SolverSettings.set_current(SolverSettings.resolve(settings, **overrides))
+    try:
+        yield SolverSettings.current()
+    finally:
+        SolverSettings.reset(token)
+
+
+@contextlib.contextmanager
+def model_options(options=None, **overrides):
+    """Context manager to use other ModelOptions in this thread, yields the Options
+
+    options: an Options, None to start from the current options
+    overrides: Options fields to change, see ModelOptions.resolve
+    The options are part of the lru_cache keys, so the caches are not cleared. Other threads are not affected.
+    with model_options(use_sqrtcx=False):
+        Erhg = Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs)"""
+    options = ModelOptions.resolve(options, **overrides)
+    token = ModelOptions.set_current(options)
+    try:
+        yield options
+    finally:
+        ModelOptions.reset(token)
+
+
+@contextlib.contextmanager
+def model_constant(name, value):
+    """Temporarily set a model constant, such as musf, in this thread
+
+    The constants are the ModelOptions fields, set with model_options. Other constants, such as those of
+    DHLLDV_constants, are not part of the lru_cache keys and can not be set.
+    with model_constant('musf', 0.45):
+        Erhg = Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs)"""
+    names = [f.name for f in dataclasses.fields(ModelOptions.Options)]
+    if name not in names:
+        raise ValueError(f"DHLLDV_framework.model_constant: Unknown model constant '{name}', use one of {names}")
+    with model_options(**{name: value}):
+        yield
+
+
+_deprecated_options = ('use_sf', 'use_sqrtcx', 'alpha_xi')     # The module globals replaced by ModelOptions
+
+
+def __getattr__(name):
+    """Read the deprecated module globals from the current ModelOptions, with a DeprecationWarning"""
+    if name in _deprecated_options:
+        warnings.warn(f'DHLLDV_framework.{name} is deprecated, use ModelOptions.current().{name}',
+                      DeprecationWarning, stacklevel=2)
+        return getattr(ModelOptions.current(), name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+class _FrameworkModule(types.ModuleType):
+    """Set the deprecated module globals in the current ModelOptions of this thread, with a DeprecationWarning"""
+    def __setattr__(self, name, value):
+        if name in _deprecated_options:
+            warnings.warn(f'Setting DHLLDV_framework.{name} is deprecated, use model_options({name}=...)',
+                          DeprecationWarning, stacklevel=2)
+            ModelOptions.set_current(ModelOptions.resolve(**{name: value}))
+        else:
+            super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _FrameworkModule
+
+
 if __name__ == '__main__':
     pass
@@ -4,7 +4,9 @@ Added by R. Ramsdell 23 June 2022"""
 
 from dataclasses import dataclass
 
-from DHLLDV.DHLLDV_Utils import interpDict
+import numpy as np
+
+from DHLLDV.DHLLDV_Utils import interpDict, smoothCurve, fingerprint
 
 
 @dataclass
@@ -13,15 +15,62 @@ class Driver():
 
     name: str
     design_power_curve: interpDict
+    curve_fit: str or None = None   # None for a piecewise linear curve, 'pchip' or 'poly' for a smooth curve
+
+    def __post_init__(self):
+        if self.curve_fit and not isinstance(self.design_power_curve, smoothCurve):
+            self.design_power_curve = smoothCurve(dict(self.design_power_curve), fit=self.curve_fit)
+        self.design_power_curve.as_arrays()     # Compile the speed and power arrays once
+
+    def fingerprint(self):
+        """Return a stable hash of the power curve, see DHLLDV_Utils.fingerprint"""
+        return fingerprint(self.design_power_curve.fingerprint(), self.curve_fit)
+
+    @property
+    def speeds(self):
+        """The speeds (Hz) of the power curve points as a numpy array, low to high"""
+        return self.design_power_curve.as_arrays()[0]
+
+    @property
+    def powers(self):
+        """The powers (kW) of the power curve points as a numpy array, in the same order as speeds"""
+        return self.design_power_curve.as_arrays()[1]
 
     def power(self, speed):
-        """Return the power (kW) at the given speed (Hz)"""
-        return self.design_power_curve[speed]
+        """Return the power (kW) at the given speed (Hz), or a numpy array of powers for an array of speeds"""
+        if np.ndim(speed) == 0:
+            return self.design_power_curve[speed]
+        return self.design_power_curve.interp(speed)
+
+    def speed_at_power(self, power, tol=0.001):
+        """Return the speed (Hz) where the driver makes the given power (kW), the inverse of the power curve
+
+        power is a power or array of powers in kW, between the minimum and design power
+        tol is the allowable power error in kW for a smooth (curve_fit) power curve
+        The power must increase with speed over the whole curve, else raises a ValueError"""
+        speeds, powers = self.speeds, self.powers
+        if np.any(np.diff(powers) <= 0):
+            raise ValueError(f"Driver {self.name} power curve does not increase with speed, cannot invert")
+        P = np.asarray(power, dtype=float)
+        if np.any(P < powers[0]) or np.any(P > powers[-1]):
+            raise IndexError(f"Power {power} out of range ({powers[0]} - {powers[-1]})")
+        n = np.interp(P, powers, speeds)
+        if self.curve_fit:
+            for _ in range(20):
+                gap = self.design_power_curve.interp(n) - P
+                if np.all(np.abs(gap) < tol):
+                    break
+                n = np.clip(n - gap / self.design_power_curve.derivative(n), speeds[0], speeds[-1])
+        return float(n) if n.ndim == 0 else n
+
+    def power_slope(self, speed):
+        """Return the slope of the power curve dP/dn (kW/Hz) at the given speed (Hz)"""
+        return float(self.design_power_curve.derivative(speed))
 
     @property
     def design_speed(self):
         """Return the maximum speed (Hz)"""
-        return max(self.design_power_curve.keys())
+        return float(self.speeds[-1])
 
     @property
     def design_power(self):
@@ -31,4 +80,4 @@ class Driver():
     @property
     def minimum_speed(self):
         """Return the minimum speed of the driver"""
-        return min(self.design_power_curve.keys())
+        return float(self.speeds[0])
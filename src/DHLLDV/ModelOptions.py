@@ -0,0 +1,88 @@
+"""
+ModelOptions - The corrections and model constants used by the DHLLDV framework
+
+The framework functions take an optional options argument (by keyword): None for the current options, or an
+Options. The current options are per thread (and per asyncio task), so threads can run with different options,
+set them with DHLLDV_framework.model_options:
+    with DHLLDV_framework.model_options(use_sqrtcx=False, musf=0.45):
+        Erhg = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs)
+    Erhg = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs,
+                                     options=ModelOptions.resolve(use_sf=False))
+
+The lru_cached functions are keyed on the resolved options and the current SolverSettings (see lru_cache), so
+changing the options or settings does not need the caches cleared. Worker processes do not inherit the current
+options, pass them explicitly.
+"""
+import contextvars
+from dataclasses import dataclass, fields, replace
+import functools
+
+from . import DHLLDV_constants, SolverSettings
+
+
+@dataclass(frozen=True)
+class Options:
+    """Model options, frozen so they can be part of an lru_cache key"""
+    use_sf: bool = True                     # Apply the sliding flow correction to the heterogeneous Erhg
+    use_sqrtcx: bool = True                 # Use the sqrt(Cx) modification of the heterogeneous Srs
+    alpha_xi: float = 0.5                   # alpha in Eqn 8.12-9
+    musf: float = DHLLDV_constants.musf     # Sliding friction coefficient
+    Cvb: float = DHLLDV_constants.Cvb       # The bed concentration
+
+
+default = Options()
+
+_current = contextvars.ContextVar('DHLLDV_model_options', default=default)
+
+
+def current():
+    """Return the current Options of this thread"""
+    return _current.get()
+
+
+def resolve(options=None, **overrides):
+    """Return the Options for a model call
+
+    options: None for the current options, or an Options
+    overrides: Options fields to change, such as use_sf=False"""
+    if options is None:
+        options = _current.get()
+    elif not isinstance(options, Options):
+        raise TypeError(f'ModelOptions.resolve: options must be an Options, not {type(options).__name__}')
+    if overrides:
+        names = {f.name for f in fields(Options)}
+        unknown = [k for k in overrides if k not in names]
+        if unknown:
+            raise ValueError(f'ModelOptions.resolve: Unknown options {unknown}, use from {sorted(names)}')
+        options = replace(options, **overrides)
+    return options
+
+
+def set_current(options):
+    """Set the current Options of this thread, returns the token to restore the previous options with reset"""
+    return _current.set(options)
+
+
+def reset(token):
+    """Restore the Options that were current before set_current returned token"""
+    _current.reset(token)
+
+
+def lru_cache(maxsize=128):
+    """functools.lru_cache for functions with an options argument, keyed on the resolved options
+
+    The key includes the current SolverSettings, the functions call the solvers with the current settings.
+    The options must be passed by keyword. The cache_clear and cache_info of the cache are kept."""
+    def decorate(func):
+        @functools.lru_cache(maxsize=maxsize)
+        def cached(settings, *args, **kwargs):
+            return func(*args, **kwargs)
+
+        @functools.wraps(func)
+        def wrapper(*args, options=None, **kwargs):
+            return cached(SolverSettings.current(), *args, options=_current.get() if options is None else options,
+                          **kwargs)
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.cache_info = cached.cache_info
+        return wrapper
+    return decorate
@@ -3,13 +3,20 @@ PipeObj - Holds the pipe and Pipeline objects that manage a pipeline system
 
 Added by R. Ramsdell 03 September, 2021
 """
-from copy import copy
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy, deepcopy
+from dataclasses import dataclass, fields
+from functools import wraps
+from inspect import signature
 from math import pi
 
+import numpy as np
 import scipy.optimize
+from DHLLDV import DHLLDV_framework, ModelOptions, SolverSettings, SolverTelemetry
 from DHLLDV.DHLLDV_constants import gravity
-from DHLLDV.PumpObj import Pump
+from DHLLDV.DHLLDV_Utils import fingerprint
+from DHLLDV.PumpObj import Pump, PumpTrain
 from DHLLDV.SlurryObj import Slurry
 
 
@@ -17,6 +24,31 @@ class OperatingPointError(Exception):
     """The pipeline has no operating point"""
 
 
+def memoized(method):
+    """Decorator to keep the results of a Pipeline method in the Pipeline memo
+
+    The results are keyed on the method name, the Pipeline.fingerprint and the arguments, so a repeated or
+    reverted pipeline state returns the kept result. OperatingPointErrors are kept and raised again. The
+    memo holds the last Pipeline.memo_size results, results are returned as copies."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, self.fingerprint(), fingerprint(args, sorted(kwargs.items())))
+        if key in self._memo:
+            self._memo.move_to_end(key)
+        else:
+            try:
+                self._memo[key] = method(self, *args, **kwargs)
+            except OperatingPointError as e:
+                self._memo[key] = e
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        result = self._memo[key]
+        if isinstance(result, OperatingPointError):
+            raise result
+        return deepcopy(result)
+    return wrapper
+
+
 @dataclass
 class Pipe:
     """Object to manage the data about a section of pipe"""
@@ -33,6 +65,10 @@ class Pipe:
                f'total_k={self.total_K:0.2f}, '
                f'elev_change={self.elev_change:0.2f})')
 
+    def fingerprint(self):
+        """Return a stable hash of the pipe dimensions, see DHLLDV_Utils.fingerprint"""
+        return fingerprint(self.diameter, self.length, self.total_K, self.elev_change)
+
     def flow(self, v):
         """Return the flow for the associated velocity
 
@@ -48,8 +84,35 @@ class Pipe:
         return Q / ((self.diameter / 2) ** 2 * pi)
 
 
+@dataclass
+class PumpStation:
+    """The pressures at a pump in the pipeline at a flow, all pressures in m water column (gauge)"""
+    name: str
+    location: float         # m along the pipeline
+    suction: float          # pressure at the pump suction
+    discharge: float        # pressure at the pump discharge
+    min_suction: float = 0.0
+    max_discharge: float or None = None
+
+    @property
+    def margin(self):
+        """The smallest margin to the station limits, negative if a limit is exceeded"""
+        margin = self.suction - self.min_suction
+        if self.max_discharge is not None:
+            margin = min(margin, self.max_discharge - self.discharge)
+        return margin
+
+    @property
+    def ok(self):
+        """True if the suction and discharge pressures are within the limits"""
+        return self.margin >= 0
+
+
 class Pipeline:
     """Object to manage the pipeline system"""
+    memo_size = 128     # The number of results to keep, see memoized
+    sensitivity_parameters = ('Cv', 'D50', 'epsilon', 'musf', 'speed')
+
     def __init__(self, name="Pipeline", pipe_list=None, slurry=None):
         self.name = name
         if not slurry:
@@ -59,6 +122,8 @@ class Pipeline:
         else:
             self.pipesections = [Pipe('Entrance', slurry.Dp*34./30, 0, 0.5, -10.0),
                                  Pipe('Discharge', slurry.Dp, 1000, 1.0, 1.5)]
+        self._pump_train = None
+        self._memo = OrderedDict()  # {(method name, fingerprint, arguments): result}, see memoized
         self.slurry = slurry
 
     def __str__(self):
@@ -158,10 +223,37 @@ class Pipeline:
         if self._slurry.Dp not in self.slurries.keys():
             self._slurry.Dp = self.pipesections[-1].diameter
 
-    def calc_system_head(self, Q):
+    def fingerprint(self):
+        """Return a stable hash of the pipe sections, pumps, slurries, model options and solver settings
+
+        See DHLLDV_Utils.fingerprint.
+
+        The names are not included, they do not change the results"""
+        sections = tuple(p.fingerprint(with_slurry=False) if isinstance(p, Pump) else p.fingerprint()
+                         for p in self.pipesections)
+        slurries = tuple((Dp, s.fingerprint()) for Dp, s in sorted(self.slurries.items()))
+        return fingerprint(sections, self.slurry.fingerprint(), slurries, ModelOptions.current(),
+                           SolverSettings.current())
+
+    def pump_train(self, flow_list):
+        """Return a PumpTrain of the pumps in line, built on the given flow list
+
+        The train is kept and reused while the pumps in the pipeline and the flow list are the same,
+        it rebuilds its own curves if the pump speeds, impellers or slurry change.
+        flow_list is a list of flowrates (m3/sec) to build the combined pump curves on"""
+        pumps = self.pumps
+        key = ([id(p) for p in pumps], list(flow_list))
+        if self._pump_train is None or self._pump_train[0] != key:
+            self._pump_train = (key, PumpTrain(pumps, flow_list))
+        for p in pumps:
+            p.slurry = self.slurry
+        return self._pump_train[1]
+
+    def calc_system_head(self, Q, pump_train=None):
         """Calculate the system head for a pipeline
 
         Q is the flow in m3/sec
+        pump_train is an optional PumpTrain of the pumps in line, to use its combined pump curves
 
         If a pipesection after the first has length 0, the elev_change is ignored
 
@@ -179,6 +271,7 @@ class Pipeline:
             Hz_m = Hz_l = 0
         Hpumps_m = 0    # Total pump head of slurry
         Hpumps_l = 0    # Total pump head of water
+        im_il = {}      # {diameter: (im, il)}, the friction is the same for all pipes of a diameter
 
         for p in self.pipesections:
             if isinstance(p, Pipe):
@@ -189,16 +282,20 @@ class Pipeline:
                 if p.length > 0:
                     Hz_m += p.elev_change * self.slurry.rhom
                     Hz_l += p.elev_change * self.slurry.rhol
-                    im = self.slurries[p.diameter].im(v)
+                    if p.diameter not in im_il:
+                        im_il[p.diameter] = (self.slurries[p.diameter].im(v), self.slurries[p.diameter].il(v))
+                    im, il = im_il[p.diameter]
                     Hfric_m += im * p.length
-                    il = self.slurries[p.diameter].il(v)
                     Hfric_l += il * p.length
-            elif isinstance(p, Pump):
+            elif isinstance(p, Pump) and pump_train is None:
                 p.slurry = self.slurry
-                Qp, Hp, Pp, np = p.point(Q, water=True)
+                Qp, Hp, Pp, Np = p.point(Q, water=True)
                 Hpumps_l += Hp
-                Qp, Hp, Pp, np = p.point(Q)
+                Qp, Hp, Pp, Np = p.point(Q)
                 Hpumps_m += Hp
+        if pump_train is not None:
+            Hpumps_l = pump_train.head(Q, water=True)
+            Hpumps_m = pump_train.head(Q)
 
         Htot_m = Hfric_m + Hfit_m + Hz_m + Hv * self.slurry.rhom
         Htot_l = Hfric_l + Hfit_l + Hz_l + Hv * self.slurry.rhol
@@ -208,11 +305,231 @@ class Pipeline:
                 Hpumps_l,   # Pump head slurry
                 Hpumps_m)   # Pump head fluid
 
+    @memoized
+    def system_curve(self, flow_list):
+        """Calculate the system and pump heads over a list of flows, see calc_system_head
+
+        flow_list is a list of flowrates (m3/sec)
+        returns a tuple of 4 tuples, the calc_system_head results at each flow: (System head slurry,
+                System head fluid, Pump head fluid, Pump head slurry)"""
+        return tuple(zip(*[self.calc_system_head(Q) for Q in flow_list]))
+
+    def station_pressures(self, Q, min_suction=0.0, max_discharge=None):
+        """Calculate the suction and discharge pressure at each pump in one sweep along the pipeline
+
+        Q is the flow in m3/sec
+        min_suction is the lowest allowable suction pressure, in m water column, for all pumps or a list with
+          one value per pump
+        max_discharge is the highest allowable discharge pressure, in m water column, None for no limit, for all
+          pumps or a list with one value per pump
+
+        The pressure at a point is the pump head added before that point less the slurry system head up to
+        that point (as calc_system_head), including the velocity head in the pipe. The friction per m is
+        calculated once for each pipe diameter.
+
+        returns a list of PumpStation, in order along the pipeline"""
+        num_pumps = self.num_pumps
+        if not isinstance(min_suction, (list, tuple)):
+            min_suction = [min_suction] * num_pumps
+        if not isinstance(max_discharge, (list, tuple)):
+            max_discharge = [max_discharge] * num_pumps
+        rhom = self.slurry.rhom
+        if self.pipesections[0].length == 0:
+            H = -self.pipesections[0].elev_change * self.slurry.rhol
+        else:
+            H = 0
+        Hv = 0
+        location = 0
+        im = {}
+        stations = []
+        for p in self.pipesections:
+            if isinstance(p, Pipe):
+                v = p.velocity(Q)
+                Hv = v ** 2 / (2 * gravity)
+                H -= p.total_K * Hv * rhom
+                if p.length > 0:
+                    if p.diameter not in im:
+                        im[p.diameter] = self.slurries[p.diameter].im(v)
+                    H -= p.elev_change * rhom + im[p.diameter] * p.length
+                location += p.length
+            elif isinstance(p, Pump):
+                p.slurry = self.slurry
+                i = len(stations)
+                suction = H - Hv * rhom
+                H += p.point(Q)[1]
+                stations.append(PumpStation(p.name, location, suction, H - Hv * rhom,
+                                            min_suction[i], max_discharge[i]))
+        return stations
+
+    def station_pressure_arrays(self, flows):
+        """Vectorized version of station_pressures, the pressures at every pump for an array of flows in one pass
+
+        flows is a list or array of flows in m3/sec
+        The im of each pipe diameter is calculated once for all the flows with Slurry.im_array and reused for
+        every pipe of that diameter, the pumps use Pump.point_array.
+
+        returns a tuple of numpy arrays of shape (flows, pumps): (suction pressure in m water column,
+                                                                   discharge pressure in m water column,
+                                                                   pump speed in Hz,
+                                                                   velocity head at the suction in m)"""
+        Q = np.asarray(flows, dtype=float)
+        rhom = self.slurry.rhom
+        if self.pipesections[0].length == 0:
+            H = np.full(Q.shape, -self.pipesections[0].elev_change * self.slurry.rhol)
+        else:
+            H = np.zeros(Q.shape)
+        Hv = np.zeros(Q.shape)
+        im = {}
+        suction, discharge, speeds, suction_Hv = [], [], [], []
+        for p in self.pipesections:
+            if isinstance(p, Pipe):
+                v = p.velocity(Q)
+                Hv = v ** 2 / (2 * gravity)
+                H = H - p.total_K * Hv * rhom
+                if p.length > 0:
+                    if p.diameter not in im:
+                        im[p.diameter] = self.slurries[p.diameter].im_array(v)
+                    H = H - (p.elev_change * rhom + im[p.diameter] * p.length)
+            elif isinstance(p, Pump):
+                p.slurry = self.slurry
+                _, Hp, _, Np = p.point_array(Q)
+                suction.append(H - Hv * rhom)
+                suction_Hv.append(Hv)
+                H = H + Hp
+                discharge.append(H - Hv * rhom)
+                speeds.append(Np)
+        shape = (len(Q), len(suction))
+        return tuple(np.column_stack(a) if a else np.zeros(shape) for a in (suction, discharge, speeds, suction_Hv))
+
+    def NPSH_margins(self, flows, atm_pressure=10.33, vapor_pressure=0.24):
+        """Calculate the NPSH available less the NPSH required at every pump for an array of flows
+
+        flows is a list or array of flows in m3/sec
+        atm_pressure is the atmospheric pressure in m fresh water column
+        vapor_pressure is the vapor pressure of the carrier fluid in m fresh water column
+
+        The NPSH available is the absolute suction pressure plus the velocity head, less the vapor pressure, in m
+        of mixture. Pumps without a design_NPSHr_curve have an NPSHr of 0, so the margin is the NPSH available.
+
+        returns a numpy array of shape (flows, pumps) in m of mixture"""
+        suction, _, speeds, Hv = self.station_pressure_arrays(flows)
+        NPSHa = (atm_pressure + suction - vapor_pressure) / self.slurry.rhom + Hv
+        Q = np.asarray(flows, dtype=float)
+        NPSHr = np.column_stack([p.NPSHr(Q, speeds[:, i]) for i, p in enumerate(self.pumps)]) if self.pumps else 0
+        return NPSHa - NPSHr
+
+    def find_station_limited_flow(self, flow_list, min_suction=0.0, max_discharge=None, pumps=None,
+                                  min_speed_ratio=0.5, steps=10):
+        """Find the operating point with the pump speeds reduced until all pump stations are within their limits
+
+        flow_list is a list of flowrates (m3/sec) to consider
+        min_suction, max_discharge are the station limits, see station_pressures
+        pumps is a list of the indexes (in self.pumps) of the pumps to slow down, default the pump at the first
+          station out of its limits and the pumps after it, which draw down its suction
+        min_speed_ratio is the lowest ratio to the current speeds to consider
+        steps is the number of speed ratios between 1 and min_speed_ratio to check
+
+        The speeds of the pumps are scaled by a common ratio. The ratios are checked from the current speeds
+        down for the first one with all stations in limits, then the ratio where the smallest margin is zero is
+        found between it and the ratio above with scipy.optimize.brentq, the highest ratio evaluated with all
+        stations in limits is used. The pump speeds are restored after.
+        Raises an OperatingPointError if no ratio meets the limits.
+
+        returns a tuple: (flow in m3/sec, list of PumpStation at that flow, list of the pump speeds in Hz)"""
+        pump_list = self.pumps
+        speeds_orig = [p.current_speed for p in pump_list]
+        q_op = {}
+        in_limits = []
+
+        def _set_speeds(ratio):
+            """Set the speeds of the pumps to slow down to ratio times their original speeds"""
+            for i in pumps:
+                pump_list[i].current_speed = speeds_orig[i] * ratio
+
+        def _margin(ratio):
+            """Wrapper to return the smallest station margin at the operating point with the speed ratio"""
+            _set_speeds(ratio)
+            q_op[ratio] = self.find_operating_point(flow_list)
+            margin = min(s.margin for s in self.station_pressures(q_op[ratio], min_suction, max_discharge))
+            if margin >= 0:
+                in_limits.append(ratio)
+            return margin
+
+        def _solution(ratio):
+            """Return the flow, stations and speeds at the speed ratio"""
+            _set_speeds(ratio)
+            q = q_op[ratio]
+            return q, self.station_pressures(q, min_suction, max_discharge), [p.current_speed for p in pump_list]
+
+        q = self.find_operating_point(flow_list)
+        stations = self.station_pressures(q, min_suction, max_discharge)
+        if all(s.ok for s in stations):
+            return q, stations, speeds_orig
+        if pumps is None:
+            pumps = range([s.ok for s in stations].index(False), len(pump_list))
+        q_op[1.0] = q
+        try:
+            ratio_high = 1.0
+            for ratio_low in np.linspace(1.0, min_speed_ratio, steps + 1)[1:]:
+                try:
+                    if _margin(ratio_low) >= 0:
+                        break
+                except OperatingPointError as e:
+                    raise OperatingPointError('PipeObj.Pipeline.find_station_limited_flow: No operating point '
+                                              f'meets the station limits above a speed ratio of {ratio_low:0.3f}: '
+                                              f'{e}') from e
+                ratio_high = ratio_low
+            else:
+                raise OperatingPointError('PipeObj.Pipeline.find_station_limited_flow: '
+                                          f'No pump speed ratio above {min_speed_ratio} meets the station limits')
+            try:
+                scipy.optimize.brentq(_margin, ratio_low, ratio_high, xtol=1e-9)
+            except (ValueError, OperatingPointError) as e:
+                raise OperatingPointError(f'PipeObj.Pipeline.find_station_limited_flow: {e}') from e
+            return _solution(max(in_limits))
+        finally:
+            for p, n in zip(pump_list, speeds_orig):
+                p.current_speed = n
+
+    def system_head_slope(self, Q):
+        """Calculate the slope of the slurry system and pump head curves at the given flow
+
+        Q is the flow in m3/sec
+
+        The fitting, velocity head and pump terms are analytic (Pump.head_slope), the friction slope for each
+        pipe diameter is a central difference of the im curve.
+
+        returns a tuple: (dHsystem_m/dQ, dHpumps_m/dQ) in m water column per m3/sec"""
+        dHfit = 0
+        dHfric = 0
+        dHpumps = 0
+        dim_dv = {}
+        for p in self.pipesections:
+            if isinstance(p, Pipe):
+                v = p.velocity(Q)
+                dvdQ = p.velocity(1.0)
+                dHv = v * dvdQ / gravity     # d(v**2/2g)/dQ
+                dHfit += p.total_K * dHv * self.slurry.rhom
+                if p.length > 0:
+                    if p.diameter not in dim_dv:
+                        dv = max(v * 1e-4, 1e-6)
+                        slurry = self.slurries[p.diameter]
+                        dim_dv[p.diameter] = (slurry.im(v + dv) - slurry.im(v - dv)) / (2 * dv)
+                    dHfric += dim_dv[p.diameter] * dvdQ * p.length
+            elif isinstance(p, Pump):
+                p.slurry = self.slurry
+                dHpumps += p.head_slope(Q)
+        return dHfric + dHfit + dHv * self.slurry.rhom, dHpumps
+
+    @memoized
     def qimin(self, flow_list, precision=0.02):
         """Find the minimum friction point in the slurry system using scipy.optimize.minimize_scalar
 
         flow_list is a list of flowrates (m3/sec) to consider
-        precision is the flow precision (m3/sec) to use"""
+        precision is the flow precision (m3/sec) to use
+
+        The pump heads come from the pump_train for the flow_list"""
+        train = self.pump_train(flow_list)
         if flow_list[0] <= 0:
             lower_bound = flow_list[1] * 0.1
         else:
@@ -220,31 +537,76 @@ class Pipeline:
 
         def _system_head(Q):
             """Wrapper that returns only the slurry system head"""
-            return self.calc_system_head(Q)[0]
+            return self.calc_system_head(Q, train)[0]
+        t0 = SolverTelemetry.start()
         result = scipy.optimize.minimize_scalar(_system_head,
                                                 bounds=[lower_bound, flow_list[-1]],
                                                 method='Bounded')
+        if t0 is not None:
+            SolverTelemetry.record('Pipeline.qimin', result.nit, result.success, 0.0, t0)
         # print(f'qimin (scipy): x: {result.x} imin: {result.fun} success: {result.success} in {result.nit} iters. '
         #       f'Message: {result.message}')
         return result.x
 
-    def find_operating_point(self, flow_list, precision=0.02):
+    @memoized
+    def find_operating_point(self, flow_list, precision=0.02, q_start=None):
         """Find the operating point (intersection above qimin) using scipy.optimize
 
                 flow_list is a list of flowrates (m3/sec) to consider
                 precision is the flow precision (m3/sec) to use
+                q_start is an optional starting flow (m3/sec), such as the operating point of a similar pipeline
                 Return the operating point flow (m3/sec) or qimin if no intersection
+
+                If all the pumps have smooth curves (Pump.curve_fit), use Newton's method with the
+                system_head_slope, otherwise use the secant method. The pump heads come from the
+                pump_train for the flow_list.
+
+                With a q_start the secant method starts there on the pumps themselves, skipping the qimin
+                search. The result is kept if the system curve is above the pump curve just past it (the
+                intersection above qimin), otherwise the full search is made.
                 """
+        def _exact_head_gap(q):
+            """Wrapper to return the pipe - pump head gap at a certain flow, evaluating each pump"""
+            Htot_m, _, _, Hpumps_m = self.calc_system_head(q)
+            return Htot_m - Hpumps_m
+
+        t0 = SolverTelemetry.start()
+        if q_start is not None and self.pumps:
+            result = scipy.optimize.root_scalar(_exact_head_gap, x0=q_start, x1=q_start*1.001)
+            if result.converged and result.root > 0 and _exact_head_gap(result.root*1.001) > 0:
+                if t0 is not None:
+                    SolverTelemetry.record('Pipeline.find_operating_point', result.iterations, True,
+                                           _exact_head_gap(result.root), t0, 'q_start')
+                return result.root
+
         qimin = self.qimin(flow_list)
-        imins = self.calc_system_head(qimin)
+        train = self.pump_train(flow_list)
+        imins = self.calc_system_head(qimin, train)
         if imins[0] > imins[3]:
             raise OperatingPointError('PipeObj.Pipeline.find_operating_point: Pump curve below system curve at qimin')
 
         def _head_gap(q):
             """Wrapper to return the pipe - pump head gap at a certain flow"""
-            Htot_m, _, _, Hpumps_m = self.calc_system_head(q)
+            Htot_m, _, _, Hpumps_m = self.calc_system_head(q, train)
             return Htot_m - Hpumps_m
-        result = scipy.optimize.root_scalar(_head_gap, x0=qimin, x1=(qimin + flow_list[-1])/2)
+
+        if self.pumps and all(p.curve_fit for p in self.pumps):
+            def _head_gap_slope(q):
+                """Wrapper to return the slope of the pipe - pump head gap at a certain flow"""
+                dHsystem_m, dHpumps_m = self.system_head_slope(q)
+                return dHsystem_m - dHpumps_m
+            result = scipy.optimize.root_scalar(_head_gap, x0=(qimin + flow_list[-1])/2, fprime=_head_gap_slope,
+                                                method='newton')
+        else:
+            result = scipy.optimize.root_scalar(_head_gap, x0=qimin, x1=(qimin + flow_list[-1])/2)
+        iterations = result.iterations
+        if result.converged and self.pumps:
+            # Polish the intersection of the interpolated pump train curve with the pump curves themselves
+            result = scipy.optimize.root_scalar(_exact_head_gap, x0=result.root, x1=result.root*1.0001)
+            iterations += result.iterations
+        if t0 is not None:
+            SolverTelemetry.record('Pipeline.find_operating_point', iterations, result.converged,
+                                   _exact_head_gap(result.root) if self.pumps else _head_gap(result.root), t0)
         # print(f'Operating Point (scipy): Op point: {result.root} success: {result.converged} '
         #       f'in {result.iterations} iters, flag: {result.flag}')
         if result.converged:
@@ -253,6 +615,145 @@ class Pipeline:
             raise OperatingPointError(f'PipeObj.Pipeline.find_operating_point: {result.root:0.3e} '
                                       f'is not an operating point. Flag: {result.flag}')
 
+    def production_curve(self, Cv_list, flow_list=None):
+        """Calculate the operating point and production for a range of concentrations, stopping at the LDV
+
+        Cv_list is a list of delivered volumetric concentrations (-), usually low to high
+        flow_list is a list of flowrates (m3/sec) to consider, default the flow_list of the pipeline
+
+        The Cv is changed in place on the pipeline slurry and the slurry for each diameter, so their GSDs are
+        reused, and each operating point is warm started from the previous one. The curve stops at the first
+        Cv where there is no operating point, or the velocity in any pipe is below the LDV for that diameter.
+        The pipeline Cv is restored at the end.
+
+        Returns a dict of lists: {'Cv': delivered concentration (-),
+                                  'Cvi': insitu concentration (-),
+                                  'flow': operating point flow (m3/sec),
+                                  'velocity': velocity in the discharge pipe (m/sec),
+                                  'LDV': LDV in the discharge pipe (m/sec),
+                                  'production': insitu production (m3/hr)}"""
+        if flow_list is None:
+            flow_list = self.flow_list
+        Cv_orig = self.slurry.Cv
+        slurries = [self.slurry] + [s for s in self.slurries.values() if s is not self.slurry]
+        discharge = self.pipesections[-1]
+        result = {'Cv': [], 'Cvi': [], 'flow': [], 'velocity': [], 'LDV': [], 'production': []}
+        q_start = None
+        try:
+            for Cv in Cv_list:
+                for s in slurries:
+                    s.Cv = Cv
+                try:
+                    qop = self.find_operating_point(flow_list, q_start=q_start)
+                except OperatingPointError:
+                    break
+                LDVs = {Dp: DHLLDV_framework.LDV(1, Dp, s.D50, s.epsilon, s.nu, s.rhol, s.rhos, Cv)
+                        for Dp, s in self.slurries.items()}
+                if any(Pipe(diameter=Dp).velocity(qop) < LDV for Dp, LDV in LDVs.items()):
+                    break
+                result['Cv'].append(Cv)
+                result['Cvi'].append(self.slurry.Cvi)
+                result['flow'].append(qop)
+                result['velocity'].append(discharge.velocity(qop))
+                result['LDV'].append(LDVs[discharge.diameter])
+                result['production'].append(self.slurry.Cvi * qop * 60 * 60)
+                if len(result['flow']) > 1:
+                    # Extrapolate the last two points for the next start
+                    q0, q1 = result['flow'][-2:]
+                    Cv0, Cv1 = result['Cv'][-2:]
+                    q_start = q1 + (q1 - q0) * (Cv_list[len(result['Cv'])] - Cv1) / (Cv1 - Cv0) \
+                        if len(result['Cv']) < len(Cv_list) and Cv1 != Cv0 else q1
+                else:
+                    q_start = qop
+        finally:
+            for s in slurries:
+                s.Cv = Cv_orig
+        return result
+
+    def parameter(self, name):
+        """Return the value of a sensitivity parameter, see sensitivity"""
+        if name not in self.sensitivity_parameters:
+            raise ValueError(f"PipeObj.Pipeline: Unknown sensitivity parameter '{name}', "
+                             f"use one of {self.sensitivity_parameters}")
+        if name == 'musf':
+            return ModelOptions.current().musf
+        if name == 'speed':
+            return 1.0
+        return getattr(self.slurry, name)
+
+    def perturbed(self, name, value):
+        """Return a copy of the pipeline with one sensitivity parameter changed, see sensitivity
+
+        The pipes are shared. For the slurry parameters the slurries are copied, so the copies share the GSD
+        unless D50 is changed. For 'speed' the pumps are copied with their speeds scaled by value. For 'musf'
+        the pipeline is not changed, evaluate it with DHLLDV_framework.model_options(musf=value)."""
+        self.parameter(name)
+        pl = copy(self)
+        pl._memo = OrderedDict()
+        pl._pump_train = None
+        if name == 'speed':
+            pl.pipesections = [copy(p) if isinstance(p, Pump) else p for p in self.pipesections]
+            for p in pl.pumps:
+                p.current_speed = p.current_speed * value
+        elif name != 'musf':
+            pl._slurry = copy(self.slurry)
+            setattr(pl._slurry, name, value)
+            pl.slurries = {}
+            for Dp, s in self.slurries.items():
+                pl.slurries[Dp] = pl._slurry if s is self.slurry else copy(s)
+                setattr(pl.slurries[Dp], name, value)
+        return pl
+
+    def sensitivity(self, names, flow_list=None, rel_step=0.01, central=True, processes=1):
+        """Calculate the Jacobian of the operating point and production with respect to parameters
+
+        names is a list of parameters from sensitivity_parameters: 'Cv', 'D50', 'epsilon' (pipe roughness),
+              'musf' (sliding friction coefficient) and 'speed' (ratio to the current speed of all pumps)
+        flow_list is a list of flowrates (m3/sec) to consider, default the flow_list of the pipeline
+        rel_step is the step as a fraction of each parameter value
+        central: True for central differences, False for forward differences (half the evaluations)
+        processes is the number of processes to evaluate the perturbed pipelines in, 1 to evaluate here
+
+        The perturbed pipelines share the pipes, and the slurry GSDs where they can (see perturbed), and each
+        operating point is warm started from the base operating point. If a pump is at its max_driver_speed,
+        the 'speed' derivative is a backward difference.
+        returns a tuple: (numpy array of the base (Q_op (m3/sec), H_op (m), production (insitu m3/hr)),
+                          numpy array of the Jacobian, a row for each of Q_op, H_op, production and a
+                          column for each parameter in names)"""
+        if flow_list is None:
+            flow_list = self.flow_list
+        values = [self.parameter(name) for name in names]
+        qop = self.find_operating_point(flow_list)
+        base = np.array([qop, self.calc_system_head(qop)[0], self.slurry.Cvi * qop * 60 * 60])
+        steps = [rel_step * v for v in values]
+        offsets = []    # The (high, low) step multiples for each parameter, 0 is the base point
+        for name in names:
+            at_max_speed = name == 'speed' and any(p.current_speed * (1 + rel_step) > p.max_driver_speed
+                                                   for p in self.pumps)
+            offsets.append((0, -1) if at_max_speed else (1, -1) if central else (1, 0))
+        jobs = [(name, v + o * h) for name, v, h, os in zip(names, values, steps, offsets) for o in os if o]
+        options = ModelOptions.current()    # The workers do not inherit the current options or settings
+        settings = SolverSettings.current()
+        if processes == 1:
+            try:
+                points = [_operating_point(self, name, v, flow_list, qop, options, settings) for name, v in jobs]
+            finally:
+                for p in self.pumps:
+                    p.slurry = self.slurry
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [executor.submit(_operating_point, self, name, v, flow_list, qop, options, settings)
+                           for name, v in jobs]
+                points = [f.result() for f in futures]
+        points = iter(np.array(points))
+        jacobian = np.zeros((3, len(names)))
+        for i, (h, (high, low)) in enumerate(zip(steps, offsets)):
+            y_high = next(points) if high else base
+            y_low = next(points) if low else base
+            jacobian[:, i] = (y_high - y_low) / ((high - low) * h)
+        return base, jacobian
+
+    @memoized
     def hydraulic_gradient(self, Q):
         """Calculate the hydraulic gradient of the pipe at the given flow
 
@@ -285,3 +786,85 @@ class Pipeline:
         head_list_m.reverse()
         elev_list.reverse()
         return loc_list, head_list_m, elev_list
+
+
+def _operating_point(pipeline, name, value, flow_list, q_start, options=None, settings=None):
+    """Return the (Q_op, H_op, production) of the pipeline with a sensitivity parameter changed
+
+    name, value: the parameter name and value, see Pipeline.perturbed
+    q_start: the flow (m3/sec) to start the operating point search from
+    options: the ModelOptions to evaluate with, None for the current options
+    settings: the SolverSettings to evaluate with, None for the current settings"""
+    pl = pipeline.perturbed(name, value)
+    with DHLLDV_framework.model_options(options, **({'musf': value} if name == 'musf' else {})):
+        with DHLLDV_framework.solver_settings(settings):
+            qop = pl.find_operating_point(flow_list, q_start=q_start)
+            Hop = pl.calc_system_head(qop)[0]
+    return qop, Hop, pl.slurry.Cvi * qop * 60 * 60
+
+
+class PipelineTemplate:
+    """A Pipeline where some section fields are functions of named parameters, such as the dig depth
+
+    pipeline: the Pipeline, its sections are updated in place so its slurries, pumps and pump train are kept
+    params: dict {name: value} of the parameters
+    rules: dict {(section index, field name): function of parameters}, the argument names of each function
+           are the parameters it depends on. For example a ladder with the pump 10 m along a 30 m ladder:
+           {(0, 'elev_change'): lambda dig_depth: -dig_depth,
+            (1, 'elev_change'): lambda dig_depth, MP_elev: (MP_elev + dig_depth) * 10 / 30}
+
+    The diameter can not be a parameter, a new diameter needs a new slurry."""
+    def __init__(self, pipeline, params, rules):
+        self.pipeline = pipeline
+        self.params = dict(params)
+        self.rules = {}     # {(section index, field name): (function, [parameter names])}
+        self._depends = {}  # {parameter name: [(section index, field name), ...]}
+        for (i, field), func in rules.items():
+            section = pipeline.pipesections[i]
+            if field == 'diameter' or field not in [f.name for f in fields(section)]:
+                raise ValueError(f"PipeObj.PipelineTemplate: '{field}' of {section.name} can not be a parameter")
+            args = list(signature(func).parameters)
+            missing = [a for a in args if a not in self.params]
+            if missing:
+                raise ValueError(f"PipeObj.PipelineTemplate: Unknown parameters {missing} for {field} of "
+                                 f"{section.name}")
+            self.rules[(i, field)] = (func, args)
+            for a in args:
+                self._depends.setdefault(a, []).append((i, field))
+        self._apply(self.rules)
+
+    def _apply(self, keys):
+        """Set the (section index, field name) keys from their rules"""
+        for i, field in keys:
+            func, args = self.rules[(i, field)]
+            setattr(self.pipeline.pipesections[i], field, func(*[self.params[a] for a in args]))
+
+    def update(self, **params):
+        """Set the given parameters and update only the section fields that depend on the changed ones
+
+        returns a list of the (section index, field name) that were updated"""
+        unknown = [k for k in params if k not in self.params]
+        if unknown:
+            raise ValueError(f'PipeObj.PipelineTemplate.update: Unknown parameters {unknown}')
+        changed = [k for k, v in params.items() if self.params[k] != v]
+        self.params.update(params)
+        keys = list(dict.fromkeys(key for name in changed for key in self._depends.get(name, [])))
+        self._apply(keys)
+        return keys
+
+    def sweep(self, name, values, evaluate):
+        """Evaluate the pipeline over a range of one parameter, the parameter is restored at the end
+
+        name: the parameter name
+        values: list of the values of the parameter
+        evaluate: function of the Pipeline, such as lambda pl: pl.find_operating_point(flow_list)
+        returns a list of the results of evaluate for each value"""
+        orig = self.params[name]
+        try:
+            results = []
+            for v in values:
+                self.update(**{name: v})
+                results.append(evaluate(self.pipeline))
+            return results
+        finally:
+            self.update(**{name: orig})
@@ -0,0 +1,255 @@
+"""
+PipelineDesign - Search pipeline variants (discharge diameter, pump speed, booster count) for the best design
+
+The candidates are built from a base Pipeline, all the candidates with the same discharge diameter share the
+Slurry objects for each pipe diameter, so their GSD is built once. Candidates are evaluated in groups of the same
+discharge diameter, optionally in parallel processes.
+
+optimize_speeds finds the pump speeds for an existing Pipeline that keep the velocity a margin above the LDV
+with the least total power.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from dataclasses import dataclass, replace
+from itertools import product
+
+import numpy as np
+import scipy.optimize
+
+from DHLLDV import DHLLDV_framework
+from DHLLDV.PipeObj import Pipe, Pipeline, OperatingPointError
+from DHLLDV.PumpObj import Pump
+
+
+@dataclass
+class DesignCandidate:
+    """One pipeline variant to evaluate"""
+    discharge_diameter: float   # m, replaces the diameter of the pipes with the base discharge diameter
+    speed_ratio: float = 1.0    # current_speed / design_speed for all pumps
+    num_boosters: int = 0       # booster pumps evenly spaced along the last pipe section
+
+
+@dataclass
+class DesignResult:
+    """The operating point of a DesignCandidate"""
+    candidate: DesignCandidate
+    flow: float = 0.0               # m3/sec
+    velocity: float = 0.0           # m/sec in the discharge pipe
+    LDV: float = 0.0                # m/sec, the LDV in the discharge pipe
+    production: float = 0.0         # insitu m3/hr
+    power: float = 0.0              # kW, total for all pumps
+    feasible: bool = False          # True if there is an operating point and all pipes are above the LDV
+    message: str = ''
+
+    @property
+    def specific_energy(self):
+        """The energy per unit of insitu production in kWh/m3, infinite if there is no production"""
+        return self.power / self.production if self.production > 0 else float('inf')
+
+
+@dataclass
+class SpeedSolution:
+    """The pump speeds with the least total power at a target flow"""
+    speeds: list                # Hz, the speed of each pump in line
+    flow: float = 0.0           # m3/sec, the target flow
+    velocity: float = 0.0       # m/sec in the discharge pipe
+    LDV: float = 0.0            # m/sec, the LDV in the discharge pipe
+    power: float = 0.0          # kW, total for all pumps
+    feasible: bool = False      # True if the pumps can make the target flow as a stable operating point
+    message: str = ''
+
+
+def _LDVs(pipeline):
+    """Return a dict {diameter: LDV (m/sec)} for the pipe diameters in the pipeline"""
+    return {Dp: DHLLDV_framework.LDV(1, Dp, s.D50, s.epsilon, s.nu, s.rhol, s.rhos, s.Cv)
+            for Dp, s in pipeline.slurries.items()}
+
+
+def build_candidate(base, candidate, booster=None):
+    """Return a new Pipeline for the candidate, the base pipeline is not changed
+
+    base: the base Pipeline
+    candidate: a DesignCandidate
+    booster: the Pump to use as a booster, required if candidate.num_boosters > 0"""
+    base_dia = base.pipesections[-1].diameter
+    sections = []
+    for p in base.pipesections:
+        if isinstance(p, Pipe) and p.diameter == base_dia:
+            sections.append(replace(p, diameter=candidate.discharge_diameter))
+        else:
+            sections.append(copy(p))
+    if candidate.num_boosters > 0:
+        if booster is None:
+            raise ValueError('PipelineDesign.build_candidate: A booster Pump is needed for num_boosters > 0')
+        last = sections.pop()
+        n = candidate.num_boosters + 1
+        for i in range(n):
+            sections.append(replace(last, name=f'{last.name} {i + 1}', length=last.length / n,
+                                    total_K=last.total_K / n, elev_change=last.elev_change / n))
+            if i < candidate.num_boosters:
+                pump = copy(booster)    # replace would reset the impeller and driver in __post_init__
+                pump.name = f'{booster.name} {i + 1}'
+                sections.append(pump)
+    for p in sections:
+        if isinstance(p, Pump):
+            p.current_speed = p.design_speed * candidate.speed_ratio
+    slurry = copy(base.slurry)
+    slurry.Dp = candidate.discharge_diameter
+    return Pipeline(name=f'{base.name} {candidate}', pipe_list=sections, slurry=slurry)
+
+
+def evaluate_candidate(pipeline, candidate, flow_list):
+    """Find the operating point, production and power of a candidate pipeline
+
+    pipeline: the Pipeline built for the candidate
+    candidate: the DesignCandidate
+    flow_list: list of flowrates (m3/sec) to consider
+    returns a DesignResult"""
+    try:
+        qop = pipeline.find_operating_point(flow_list)
+    except OperatingPointError as e:
+        return DesignResult(candidate, message=f'{e}')
+    slurry = pipeline.slurry
+    discharge = pipeline.pipesections[-1]
+    LDVs = _LDVs(pipeline)
+    below = [Dp for Dp, LDV in LDVs.items() if Pipe(diameter=Dp).velocity(qop) < LDV]
+    return DesignResult(candidate,
+                        flow=qop,
+                        velocity=discharge.velocity(qop),
+                        LDV=LDVs[discharge.diameter],
+                        production=slurry.Cvi * qop * 60 * 60,
+                        power=sum(p.point(qop)[2] for p in pipeline.pumps),
+                        feasible=not below,
+                        message=f'Below the LDV in the {below} m pipes' if below else '')
+
+
+def evaluate_group(base, candidates, booster=None, flow_velocities=None, slurries=None):
+    """Evaluate candidates with the same discharge diameter, sharing the slurry for each pipe diameter
+
+    base: the base Pipeline
+    candidates: a list of DesignCandidates, all with the same discharge_diameter
+    booster: the booster Pump, see build_candidate
+    flow_velocities: list of discharge velocities (m/sec) to consider, default the base slurry vls_list
+    slurries: dict {diameter: Slurry} of slurries to share, updated with any new diameters
+    returns a list of DesignResult in the same order as candidates"""
+    if flow_velocities is None:
+        flow_velocities = base.slurry.vls_list
+    if slurries is None:
+        slurries = {}
+    results = []
+    for c in candidates:
+        pipeline = build_candidate(base, c, booster)
+        for Dp in pipeline.slurries:
+            pipeline.slurries[Dp] = slurries.setdefault(Dp, pipeline.slurries[Dp])
+        flow_list = [pipeline.pipesections[-1].flow(v) for v in flow_velocities]
+        results.append(evaluate_candidate(pipeline, c, flow_list))
+    return results
+
+
+def optimize_design(base, diameters, speed_ratios=(1.0,), booster_counts=(0,), booster=None,
+                    objective='production', processes=1):
+    """Search all combinations of discharge diameter, pump speed and booster count for the best design
+
+    base: the base Pipeline
+    diameters: list of discharge diameters (m) to consider
+    speed_ratios: list of pump speed ratios (current_speed / design_speed) to consider
+    booster_counts: list of the number of booster pumps to consider
+    booster: the booster Pump, required if any booster count > 0
+    objective: 'production' for the maximum production, 'specific_energy' for the minimum kWh/m3
+    processes: the number of processes to evaluate the candidates in, 1 to evaluate in this process
+
+    Only candidates that have an operating point above the LDV in every pipe are considered. In one process the
+    slurry for each pipe diameter is shared by all candidates, in parallel by the candidates in each process.
+    returns a tuple: (The best DesignResult or None if no candidate is feasible,
+                      list of DesignResult for all candidates)"""
+    objectives = {'production': lambda r: -r.production,
+                  'specific_energy': lambda r: r.specific_energy}
+    if objective not in objectives:
+        raise ValueError(f"PipelineDesign.optimize_design: Unknown objective '{objective}', "
+                         f"use one of {list(objectives)}")
+    flow_velocities = base.slurry.vls_list
+    groups = [[DesignCandidate(d, s, n) for s, n in product(speed_ratios, booster_counts)] for d in diameters]
+    if processes == 1:
+        slurries = {}
+        group_results = [evaluate_group(base, g, booster, flow_velocities, slurries) for g in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(evaluate_group, base, g, booster, flow_velocities) for g in groups]
+            group_results = [f.result() for f in futures]
+    results = [r for g in group_results for r in g]
+    feasible = [r for r in results if r.feasible]
+    best = min(feasible, key=objectives[objective]) if feasible else None
+    return best, results
+
+
+def optimize_speeds(pipeline, margin=0.25, n_start=None):
+    """Find the pump speeds that keep the velocity a margin above the LDV with the least total power
+
+    pipeline: the Pipeline, its pump speeds are not changed
+    margin: the velocity above the LDV (m/sec) to keep in every pipe
+    n_start: an optional list of speeds (Hz) to start from, such as the solution at the previous Cv
+
+    The target flow is the least flow that meets the margin in every pipe diameter, so the system head is only
+    calculated once. The head and power of each pump at the target flow follow from the affinity laws, each
+    speed is bounded by its driver (the speed where the driver power runs out at the target flow). The total
+    power is minimized with SLSQP, subject to the pump heads meeting the system head.
+    returns a SpeedSolution"""
+    pumps = pipeline.pumps
+    if not pumps:
+        raise ValueError('PipelineDesign.optimize_speeds: The pipeline has no pumps')
+    LDVs = _LDVs(pipeline)
+    discharge = pipeline.pipesections[-1]
+    Q = max(Pipe(diameter=Dp).flow(LDV + margin) for Dp, LDV in LDVs.items())
+    H_system = pipeline.calc_system_head(Q)[0]
+    speeds_orig = [p.current_speed for p in pumps]
+    try:
+        n_low = []
+        n_high = []
+        for p in pumps:
+            impeller_ratio = p.current_impeller / p.design_impeller
+            low = Q / (impeller_ratio**2 * max(p.design_QH_curve)) * p.design_speed   # On the design curve
+            if p.limited == 'curve':
+                low = max(low, p.driver.minimum_speed / p.gear_ratio)
+            p.current_speed = p.max_driver_speed
+            n_low.append(low)
+            n_high.append(max(p.point(Q)[3], low))
+        n_low = np.array(n_low)
+        n_high = np.array(n_high)
+        H_max = sum(p.head(Q, n) for p, n in zip(pumps, n_high))
+        solution = SpeedSolution([float(n) for n in n_high], Q, discharge.velocity(Q), LDVs[discharge.diameter],
+                                 float(sum(p.power_required(Q, n) for p, n in zip(pumps, n_high))))
+        if H_max < H_system:
+            solution.message = (f'The pumps make {H_max:0.2f} m of the {H_system:0.2f} m system head '
+                                f'at {Q:0.3f} m3/sec')
+            return solution
+
+        def _power(x):
+            """The total power at speeds x * n_high, normalized by the power at n_high"""
+            return sum(p.power_required(Q, n) for p, n in zip(pumps, x * n_high)) / solution.power
+
+        def _head_gap(x):
+            """The pump head over the system head at speeds x * n_high, normalized by the system head"""
+            return sum(p.head(Q, n) for p, n in zip(pumps, x * n_high)) / H_system - 1
+
+        x0 = np.ones(len(pumps)) if n_start is None else np.clip(np.asarray(n_start) / n_high, n_low / n_high, 1)
+        if _head_gap(x0) < 0:
+            x0 = np.ones(len(pumps))
+        bounds = list(zip(n_low / n_high, np.ones(len(pumps))))
+        result = scipy.optimize.minimize(_power, x0, method='SLSQP', bounds=bounds,
+                                         constraints=[{'type': 'ineq', 'fun': _head_gap}],
+                                         options={'ftol': 1e-9})
+        if not result.success or _head_gap(result.x) < -1e-6:
+            solution.message = f'Speed optimization failed: {result.message}'
+            return solution
+        solution.speeds = [float(n) for n in result.x * n_high]
+        solution.power = float(_power(result.x) * solution.power)
+        for p, n in zip(pumps, solution.speeds):
+            p.current_speed = n
+        dH_system, dH_pumps = pipeline.system_head_slope(Q)
+        solution.feasible = bool(dH_system > dH_pumps)
+        if not solution.feasible:
+            solution.message = f'The operating point at {Q:0.3f} m3/sec is unstable, it is below the minimum friction'
+        return solution
+    finally:
+        for p, n in zip(pumps, speeds_orig):
+            p.current_speed = n
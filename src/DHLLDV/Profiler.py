@@ -0,0 +1,216 @@
+"""
+Profiler - Count the calls and time of the public functions and methods of the DHLLDV modules
+
+Profiling installs timing wrappers on the public (not underscore) functions of the profiled modules and the
+public methods of the classes defined in them, and removes them when done, so there is no cost when it is off.
+References to the functions imported into other DHLLDV and Wilson modules are wrapped too.
+
+    with Profiler.profiling(trace=True) as prof:
+        pipeline.find_operating_point(flow_list)
+    prof.print_summary()
+    prof.print_callers('DHLLDV_framework.Cvt_Erhg')
+    prof.write_chrome_trace('trace.json')     # Open in chrome://tracing or https://ui.perfetto.dev
+
+Profiling can also be turned on for a whole run with the environment variable DHLLDV_PROFILE, see
+enable_from_environment. The viewer wraps its update with traced, which writes a Chrome trace of each update
+to the file named by the environment variable DHLLDV_PROFILE_TRACE.
+"""
+import atexit
+from contextlib import contextmanager
+import functools
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+from time import perf_counter
+
+module_names = ('DHLLDV.homogeneous', 'DHLLDV.heterogeneous', 'DHLLDV.stratified', 'DHLLDV.DHLLDV_framework',
+                'DHLLDV.SlurryObj', 'DHLLDV.PipeObj', 'DHLLDV.PumpObj')
+
+_active = None      # The Profile being recorded, None when profiling is off
+_patches = []       # (object, attribute name, original) of the installed wrappers
+
+
+class Profile:
+    """The calls and times recorded while profiling
+
+    stats: dict {name: [calls, total time (sec), self time (sec)]}, the total time includes the profiled functions
+           it calls, the self time does not
+    callers: dict {(caller name, name): [calls, total time (sec)]}, the caller is '<top>' for calls from code
+             that is not profiled
+    events: list of Chrome trace 'complete' events, if trace is True"""
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.stats = {}
+        self.callers = {}
+        self.events = []
+        self._stack = []    # [name, time in profiled callees] of the calls in progress
+        self._origin = perf_counter()
+
+    def add(self, name, caller, start, elapsed, child_time):
+        """Record one call"""
+        s = self.stats.setdefault(name, [0, 0.0, 0.0])
+        s[0] += 1
+        s[1] += elapsed
+        s[2] += elapsed - child_time
+        c = self.callers.setdefault((caller, name), [0, 0.0])
+        c[0] += 1
+        c[1] += elapsed
+        if self.trace:
+            self.events.append({'name': name, 'cat': name.split('.')[0], 'ph': 'X',
+                                'ts': (start - self._origin) * 1e6, 'dur': elapsed * 1e6,
+                                'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def to_dict(self):
+        """Return the stats and callers as a JSON serializable dict"""
+        return {'stats': {name: {'calls': s[0], 'total_time': s[1], 'self_time': s[2]}
+                          for name, s in self.stats.items()},
+                'callers': [{'caller': caller, 'name': name, 'calls': c[0], 'total_time': c[1]}
+                            for (caller, name), c in self.callers.items()]}
+
+    def print_summary(self, top=25, sort='total'):
+        """Print the functions with the most time, sort is 'total', 'self' or 'calls'"""
+        column = {'calls': 0, 'total': 1, 'self': 2}[sort]
+        print(f'{"function":50s} {"calls":>8s} {"total ms":>11s} {"self ms":>11s}')
+        for name, s in sorted(self.stats.items(), key=lambda item: item[1][column], reverse=True)[:top]:
+            print(f'{name:50s} {s[0]:8d} {s[1]*1000:11.3f} {s[2]*1000:11.3f}')
+
+    def print_callers(self, name):
+        """Print the calls and time of a function broken down by caller"""
+        for (caller, callee), c in sorted(self.callers.items(), key=lambda item: item[1][1], reverse=True):
+            if callee == name:
+                print(f'{caller:50s} {c[0]:8d} {c[1]*1000:11.3f} ms')
+
+    def write_chrome_trace(self, fname):
+        """Write the events as a Chrome trace JSON file, requires profiling with trace=True"""
+        with open(fname, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+def _wrap(name, func):
+    """Return a wrapper that records the calls of func in the active Profile"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _active
+        if profile is None:
+            return func(*args, **kwargs)
+        stack = profile._stack
+        caller = stack[-1][0] if stack else '<top>'
+        frame = [name, 0.0]
+        stack.append(frame)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][1] += elapsed
+            profile.add(name, caller, start, elapsed, frame[1])
+    if hasattr(func, 'cache_clear'):     # Keep the lru_cache interface, see DHLLDV_framework.clear_caches
+        wrapper.cache_clear = func.cache_clear
+        wrapper.cache_info = func.cache_info
+    wrapper.__profiled__ = func
+    return wrapper
+
+
+def _targets():
+    """Yield (owner, attribute name, profile name, function) for the functions and methods to wrap"""
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        short = module_name.split('.')[-1]
+        for attr, obj in list(vars(module).items()):
+            if attr.startswith('_') or getattr(obj, '__module__', None) != module_name:
+                continue
+            if inspect.isclass(obj):
+                for method, func in list(vars(obj).items()):
+                    if not method.startswith('_') and inspect.isfunction(func):
+                        yield obj, method, f'{short}.{attr}.{method}', func
+            elif callable(obj):
+                yield module, attr, f'{short}.{attr}', obj
+
+
+def install():
+    """Install the wrappers, see profiling"""
+    if _patches:
+        return
+    wrappers = {}   # {id(original): wrapper}
+    for owner, attr, name, func in _targets():
+        wrapper = _wrap(name, func)
+        wrappers[id(func)] = wrapper
+        _patches.append((owner, attr, func))
+        setattr(owner, attr, wrapper)
+    # The references imported into other modules, such as "from DHLLDV.homogeneous import fluid_head_loss"
+    for module_name, module in list(sys.modules.items()):
+        if module is None or not module_name.startswith(('DHLLDV', 'Wilson')):
+            continue
+        for attr, obj in list(vars(module).items()):
+            if id(obj) in wrappers and getattr(module, attr) is obj:
+                _patches.append((module, attr, obj))
+                setattr(module, attr, wrappers[id(obj)])
+
+
+def uninstall():
+    """Remove the wrappers, restoring the original functions"""
+    while _patches:
+        owner, attr, func = _patches.pop()
+        setattr(owner, attr, func)
+
+
+@contextmanager
+def profiling(trace=False):
+    """Context manager that profiles the DHLLDV modules and yields the Profile
+
+    trace: if True keep a Chrome trace event for every call, see Profile.write_chrome_trace"""
+    global _active
+    if _active is not None:
+        raise RuntimeError('Profiler.profiling: Profiling is already on')
+    install()
+    _active = Profile(trace)
+    try:
+        yield _active
+    finally:
+        profile, _active = _active, None
+        uninstall()
+        profile._stack.clear()
+
+
+def enable_from_environment():
+    """Profile the whole run if the environment variable DHLLDV_PROFILE is set
+
+    The summary is printed at exit. If DHLLDV_PROFILE is the name of a .json file, a Chrome trace is written
+    to it. Called when the DHLLDV package is imported."""
+    global _active
+    setting = os.environ.get('DHLLDV_PROFILE')
+    if not setting or _active is not None:
+        return
+    trace_fname = setting if setting.endswith('.json') else None
+    install()
+    _active = Profile(trace=trace_fname is not None)
+
+    def _report(profile=_active):
+        profile.print_summary()
+        if trace_fname:
+            profile.write_chrome_trace(trace_fname)
+    atexit.register(_report)
+
+
+def traced(func):
+    """Decorator to write a Chrome trace of each call of func to the file named by DHLLDV_PROFILE_TRACE
+
+    If DHLLDV_PROFILE_TRACE is not set when func is decorated, func is returned unchanged"""
+    trace_fname = os.environ.get('DHLLDV_PROFILE_TRACE')
+    if not trace_fname:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _active is not None:
+            return func(*args, **kwargs)
+        with profiling(trace=True) as profile:
+            result = func(*args, **kwargs)
+        profile.write_chrome_trace(trace_fname)
+        return result
+    return wrapper
@@ -4,11 +4,14 @@ PumpObj: Object to simulate a pump and driver
 Added by R. Ramsdell 03 September, 2021
 """
 from dataclasses import dataclass, fields
+import warnings
 
+import numpy as np
 import scipy.optimize
 
+from DHLLDV import head_reduction, SolverSettings, SolverTelemetry
 from DHLLDV.DHLLDV_constants import gravity
-from DHLLDV.DHLLDV_Utils import interpDict
+from DHLLDV.DHLLDV_Utils import interpDict, smoothCurve, fingerprint
 from DHLLDV.DriverObj import Driver
 from DHLLDV.SlurryObj import Slurry
 
@@ -29,6 +32,9 @@ class Pump:
     driver_name: str or None = None
     gear_ratio: float = 1.0
     slurry: Slurry = None
+    curve_fit: str or None = None   # None for piecewise linear curves, 'pchip' or 'poly' for smooth curves
+    head_derating: str or None = None   # None for no solids effect on head, 'WACS2' or 'WACS3' for the Hr table
+    design_NPSHr_curve: interpDict or None = None  # dict {flow (m/sec): NPSH required (m)}, None if not known
 
     def __post_init__(self):
         if self.slurry is None:
@@ -36,6 +42,11 @@ class Pump:
         self._current_speed = self.design_speed
         self._current_impeller = self.design_impeller
         self._max_driver_speed = self.design_speed  # The speed at max power or the power curve basis
+        self._scaled_curves = None  # (speed, impeller, QH curve, QP curve) at the current speed & impeller
+        self._head_ratio = None     # (slurry and impeller key, head ratio)
+        if self.curve_fit and not isinstance(self.design_QH_curve, smoothCurve):
+            self.design_QH_curve = smoothCurve(dict(self.design_QH_curve), fit=self.curve_fit)
+            self.design_QP_curve = smoothCurve(dict(self.design_QP_curve), fit=self.curve_fit)
         self.design_QH_curve.extrapolate_high = True
         self.design_QP_curve.extrapolate_high = True
         if self.limited != 'curve':
@@ -64,6 +75,18 @@ class Pump:
         s.append(')')
         return ''.join(s)
 
+    def fingerprint(self, with_slurry=True):
+        """Return a stable hash of the pump, driver, curves, speeds and impeller, see DHLLDV_Utils.fingerprint
+
+        with_slurry: include the slurry, False when the slurry is set by a Pipeline"""
+        return fingerprint(self.design_speed, self.design_impeller, self.suction_dia, self.disch_dia,
+                           self.design_QH_curve.fingerprint(), self.design_QP_curve.fingerprint(),
+                           self.avail_power, self.limited, self.driver.fingerprint() if self.driver else None,
+                           self.gear_ratio, self.curve_fit, self.head_derating,
+                           self.design_NPSHr_curve.fingerprint() if self.design_NPSHr_curve else None,
+                           self._current_speed, self._current_impeller, self._max_driver_speed,
+                           self.slurry.fingerprint() if with_slurry else None)
+
     def efficiency(self, q):
         """Return the efficiency of the pump based on the current speed"""
         Q, H, P, N = self.point(q)
@@ -83,6 +106,7 @@ class Pump:
             print(f'WARNING: Setting current speed of {N:0.4f} to greater than max_driver_speed of '
                   f'{self._max_driver_speed:0.4f}')
         self._current_speed = N
+        self._scaled_curves = None
 
     @property
     def max_driver_speed(self):
@@ -96,6 +120,7 @@ class Pump:
         N: New speed in Hz"""
         self._max_driver_speed = N
         self._current_speed = self._max_driver_speed
+        self._scaled_curves = None
 
     @property
     def current_impeller(self):
@@ -108,6 +133,53 @@ class Pump:
 
         impeller: New impeller in m"""
         self._current_impeller = impeller
+        self._scaled_curves = None
+
+    @property
+    def scaled_curves(self):
+        """The QH and QP curves at the current speed and impeller, in a tuple of interpDicts
+
+        The design curves are scaled with the affinity laws for trimmed impellers (WACS 3rd Edition page 207),
+        the scaled power is per unit density. The curves are built on first use and reused until the current
+        speed or impeller changes."""
+        key = (self._current_speed, self._current_impeller)
+        if self._scaled_curves is None or self._scaled_curves[:2] != key:
+            speed_ratio = self._current_speed / self.design_speed
+            impeller_ratio = self._current_impeller / self.design_impeller
+            flow_ratio = speed_ratio * impeller_ratio**2
+            QH = self.design_QH_curve.scaled(flow_ratio, speed_ratio**2 * impeller_ratio**2)
+            QP = self.design_QP_curve.scaled(flow_ratio, speed_ratio**3 * impeller_ratio**5)
+            self._scaled_curves = key + (QH, QP)
+        return self._scaled_curves[2:]
+
+    def head_ratio(self, water=False):
+        """Return the slurry head ratio HR = Hm/Hw (-) for the head_derating table, see head_reduction
+
+        Returns 1 on water or if there is no head_derating. The ratio depends only on the slurry and
+        the impeller, so it is kept until one of them changes."""
+        if water or not self.head_derating:
+            return 1.0
+        key = (self.head_derating, self.slurry.D50, self.slurry.Cv, self.slurry.rhos / self.slurry.rhol,
+               self._current_impeller)
+        if self._head_ratio is None or self._head_ratio[0] != key:
+            self._head_ratio = (key, float(head_reduction.head_ratio(self.slurry.D50, self.slurry.Cv,
+                                                                     self._current_impeller,
+                                                                     self.slurry.rhos / self.slurry.rhol,
+                                                                     self.head_derating)))
+        return self._head_ratio[1]
+
+    def NPSHr(self, Q, n=None):
+        """Return the NPSH required (m) at the given flow and speed, 0 if there is no design_NPSHr_curve
+
+        Q is a flow or array of flows in m3/sec
+        n is the pump speed (or array of speeds) in Hz, default the current speed
+        Uses the affinity laws, NPSHr scales with the speed squared and the flow with the speed. Impeller
+        trims are assumed not to change the NPSHr at the same flow."""
+        Q = np.asarray(Q, dtype=float)
+        if self.design_NPSHr_curve is None:
+            return np.zeros(Q.shape)
+        speed_ratio = np.asarray(self._current_speed if n is None else n, dtype=float) / self.design_speed
+        return self.design_NPSHr_curve.interp(Q / speed_ratio) * speed_ratio**2
 
     def power_required(self, Q, n, water=False):
         """Calculate the power required (kW) at the given flow and speed
@@ -121,12 +193,59 @@ class Pump:
             rho = self.slurry.rhom
         if n == 0:
             return 0
+        if n == self._current_speed:
+            return self.scaled_curves[1][Q] * rho
         speed_ratio = n / self.design_speed
         impeller_ratio = self.current_impeller / self.design_impeller
         Q0 = Q / (speed_ratio * impeller_ratio ** 2)  # Use affinity law for trimmed impeller, WACS 3rd Edition page 207
         P0 = self.design_QP_curve[Q0]
         return P0 * speed_ratio**3 * impeller_ratio**5 * rho
 
+    def head(self, Q, n, water=False):
+        """Calculate the head (m water column) at the given flow and speed, without the driver limits
+
+        Q is flow in m3/sec
+        n is pump speed in Hz
+        water is True if calculating for the carrier fluid, False if for slurry"""
+        if n == 0:
+            return 0
+        rho = self.slurry.rhol if water else self.slurry.rhom
+        speed_ratio = n / self.design_speed
+        impeller_ratio = self.current_impeller / self.design_impeller
+        Q0 = Q / (speed_ratio * impeller_ratio ** 2)  # Use affinity law for trimmed impeller, WACS 3rd Edition page 207
+        return self.design_QH_curve[Q0] * speed_ratio**2 * impeller_ratio**2 * rho * self.head_ratio(water)
+
+    def power_required_array(self, Q, n, water=False):
+        """Vectorized version of power_required, calculate the power required (kW) at arrays of flow and speed
+
+        Q is an array of flows in m3/sec
+        n is an array of pump speeds in Hz (or a single speed)
+        water is True if calculating for the carrier fluid, False if for slurry
+        returns an array of power in kW, 0 where the speed is 0"""
+        if water:
+            rho = self.slurry.rhol
+        else:
+            rho = self.slurry.rhom
+        Q = np.asarray(Q, dtype=float)
+        if self._current_speed != 0 and np.all(np.asarray(n) == self._current_speed):
+            return self.scaled_curves[1].interp(Q) * rho
+        speed_ratio = np.broadcast_to(np.asarray(n, dtype=float) / self.design_speed, Q.shape)
+        impeller_ratio = self.current_impeller / self.design_impeller
+        P = np.zeros(Q.shape)
+        running = speed_ratio != 0
+        Q0 = Q[running] / (speed_ratio[running] * impeller_ratio ** 2)  # Affinity law, WACS 3rd Edition page 207
+        P[running] = self.design_QP_curve.interp(Q0) * speed_ratio[running]**3 * impeller_ratio**5 * rho
+        return P
+
+    def power_available_array(self, n):
+        """Vectorized version of power_available, return the available power (kW) at an array of speeds (Hz)"""
+        n = np.asarray(n, dtype=float)
+        match self.limited:
+            case 'curve':
+                return self.driver.power(n*self.gear_ratio)
+            case _:
+                return np.broadcast_to(self.power_available(n), n.shape).astype(float)
+
     def power_available(self, n):
         """Return the available power at the given speed"""
         match self.limited:
@@ -141,56 +260,289 @@ class Pump:
                 impeller_ratio = self.current_impeller / self.design_impeller
                 return max(self.design_QP_curve.values()) * speed_ratio**3 * impeller_ratio**5 * self.slurry.rhom + 1
 
-    def find_torque_limited_speed(self, Q, water=False):
+    @staticmethod
+    def _solver_limits(tol, max_steps, settings):
+        """Return the tol and max_steps for a speed solver, from the SolverSettings if None"""
+        settings = SolverSettings.resolve(settings)
+        return (settings.pump_tol if tol is None else tol,
+                settings.pump_max_steps if max_steps is None else max_steps)
+
+    def find_torque_limited_speed(self, Q, water=False, tol=None, settings=None):
         """Find the pump speed (Hz) at the given flow if torque limited
 
         Q is the flow rate in m3/sec
         water is True if calculating for the carrier fluid, False if for slurry
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol
         """
-
-        n_new = self._current_speed
         P = self.power_required(Q, self.current_speed, water=water)
-        Pavail = self.power_available(n_new)
+        Pavail = self.power_available(self._current_speed)
         if Pavail >= P:
-            return n_new
-        while not (-0.1 < Pavail - P < 0.1):
-            n_new *= (Pavail / P) ** 0.5
-            assert n_new > 1/60
-            P = self.power_required(Q, n_new, water=water)
-            Pavail = self.power_available(n_new)
-        return n_new
+            return self._current_speed
+        torque = self.avail_power * self.design_speed / self._max_driver_speed
+        return self.solve_limited_speed(Q, torque, 0.0, water=water, tol=tol, settings=settings)
 
-    def find_power_limited_speed(self, Q, water=False):
+    def find_power_limited_speed(self, Q, water=False, tol=None, settings=None):
         """Find the pump speed (Hz) at the given flow if power limited (constant power)
 
         Q is the flow rate in m3/sec
         water is True if calculating for the carrier fluid, False if for slurry
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol
         """
-
-        n_new = self._current_speed
         P = self.power_required(Q, self.current_speed, water=water)
-        Pavail = self.avail_power
-        if Pavail >= P:
-            return n_new
-        while not (-0.1 < Pavail - P < 0.1):
-            n_new *= (Pavail / P) ** 0.5
-            assert n_new > 1 / 60
-            P = self.power_required(Q, n_new, water=water)
-        return n_new
+        if self.avail_power >= P:
+            return self._current_speed
+        return self.solve_limited_speed(Q, 0.0, self.avail_power, water=water, tol=tol, settings=settings)
+
+    def solve_limited_speed(self, Q, torque, power, water=False, tol=None, max_steps=None, n_high=None, n_low=0.0,
+                            settings=None, exact=False):
+        """Solve for the speed (Hz) below the current speed where the required power equals the available power
+
+        The available power is torque*n/design_speed + power (kW), so a torque limit sets power=0, and a
+        power limit sets torque=0.
+
+        The design QP curve is piecewise linear, on a segment P0 = a + m*Q0. With the affinity laws
+        (s = n/design_speed, r = current_impeller/design_impeller, Q0 = Q/(s*r**2)) the power required on that
+        segment is a cubic in s:
+            Preq = rho*r**5*a*s**3 + rho*r**3*m*Q*s**2
+        Starting from the segment at the current speed, the segments are checked in order of decreasing speed,
+        and the first one with a sign change in the power gap is solved by Newton's method, safeguarded by
+        bisection on the segment bounds. Newton's method is applied to the power gap divided by s, to remove
+        the root at s=0 in the torque limited case.
+
+        Q is the flow rate in m3/sec, the required power at the current speed must exceed the available power
+        torque is the available power per unit of speed ratio (kW)
+        power is the constant available power (kW)
+        water is True if calculating for the carrier fluid, False if for slurry
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol
+        max_steps is the maximum number of Newton steps, default settings.pump_max_steps
+        n_high, n_low limit the search to a range of speeds in Hz (default from the current speed to zero), the
+          required power at n_high must exceed the available power, and not at n_low
+        settings is the SolverSettings, None for the current settings, or a preset name
+        exact: if True solve the cubic on the segment with the sign change in closed form (numpy.roots), instead
+          of by Newton's method to tol (not used with smooth curves)
+        returns the speed in Hz
+        """
+        tol, max_steps = self._solver_limits(tol, max_steps, settings)
+        if self.curve_fit:
+            return float(self.solve_limited_speed_smooth(Q, torque, power, water, tol, max_steps, n_high, n_low))
+        rho = self.slurry.rhol if water else self.slurry.rhom
+        impeller_ratio = self._current_impeller / self.design_impeller
+        s_high = (self._current_speed if n_high is None else n_high) / self.design_speed
+        s_floor = n_low / self.design_speed
+        xs, ys = self.design_QP_curve.as_arrays()
+        last = len(xs) - 2
+        k = min(max(int(np.searchsorted(xs, Q / (s_high * impeller_ratio**2), side='right')) - 1, 0), last)
+        while True:
+            m = float((ys[k+1] - ys[k]) / (xs[k+1] - xs[k]))
+            A = rho * impeller_ratio**5 * (float(ys[k]) - m*float(xs[k]))
+            B = rho * impeller_ratio**3 * m * Q
+            s_low = Q / (impeller_ratio**2 * float(xs[k+1])) if k < last else 0.0
+            if s_low <= s_floor:
+                s_low = s_floor
+                break
+            if k == last or torque*s_low + power - (A*s_low + B)*s_low**2 >= 0:
+                break
+            s_high = s_low
+            k += 1
+        t0 = SolverTelemetry.start()
+        if exact:
+            # torque*s + power = A*s**3 + B*s**2 on this segment
+            roots = np.roots([A, B, -torque, -power])
+            roots = roots.real[(np.abs(roots.imag) <= 1e-12 * np.abs(roots)) &
+                               (roots.real >= s_low * (1 - 1e-12)) & (roots.real <= s_high * (1 + 1e-12))]
+            if len(roots):
+                s = float(min(max(roots.max(), s_low), s_high))
+                if t0 is not None:
+                    SolverTelemetry.record('Pump.solve_limited_speed', 1, True,
+                                           torque*s + power - (A*s + B)*s**2, t0, self.limited)
+                return s * self.design_speed
+        s = (s_low + s_high) / 2
+        G = torque + power/s - (A*s + B)*s     # The power gap divided by s, the residual if max_steps is 0
+        for step in range(max_steps):
+            G = torque + power/s - (A*s + B)*s
+            if abs(G*s) < tol:
+                break
+            if G >= 0:
+                s_low = s
+            else:
+                s_high = s
+            dG = -power/s**2 - 2*A*s - B
+            s_newton = s - G/dG if dG != 0 else s_low
+            s = s_newton if s_low < s_newton < s_high else (s_low + s_high)/2
+        else:
+            step = max_steps
+        if t0 is not None:
+            SolverTelemetry.record('Pump.solve_limited_speed', step, step < max_steps, G*s, t0, self.limited)
+        return s * self.design_speed
 
-    def find_curve_limited_speed(self, Q, water=False):
-        """Find the pump speed (Hz) at the given flow if there is a power curve
+    def solve_limited_speed_array(self, Q, torque, power, water=False, tol=None, max_steps=None, settings=None):
+        """Vectorized version of solve_limited_speed, for an array of flows
 
-        Q is the flow rate in m3/sec
+        Each segment of the design QP curve is checked for all flows at once, and each flow is solved
+        on the first segment (in order of decreasing speed) where the power gap changes sign.
+
+        Q is an array of flow rates in m3/sec, at each flow the required power at the current speed must exceed
+          the available power
+        torque is the available power per unit of speed ratio (kW)
+        power is the constant available power (kW)
         water is True if calculating for the carrier fluid, False if for slurry
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol
+        max_steps is the maximum number of Newton steps, default settings.pump_max_steps
+        settings is the SolverSettings, None for the current settings, or a preset name
+        returns an array of speeds in Hz
         """
-        return self.find_curve_limited_speed_root_scalar(Q, water)
+        tol, max_steps = self._solver_limits(tol, max_steps, settings)
+        if self.curve_fit:
+            return self.solve_limited_speed_smooth(Q, torque, power, water, tol, max_steps)
+        rho = self.slurry.rhol if water else self.slurry.rhom
+        Q = np.asarray(Q, dtype=float)
+        impeller_ratio = self._current_impeller / self.design_impeller
+        s_current = self._current_speed / self.design_speed
+
+        xs, ys = self.design_QP_curve.as_arrays()
+        slopes = np.diff(ys) / np.diff(xs)
+        intercepts = ys[:-1] - slopes * xs[:-1]
+        q0_low = np.concatenate(([-np.inf], xs[1:-1]))
+        q0_high = np.concatenate((xs[1:-1], [np.inf]))
+
+        def _gap(s, A, B):
+            """Available minus required power at speed ratio s, divided by s"""
+            return torque + power/s - (A*s + B)*s
+
+        s_new = np.full(Q.shape, s_current)
+        unsolved = np.ones(Q.shape, dtype=bool)
+        t0 = SolverTelemetry.start()
+        total_steps, residual, unconverged = 0, 0.0, 0
+        for a, m, q_low, q_high in zip(intercepts, slopes, q0_low, q0_high):
+            if not unsolved.any():
+                break
+            A = rho * impeller_ratio**5 * a
+            B = rho * impeller_ratio**3 * m * Q
+            with np.errstate(divide='ignore', invalid='ignore'):
+                s_high = np.minimum(s_current, np.where(q_low > 0, Q / (impeller_ratio**2 * q_low), np.inf))
+                s_low = np.where(np.isfinite(q_high), Q / (impeller_ratio**2 * q_high), 0.0)
+                here = unsolved & (s_low < s_high) & ((_gap(s_low, A, B) >= 0) | np.isinf(q_high))
+            if not here.any():
+                continue
+            lo = s_low[here]
+            hi = s_high[here]
+            B = B[here]
+            s = (lo + hi) / 2
+            for step in range(max_steps):
+                G = _gap(s, A, B)
+                if (np.abs(G*s) < tol).all():
+                    break
+                lo = np.where(G >= 0, s, lo)
+                hi = np.where(G < 0, s, hi)
+                dG = -power/s**2 - 2*A*s - B
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    s_newton = s - G/dG
+                s = np.where((s_newton > lo) & (s_newton < hi), s_newton, (lo + hi) / 2)
+            else:
+                step = max_steps
+            if t0 is not None:
+                gap = np.abs(_gap(s, A, B) * s)
+                total_steps += step
+                residual = max(residual, float(gap.max()))
+                unconverged += int(np.count_nonzero(gap >= tol))
+            s_new[here] = s
+            unsolved &= ~here
+        if t0 is not None:
+            SolverTelemetry.record('Pump.solve_limited_speed_array', total_steps, unconverged == 0, residual, t0,
+                                   self.limited, unconverged)
+        return s_new * self.design_speed
+
+    def solve_limited_speed_smooth(self, Q, torque, power, water=False, tol=None, max_steps=None,
+                                   n_high=None, n_low=0.0, settings=None):
+        """Version of solve_limited_speed_array for smooth (curve_fit) pump curves
+
+        With s = n/design_speed, r = current_impeller/design_impeller and Q0 = Q/(s*r**2), the power gap divided
+        by s is
+            G(s) = torque + power/s - rho*r**5*s**2*P0(Q0)
+        and
+            dG/ds = -power/s**2 - rho*r**5*(2*s*P0(Q0) - P0'(Q0)*Q/r**2)
+        using the analytic slope of the fitted QP curve. Newton's method is safeguarded by bisection between
+        n_low (default zero) and n_high (default the current speed).
+
+        Q is a flow or array of flows in m3/sec
+        returns an array of speeds in Hz (same shape as Q)
+        """
+        tol, max_steps = self._solver_limits(tol, max_steps, settings)
+        rho = self.slurry.rhol if water else self.slurry.rhom
+        Q = np.asarray(Q, dtype=float)
+        impeller_ratio = self._current_impeller / self.design_impeller
+        lo = np.full(Q.shape, n_low / self.design_speed)
+        hi = np.full(Q.shape, (self._current_speed if n_high is None else n_high) / self.design_speed)
+        s = hi.copy()
+        G = np.zeros(Q.shape)   # The residual if max_steps is 0
+        t0 = SolverTelemetry.start()
+        for step in range(max_steps):
+            Q0 = Q / (s * impeller_ratio**2)
+            P0 = self.design_QP_curve.interp(Q0)
+            G = torque + power/s - rho * impeller_ratio**5 * s**2 * P0
+            if (np.abs(G*s) < tol).all():
+                break
+            lo = np.where(G >= 0, s, lo)
+            hi = np.where(G < 0, s, hi)
+            dG = -power/s**2 - rho * impeller_ratio**5 * (2*s*P0 - self.design_QP_curve.derivative(Q0)*Q0*s)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                s_newton = s - G/dG
+            s = np.where((s_newton > lo) & (s_newton < hi), s_newton, (lo + hi) / 2)
+        else:
+            step = max_steps
+        if t0 is not None:
+            SolverTelemetry.record('Pump.solve_limited_speed_smooth', step, step < max_steps,
+                                   float(np.max(np.abs(G*s), initial=0.0)), t0, self.limited)
+        return s * self.design_speed
+
+    def head_slope(self, Q, water=False):
+        """Return the slope of the pump curve dH/dQ (m per m3/sec) at the given flow
+
+        Uses the derivatives of the design curves, analytic for smooth (curve_fit) curves. If the pump is
+        speed limited at this flow, the change in speed with flow is included, from the implicit derivative
+        of the power gap:
+            dn/dQ = (dPreq/dQ) / (dPavail/dn - dPreq/dn)
+
+        Q: flow in m3/sec
+        water: If true return the slope for water, else for slurry"""
+        rho = self.slurry.rhol if water else self.slurry.rhom
+        _, _, _, n = self.point(Q, water=water)
+        speed_ratio = n / self.design_speed
+        impeller_ratio = self._current_impeller / self.design_impeller
+        Q0 = Q / (speed_ratio * impeller_ratio**2)
+        HR = self.head_ratio(water)
+        dHdQ = rho * HR * speed_ratio * float(self.design_QH_curve.derivative(Q0))
+        if n == self._current_speed:
+            return dHdQ
+
+        # Derivatives with respect to the speed ratio s
+        dHds = rho * HR * impeller_ratio**2 * speed_ratio * (2*self.design_QH_curve[Q0] -
+                                                        float(self.design_QH_curve.derivative(Q0))*Q0)
+        dP0 = float(self.design_QP_curve.derivative(Q0))
+        dPreq_dQ = rho * impeller_ratio**3 * speed_ratio**2 * dP0
+        dPreq_ds = rho * impeller_ratio**5 * (3*speed_ratio**2*self.design_QP_curve[Q0] - speed_ratio**2*dP0*Q0)
+        match self.limited:
+            case 'torque':
+                dPavail_ds = self.avail_power * self.design_speed / self._max_driver_speed
+            case 'curve':
+                dPavail_ds = self.driver.power_slope(n*self.gear_ratio) * self.gear_ratio * self.design_speed
+            case _:
+                dPavail_ds = 0.0
+        return dHdQ + dHds * dPreq_dQ / (dPavail_ds - dPreq_ds)
+
+    def find_curve_limited_speed(self, Q, water=False, tol=None, settings=None):
+        """Find the pump speed (Hz) at the given flow if there is a power curve
 
-    def find_curve_limited_speed_root_scalar(self, Q, water=False):
-        """Find the pump speed (Hz) at the given flow if there is a power curve, using the root scalar method
+        The driver speed points are searched by bisection for the segment where the power gap (available -
+        required) changes sign, assuming the gap is positive at low speed and changes sign once. On that segment
+        the available power is linear in the pump speed, torque*n/design_speed + power, and the speed is found
+        exactly by solve_limited_speed. With a smooth (curve_fit) driver curve the segment is solved by
+        scipy.optimize.
 
         Q is the flow rate in m3/sec
         water is True if calculating for the carrier fluid, False if for slurry
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol, only used
+          with smooth (curve_fit) pump curves
         """
         def _power_gap(n):
             """Wrapper to return the avail - required power gap at a certain speed"""
@@ -199,71 +551,155 @@ class Pump:
         if _power_gap(self.design_speed) >= 0:
             return self.design_speed
 
-        speeds = iter(sorted([p/self.gear_ratio for p in self.driver.design_power_curve.keys()], reverse=True))
-
-        n_high = next(speeds)
-        n_low = next(speeds)
-        while _power_gap(n_low) < 0:
-            n_high = n_low
-            try:
-                n_low = next(speeds)
-            except StopIteration:
-                print(f'Pump.find_curve_limited_speed: {self.name} using minimum speed for flow of {Q: 0.3f} m/sec')
-                return n_high
-
-        result = scipy.optimize.root_scalar(_power_gap,
-                                            bracket=[n_low, n_high])
-        # print(f'Operating Point (scipy): Op point: {result.root} success: {result.converged} in '
-        #       f'{result.iterations} iters, flag: {result.flag}')
-        if result.converged:
+        speeds = self.driver.speeds / self.gear_ratio
+        if _power_gap(speeds[-1]) >= 0:
+            return float(speeds[-1])
+        if _power_gap(speeds[0]) < 0:
+            print(f'Pump.find_curve_limited_speed: {self.name} using minimum speed for flow of {Q: 0.3f} m/sec')
+            return float(speeds[0])
+        i_low, i_high = 0, len(speeds) - 1
+        while i_high - i_low > 1:
+            i_mid = (i_low + i_high) // 2
+            if _power_gap(speeds[i_mid]) >= 0:
+                i_low = i_mid
+            else:
+                i_high = i_mid
+        n_low, n_high = float(speeds[i_low]), float(speeds[i_high])
+
+        if self.driver.curve_fit:
+            t0 = SolverTelemetry.start()
+            result = scipy.optimize.root_scalar(_power_gap, bracket=[n_low, n_high])
+            if t0 is not None:
+                SolverTelemetry.record('Pump.find_curve_limited_speed', result.iterations, result.converged,
+                                       _power_gap(result.root), t0)
             return result.root
+        powers = self.driver.powers
+        slope = float(powers[i_high] - powers[i_low]) / (n_high - n_low)
+        return self.solve_limited_speed(Q, slope * self.design_speed, float(powers[i_low]) - slope * n_low,
+                                        water=water, tol=tol, n_high=n_high, n_low=n_low, settings=settings,
+                                        exact=True)
 
-    def find_curve_limited_speed_old(self, Q, water=False):
-        """Find the pump speed (Hz) at the given flow if there is a power curve using a modified Newtons method
+    def find_limited_speed_array(self, Q, water=False, max_steps=None, tol=None, settings=None):
+        """Find the pump speeds (Hz) at an array of flows where the required power exceeds the available
 
-        Q is the flow rate in m3/sec
+        Each flow converges on its own, using the same approach as the scalar methods:
+        torque and power limited pumps use solve_limited_speed, curve limited pumps bracket
+        the speed between driver curve points like find_curve_limited_speed, then solve by regula falsi.
+
+        Q is an array of flow rates in m3/sec
         water is True if calculating for the carrier fluid, False if for slurry
+        max_steps is the maximum number of iterations for any one flow, default settings.pump_max_steps
+        tol is the allowable gap between available and required power in kW, default settings.pump_tol
+        settings is the SolverSettings, None for the current settings, or a preset name
+        returns an array of speeds in Hz
         """
+        Q = np.asarray(Q, dtype=float)
+        if self.limited.lower() == 'curve':
+            tol, max_steps = self._solver_limits(tol, max_steps, settings)
+            return self._find_curve_limited_speed_array(Q, water, tol, max_steps)
+
+        n_new = np.full(Q.shape, float(self._current_speed))
+        limited = self.power_available_array(n_new) < self.power_required_array(Q, n_new, water=water)
+        if not limited.any():
+            return n_new
+        if self.limited.lower() == 'torque':
+            torque, power = self.avail_power * self.design_speed / self._max_driver_speed, 0.0
+        else:
+            torque, power = 0.0, self.avail_power
+        n_new[limited] = self.solve_limited_speed_array(Q[limited], torque, power, water=water, tol=tol,
+                                                        max_steps=max_steps, settings=settings)
+        return n_new
 
-        n_new = self._current_speed
-        speed_ratio_new = n_new / self.design_speed
-        P = self.power_required(Q, self.current_speed, water=water)
-        Pavail = self.driver.power(n_new * self.gear_ratio)
-        if Pavail >= P:
+    def _find_curve_limited_speed_array(self, Q, water, tol, max_steps):
+        """Curve limited part of find_limited_speed_array"""
+        def _power_gap(Q, n):
+            """Available - required power at arrays of flow and speed"""
+            return self.power_available_array(n) - self.power_required_array(Q, n, water=water)
+
+        n_new = np.full(Q.shape, float(self.design_speed))
+        active = _power_gap(Q, n_new) < 0
+        if not active.any():
             return n_new
-        n_low = False
-        gaps = []
-        for n_high in self.driver.design_power_curve.keys():
-            n_high /= self.gear_ratio
-            if not n_low:
-                n_low = n_high
-                continue
-            gap_high = self.driver.power(n_high*self.gear_ratio) - self.power_required(Q, n_high, water=water)
-            gap_low = self.driver.power(n_low*self.gear_ratio) - self.power_required(Q, n_low, water=water)
-            gaps.append([n_low, n_high, gap_low, gap_high])
-            if gap_low >= 0:
-                break
-            n_high = n_low
-        if n_high == n_low:  # There was no intersection
-            return n_low
-        n_new = (n_high + n_low) / 2
-        # speed_ratio_new = n_new / self.design_speed
-        P = self.power_required(Q, n_new, water=water)
-        Pavail = self.driver.power(n_new * self.gear_ratio)
-        while not (-0.1 < Pavail - P < 0.1):
-            gap_new = Pavail - P
-            if gap_new < 0:
-                n_low = n_new
-            else:
-                n_high = n_new
-            n_new = (n_high + n_low) / 2
-            # speed_ratio_new = n_new / self.design_speed
-            P = self.power_required(Q, n_new, water=water)
-            Pavail = self.driver.power(n_new * self.gear_ratio)
-            if n_low/n_high > 0.999:
-                break
+
+        # Bracket each flow between the pair of driver speed points where the gap changes sign, by bisection
+        speeds = self.driver.speeds / self.gear_ratio
+        Qa = Q[active]
+        i_low = np.zeros(Qa.shape, dtype=int)
+        i_high = np.full(Qa.shape, len(speeds) - 1)
+        g_low = _power_gap(Qa, np.full(Qa.shape, speeds[0]))
+        g_high = _power_gap(Qa, np.full(Qa.shape, speeds[-1]))
+        bracketed = (g_low >= 0) & (g_high < 0)
+        below = int(np.count_nonzero(g_low < 0))
+        if below:
+            warnings.warn(f'Pump.find_limited_speed_array: {self.name} using the minimum driver speed for {below} '
+                          f'of {Q.size} flows', RuntimeWarning, stacklevel=3)
+        while (i_high - i_low > 1).any():
+            i_mid = (i_low + i_high) // 2
+            g_mid = _power_gap(Qa, speeds[i_mid])
+            above = g_mid >= 0
+            i_low = np.where(above, i_mid, i_low)
+            g_low = np.where(above, g_mid, g_low)
+            i_high = np.where(above, i_high, i_mid)
+            g_high = np.where(above, g_high, g_mid)
+        n_low = speeds[i_low]
+        n_high = speeds[i_high]
+        n_this = np.where(g_low < 0, speeds[0], speeds[-1])
+
+        # Regula falsi (Illinois variant) on each bracketed flow
+        solving = bracketed.copy()
+        g_try = np.zeros(Qa.shape)  # The residual if max_steps is 0
+        t0 = SolverTelemetry.start()
+        steps = 0
+        while solving.any() and steps < max_steps:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                n_try = n_high - g_high * (n_high - n_low) / (g_high - g_low)
+            n_try = np.where(solving, n_try, n_low)
+            g_try = _power_gap(Qa, n_try)
+            n_this = np.where(solving, n_try, n_this)
+            keep_low = g_try >= 0
+            g_high = np.where(keep_low, g_high / 2, g_try)
+            n_high = np.where(keep_low, n_high, n_try)
+            g_low = np.where(keep_low, g_try, g_low / 2)
+            n_low = np.where(keep_low, n_try, n_low)
+            solving &= ~((np.abs(g_try) < tol) | (np.abs(n_high - n_low) < 1e-12))
+            steps += 1
+        if t0 is not None:
+            unconverged = int(np.count_nonzero(solving))
+            SolverTelemetry.record('Pump.find_curve_limited_speed_array', steps, unconverged == 0,
+                                   float(np.max(np.abs(g_try[bracketed]), initial=0.0)), t0, 'curve', unconverged)
+        n_new[active] = n_this
         return n_new
 
+    def point_array(self, Q, water=False):
+        """Vectorized version of point, return the head and power for an array of flows
+
+        Q: array of flows in m3/sec
+        water: If true return the head for water, else head for slurry
+
+        returns a tuple of numpy arrays: (Q: flow in m3/sec,
+                                          H: Head in m of water,
+                                          P: Power in kW,
+                                          N: Speed in Hz (for the power/torque limited case)"""
+        if water:
+            rho = self.slurry.rhol
+        else:
+            rho = self.slurry.rhom
+        Q = np.asarray(Q, dtype=float)
+        N = np.full(Q.shape, float(self._current_speed))
+        H = self.scaled_curves[0].interp(Q) * rho * self.head_ratio(water)
+        P = self.power_required_array(Q, N, water=water)
+        if self.limited.lower() != 'none':
+            limited = P > self.power_available_array(N)
+            if limited.any():
+                N[limited] = self.find_limited_speed_array(Q[limited], water=water)
+                P[limited] = self.power_required_array(Q[limited], N[limited], water=water)
+                speed_ratio = N[limited] / self.design_speed
+                impeller_ratio = self._current_impeller / self.design_impeller
+                Q0 = Q[limited] / (speed_ratio * impeller_ratio**2)  # Affinity law, WACS 3rd Edition page 207
+                H[limited] = (self.design_QH_curve.interp(Q0) * speed_ratio**2 * impeller_ratio**2 * rho
+                              * self.head_ratio(water))
+        return Q, H, P, N
+
     def point(self, Q, water=False):
         """Return the head and power
 
@@ -279,13 +715,8 @@ class Pump:
             rho = self.slurry.rhol
         else:
             rho = self.slurry.rhom
-        speed_ratio = self._current_speed / self.design_speed
-        impeller_ratio = self._current_impeller / self.design_impeller
-        Q0 = Q / (speed_ratio * impeller_ratio**2)  # Use affinity law for trimmed impeller, WACS 3rd Edition page 207
-        H0 = self.design_QH_curve[Q0]
-        H = H0 * speed_ratio**2 * impeller_ratio**2 * rho
-
-        P = self.power_required(Q, self.current_speed, water=water)
+        H = self.scaled_curves[0][Q] * rho * self.head_ratio(water)
+        P = self.power_required(Q, self._current_speed, water=water)
 
         if self.limited.lower() == 'none' or P <= self.power_available(self._current_speed):
             return Q, H, P, self._current_speed
@@ -296,8 +727,60 @@ class Pump:
         else:
             n_new = self.find_curve_limited_speed(Q, water=water)
         speed_ratio = n_new / self.design_speed
+        impeller_ratio = self._current_impeller / self.design_impeller
         Q0 = Q / (speed_ratio * impeller_ratio ** 2)  # Use affinity law for trimmed impeller, WACS 3rd Edition page 207
         P = self.power_required(Q, n_new, water=water)
         H0 = self.design_QH_curve[Q0]
-        H = H0 * speed_ratio ** 2 * impeller_ratio**2 * rho
+        H = H0 * speed_ratio ** 2 * impeller_ratio**2 * rho * self.head_ratio(water)
         return Q, H, P, n_new
+
+
+class PumpTrain:
+    """The pumps of a pipeline in series, with their combined head curves precomputed on a flow grid
+
+    All the pumps in a series train see the same flow, so the combined head at a flow is the sum of the pump
+    heads. The combined water and slurry head curves are computed on the flow grid with Pump.point_array and
+    interpolated, and are rebuilt only when a pump, its driver or the slurry changes.
+    Flows outside the grid are evaluated pump by pump.
+    """
+    def __init__(self, pumps, flow_list, refine=4):
+        """pumps: list of the Pump objects in order
+        flow_list: flows (m3/sec) to build the curves on, sorted low to high
+        refine: number of grid intervals per interval of flow_list"""
+        self.pumps = list(pumps)
+        flows = np.asarray(flow_list, dtype=float)
+        steps = np.linspace(0, 1, refine, endpoint=False)
+        self.flows = np.append((flows[:-1, np.newaxis] + np.diff(flows)[:, np.newaxis]*steps).ravel(), flows[-1])
+        self._key = None
+        self._heads = None  # (slurry heads, water heads) on the flow grid
+
+    def state(self):
+        """Return the pump fingerprints (see Pump.fingerprint) and the slurry parameters the combined curves use
+
+        The pump heads depend on the slurry only through its densities and the head ratio, which are cheaper to
+        compare than the slurry fingerprint."""
+        return tuple((p.fingerprint(with_slurry=False), p.slurry.rhom, p.slurry.rhol, p.head_ratio())
+                     for p in self.pumps)
+
+    @property
+    def heads(self):
+        """The combined (slurry, water) head arrays (m water column) on the flow grid, rebuilt if the state changed"""
+        key = self.state()
+        if self._heads is None or key != self._key:
+            H_m = np.zeros(self.flows.shape)
+            H_l = np.zeros(self.flows.shape)
+            for p in self.pumps:
+                H_m += p.point_array(self.flows)[1]
+                H_l += p.point_array(self.flows, water=True)[1]
+            self._heads = (H_m, H_l)
+            self._key = key
+        return self._heads
+
+    def head(self, Q, water=False):
+        """Return the combined head (m water column) of the pumps at the flow Q (m3/sec)
+
+        water: If true return the head for water, else head for slurry"""
+        H = self.heads[1 if water else 0]
+        if self.flows[0] <= Q <= self.flows[-1]:
+            return float(np.interp(Q, self.flows, H))
+        return sum(p.point(Q, water=water)[1] for p in self.pumps)
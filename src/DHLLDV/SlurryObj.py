@@ -10,6 +10,7 @@ from . import DHLLDV_Utils
 from . import DHLLDV_constants
 from . import DHLLDV_framework
 from . import homogeneous
+from . import ModelOptions, SolverSettings
 
 
 class Slurry():
@@ -41,6 +42,7 @@ class Slurry():
         self._im_curves = None
         self._LDV_curves = None
         self._LDV85_curves = None
+        self._curves_key = None         # The ModelOptions and SolverSettings the curves were generated with
         self.curves_dirty = True
 
     @property
@@ -159,36 +161,49 @@ class Slurry():
         self.curves_dirty = True
         self._max_index = imax
 
+    @property
+    def curves_stale(self):
+        """True if the curves are dirty or were generated with other ModelOptions or SolverSettings than the current"""
+        return self.curves_dirty or self._curves_key != (ModelOptions.current(), SolverSettings.current())
+
     @property
     def vls_list(self):
-        if self.curves_dirty or self._vls_list is None:
+        if self.curves_stale or self._vls_list is None:
             self.generate_curves()
         return self._vls_list
 
     @property
     def Erhg_curves(self):
-        if self.curves_dirty or self._Erhg_curves is None:
+        if self.curves_stale or self._Erhg_curves is None:
             self.generate_curves()
         return self._Erhg_curves
 
     @property
     def im_curves(self):
-        if self.curves_dirty or self._im_curves is None:
+        if self.curves_stale or self._im_curves is None:
             self.generate_curves()
         return self._im_curves
 
     @property
     def LDV_curves(self):
-        if self.curves_dirty or self._LDV_curves is None:
+        if self.curves_stale or self._LDV_curves is None:
             self.generate_curves()
         return self._LDV_curves
 
     @property
     def LDV85_curves(self):
-        if self.curves_dirty or self._LDV85_curves is None:
+        if self.curves_stale or self._LDV85_curves is None:
             self.generate_curves()
         return self._LDV85_curves
 
+    def fingerprint(self):
+        """Return a stable hash of the slurry parameters and GSD, see DHLLDV_Utils.fingerprint
+
+        The name is not included, it does not change the results"""
+        return DHLLDV_Utils.fingerprint(self.Dp, self.epsilon, self.fluid, self.nu, self.rhol, self.Cv, self.rhos,
+                                        self.rhoi, self.D50, tuple(sorted(self.GSD.items())),
+                                        self.min_index, self.max_index)
+
     def __str__(self):
         """String representation of the slurry"""
         out_string = [f'Slurry in {self.Dp:0.3f} m pipe',
@@ -260,6 +275,23 @@ class Slurry():
         Assumes the GSD is already generated"""
         return self.Erhg(vls) * self.Rsd * self.Cv + self.il(vls)
 
+    def Erhg_array(self, vls):
+        """Vectorized version of Erhg, return an array of the Erhg at an array of velocities
+
+        vls = Velocities (m/sec)
+        Assumes the GSD is already generated"""
+        return DHLLDV_framework.Erhg_graded_array(self.GSD, vls, self.Dp, self.epsilon,
+                                                  self.nu, self.rhol, self.rhos,
+                                                  self.Cv, Cvt_eq_Cvs=True, num_fracs=None)
+
+    def im_array(self, vls):
+        """Vectorized version of im, return an array of the im at an array of velocities
+
+        vls = Velocities (m/sec)
+        Assumes the GSD is already generated"""
+        il = homogeneous.fluid_head_loss_array(vls, self.Dp, self.epsilon, self.nu, self.rhol)
+        return self.Erhg_array(vls) * self.Rsd * self.Cv + il
+
     def generate_Erhg_curves(self):
         """Generate a dict with the Erhg curves
 
@@ -309,8 +341,8 @@ class Slurry():
                                   for i in indices]
                 }
 
-    def generate_LDV_curves(self, d):
-        cv_points = 50
+    def generate_LDV_curves(self, d, cv_points=50):
+        """Generate the LDV curves for the particle diameter d (m) at cv_points Cv from 0.01 to cv_points/100"""
         Cv_list = [(i + 1) / 100. for i in range(cv_points)]
         LDV_vls_list = [DHLLDV_framework.LDV(1, self.Dp, d, self.epsilon, self.nu, self.rhol, self.rhos, Cv)
                         for Cv in Cv_list]
@@ -331,6 +363,7 @@ class Slurry():
         if self.GSD_curves_dirty:
             self.generate_GSD()
         self.curves_dirty = False   # set it at the top so curves generate only once
+        self._curves_key = (ModelOptions.current(), SolverSettings.current())
         self._vls_list = [(i + 1) / 10. for i in range(self.min_index, self.max_index)]
         self._Erhg_curves = self.generate_Erhg_curves()
         self._im_curves = self.generate_im_curves()
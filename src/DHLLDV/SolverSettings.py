@@ -0,0 +1,97 @@
+"""
+SolverSettings - The tolerances and step limits of the iterative solvers, as a speed/accuracy knob
+
+The solvers take an optional settings argument: None for the current settings, a preset name or a Settings.
+The current settings are used by everything that does not pass settings, including the lru_cached functions
+that call the solvers (such as Cvt_Erhg). The current settings are per thread (and per asyncio task), set them
+with DHLLDV_framework.solver_settings:
+    with DHLLDV_framework.solver_settings('interactive'):
+        pipeline.find_operating_point(flow_list)
+    LDV = DHLLDV_framework.LDV(None, Dp, d, epsilon, nu, rhol, rhos, Cv,
+                               settings=SolverSettings.resolve('reference', LDV_max_steps=200))
+
+Presets:
+    interactive: looser tolerances and fewer steps, for the viewer
+    default: the tolerances used before the settings were added
+    reference: tight tolerances and many steps, for reports and as the reference of Scripts/accuracy.py
+
+The lru_cached functions are keyed on the settings (see lru_cache and ModelOptions.lru_cache), so changing the
+settings does not need the caches cleared. Worker processes do not inherit the current settings.
+"""
+import contextvars
+from dataclasses import dataclass, fields, replace
+import functools
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Solver tolerances, frozen so they can be part of an lru_cache key"""
+    LDV_rtol: float = 0.00001       # LDV stages stop when vls/vlsldv is within 1 +/- LDV_rtol
+    LDV_max_steps: int = 10         # The maximum steps of each LDV stage
+    FBSB_rtol: float = 0.001        # vls_FBSB stops when the fixed bed Erhg is within FBSB_rtol*musf of musf
+    FBSB_max_steps: int = 20        # The maximum Newton steps of vls_FBSB
+    V50_digits: int = 4             # V50 stops when this many digits of the friction factor agree
+    V50_max_steps: int = 50         # The maximum iterations of V50
+    pump_tol: float = 0.001         # kW, the pump speed solvers stop when the power gap is less than this
+    pump_max_steps: int = 50        # The maximum Newton steps of the pump speed solvers
+
+
+presets = {'interactive': Settings(LDV_rtol=0.001, LDV_max_steps=5, FBSB_rtol=0.012, FBSB_max_steps=15,
+                                   V50_digits=3, V50_max_steps=20, pump_tol=0.1, pump_max_steps=20),
+           'default': Settings(),
+           'reference': Settings(LDV_rtol=1e-10, LDV_max_steps=200, FBSB_rtol=1e-10, FBSB_max_steps=100,
+                                 V50_digits=10, V50_max_steps=200, pump_tol=1e-7, pump_max_steps=200),
+           }
+
+_current = contextvars.ContextVar('DHLLDV_solver_settings', default=presets['default'])
+
+
+def current():
+    """Return the current Settings of this thread"""
+    return _current.get()
+
+
+def resolve(settings=None, **overrides):
+    """Return the Settings for a solver call
+
+    settings: None for the current settings, a preset name, or a Settings
+    overrides: Settings fields to change, such as LDV_max_steps=20"""
+    if settings is None:
+        settings = _current.get()
+    elif isinstance(settings, str):
+        if settings not in presets:
+            raise ValueError(f"SolverSettings.resolve: Unknown preset '{settings}', use one of {list(presets)}")
+        settings = presets[settings]
+    if overrides:
+        names = {f.name for f in fields(Settings)}
+        unknown = [k for k in overrides if k not in names]
+        if unknown:
+            raise ValueError(f'SolverSettings.resolve: Unknown settings {unknown}, use from {sorted(names)}')
+        settings = replace(settings, **overrides)
+    return settings
+
+
+def set_current(settings):
+    """Set the current Settings of this thread, returns the token to restore the previous settings with reset"""
+    return _current.set(settings)
+
+
+def reset(token):
+    """Restore the Settings that were current before set_current returned token"""
+    _current.reset(token)
+
+
+def lru_cache(maxsize=128):
+    """functools.lru_cache for functions with a settings argument, keyed on the resolved settings
+
+    The settings must be passed by keyword. The cache_clear and cache_info of the cache are kept."""
+    def decorate(func):
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, settings=None, **kwargs):
+            return cached(*args, settings=resolve(settings), **kwargs)
+        wrapper.cache_clear = cached.cache_clear
+        wrapper.cache_info = cached.cache_info
+        return wrapper
+    return decorate
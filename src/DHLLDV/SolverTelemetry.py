@@ -0,0 +1,119 @@
+"""
+SolverTelemetry - Opt in records of the iterations, convergence and wall time of the iterative solvers
+
+Telemetry is off by default, the solvers only check the module flag. Turn it on for a block of code with:
+    with SolverTelemetry.recording() as records:
+        pipeline.find_operating_point(flow_list)
+    SolverTelemetry.print_summary(records)
+
+Each solver call adds a SolverRecord. Solvers that are lru_cached only record the calls that are calculated,
+cache hits do not iterate. The solvers that record are:
+    DHLLDV_framework.LDV (one record per stage: very small, small, large, lower limit)
+    stratified.vls_FBSB, Wilson_V50.V50 and Wilson_V50.V50_array
+    Pump.solve_limited_speed (stage is the limit: torque, power or curve), Pump.solve_limited_speed_array,
+    Pump.solve_limited_speed_smooth (smooth pump curves), Pump.find_curve_limited_speed (smooth driver curves)
+    and Pump.find_curve_limited_speed_array
+The vectorized solvers record one call for the whole array, with the largest residual and the number of
+elements that did not converge.
+    Pipeline.qimin and Pipeline.find_operating_point
+"""
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import perf_counter
+
+import numpy as np
+
+enabled = False     # True to record the solver calls, see recording
+records = []        # The SolverRecords made while enabled
+
+
+@dataclass
+class SolverRecord:
+    """One call of an iterative solver"""
+    solver: str                 # The name of the solver function
+    iterations: int             # The number of iterations (or function evaluations for some scipy methods)
+    converged: bool             # False if the solver stopped at its step limit or failed
+    residual: float = 0.0       # The absolute residual at the end, in the units of the solver's test
+    wall_time: float = 0.0      # sec
+    stage: str = ''             # The part of the solver, for solvers with more than one loop
+    unconverged: int = 0        # The number of array elements that did not converge, for vectorized solvers
+
+    @property
+    def name(self):
+        """The solver and stage, the key in summary"""
+        return f'{self.solver} {self.stage}' if self.stage else self.solver
+
+
+def start():
+    """Return the start time of a solver call, or None if telemetry is off"""
+    return perf_counter() if enabled else None
+
+
+def record(solver, iterations, converged, residual, start_time, stage='', unconverged=0):
+    """Add a SolverRecord, the wall time is from start_time (see start) to now"""
+    records.append(SolverRecord(solver, int(iterations), bool(converged), abs(float(residual)),
+                                perf_counter() - start_time, stage, int(unconverged)))
+
+
+@contextmanager
+def recording():
+    """Context manager that turns telemetry on and yields the list the records are added to
+
+    The previous state is restored on exit, so recordings can be nested"""
+    global enabled, records
+    saved = enabled, records
+    enabled, records = True, []
+    try:
+        yield records
+    finally:
+        enabled, records = saved
+
+
+def summary(records_list=None):
+    """Aggregate the records by solver and stage
+
+    records_list: the records to use, default the current records
+    returns a dict {name: {'calls': the number of calls,
+                           'not_converged': the number of calls that did not converge,
+                           'unconverged_elements': the number of array elements that did not converge,
+                           'iterations': dict {iterations: number of calls} sorted by iterations,
+                           'total_time': sec,
+                           'mean_time': sec,
+                           'max_residual': the largest residual}}"""
+    if records_list is None:
+        records_list = records
+    by_name = {}
+    for r in records_list:
+        by_name.setdefault(r.name, []).append(r)
+    result = {}
+    for name, recs in by_name.items():
+        total_time = sum(r.wall_time for r in recs)
+        result[name] = {'calls': len(recs),
+                        'not_converged': sum(not r.converged for r in recs),
+                        'unconverged_elements': sum(r.unconverged for r in recs),
+                        'iterations': dict(sorted(Counter(r.iterations for r in recs).items())),
+                        'total_time': total_time,
+                        'mean_time': total_time / len(recs),
+                        'max_residual': max(r.residual for r in recs),
+                        }
+    return result
+
+
+def histogram(records_list, name, field='wall_time', bins=10):
+    """Return the numpy histogram (counts, bin edges) of a field of the records with the given name
+
+    records_list: the records to use
+    name: the solver, or 'solver stage' for solvers with stages, see SolverRecord.name
+    field: 'wall_time', 'iterations' or 'residual'
+    bins: the bins, see numpy.histogram"""
+    return np.histogram([getattr(r, field) for r in records_list if r.name == name], bins=bins)
+
+
+def print_summary(records_list=None):
+    """Print the summary, one line per solver and stage, slowest first"""
+    s = summary(records_list)
+    for name, t in sorted(s.items(), key=lambda item: item[1]['total_time'], reverse=True):
+        print(f'{name:45s} calls {t["calls"]:6d}  not converged {t["not_converged"]:5d}  '
+              f'total {t["total_time"]*1000:10.3f} ms  mean {t["mean_time"]*1e6:9.1f} us  '
+              f'iterations {t["iterations"]}')
@@ -0,0 +1,46 @@
+"""WACS_Hr_tables: Pump head reduction grids, Hr at Cv = 0.15
+
+Generated from src/Wilson/WACS2_Hr.xlsx and WACS3_Hr.xlsx by Scripts/compile_WACS_Hr.py, do not edit.
+dpart: particle diameter in mm, dimp: impeller diameter in m, Hr15[dpart][dimp]
+"""
+
+# Figure 9.10 of WACS2, small new pumps
+WACS2 = {
+    'dpart': (0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0),
+    'dimp': (0.2, 0.3, 0.4, 0.5, 0.6, 0.7),
+    'Hr15': (
+        (0.03707, 0.02696, 0.01685, 0.015165, 0.01348, 0.011795),
+        (0.08425, 0.058975, 0.04718, 0.04044, 0.032015, 0.02696),
+        (0.143225, 0.09773, 0.08088, 0.0674, 0.05392, 0.045495),
+        (0.190405, 0.12806, 0.1011, 0.08425, 0.069085, 0.058975),
+        (0.25275, 0.163445, 0.12806, 0.106155, 0.085935, 0.07414),
+        (0.31341, 0.19546, 0.15165, 0.12806, 0.102785, 0.08762),
+        (0.35722, 0.22242, 0.17187, 0.139855, 0.11458, 0.09773),
+    ),
+}
+
+# Logistic fits to Figure 10.9 of WACS3
+WACS3 = {
+    'dpart': (0.06, 0.08, 0.1, 0.2, 0.4, 0.5, 0.8, 1.0, 2.0, 4.0, 5.0, 8.0, 10.0, 20.0, 40.0, 50.0, 80.0, 100.0),
+    'dimp': (0.2, 0.3, 0.41, 0.89, 1.14, 1.52, 1.9, 2.52),
+    'Hr15': (
+        (0.0241908, 0.0167673, 0.0126423, 0.0101345, 0.00804431, 0.00615065, 0.00499464, 0.00383773),
+        (0.0309587, 0.0214583, 0.0161792, 0.0129698, 0.0102949, 0.00787142, 0.00639199, 0.00491141),
+        (0.0373423, 0.025883, 0.0195153, 0.0156441, 0.0124177, 0.0094945, 0.00771001, 0.00592414),
+        (0.0649347, 0.0450081, 0.0339353, 0.0272036, 0.0215931, 0.01651, 0.013407, 0.0103015),
+        (0.1061, 0.0735407, 0.0554484, 0.0444492, 0.035282, 0.0269765, 0.0219063, 0.0168321),
+        (0.122133, 0.0846537, 0.0638273, 0.0511661, 0.0406135, 0.031053, 0.0252166, 0.0193757),
+        (0.159039, 0.110235, 0.083115, 0.0666277, 0.0528864, 0.0404367, 0.0328366, 0.0252307),
+        (0.177366, 0.122937, 0.0926923, 0.0743052, 0.0589804, 0.0450962, 0.0366204, 0.028138),
+        (0.232598, 0.16122, 0.121557, 0.0974443, 0.0773473, 0.0591395, 0.0480242, 0.0369004),
+        (0.278066, 0.192735, 0.145319, 0.116492, 0.0924669, 0.0706998, 0.0574118, 0.0441135),
+        (0.289796, 0.200866, 0.151449, 0.121407, 0.0963677, 0.0736824, 0.0598338, 0.0459745),
+        (0.309871, 0.21478, 0.161941, 0.129817, 0.103043, 0.0787865, 0.0639786, 0.0491593),
+        (0.317389, 0.219991, 0.165869, 0.132966, 0.105543, 0.0806979, 0.0655308, 0.0503519),
+        (0.334091, 0.231568, 0.174598, 0.139964, 0.111097, 0.0849447, 0.0689794, 0.0530017),
+        (0.343586, 0.238149, 0.17956, 0.143941, 0.114255, 0.0873586, 0.0709396, 0.0545079),
+        (0.34562, 0.239559, 0.180623, 0.144793, 0.114931, 0.0878758, 0.0713595, 0.0548305),
+        (0.34879, 0.241756, 0.18228, 0.146122, 0.115985, 0.0886819, 0.0720142, 0.0553335),
+        (0.349888, 0.242517, 0.182853, 0.146581, 0.11635, 0.088961, 0.0722408, 0.0555077),
+    ),
+}
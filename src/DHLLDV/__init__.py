@@ -4,3 +4,8 @@ DHLLDV - These are the files from the DHLLDV framework.
 Note that the framework is in active development at https://github.com/rcriii42/DHLLDV/
 
 """
+import os
+
+if os.environ.get('DHLLDV_PROFILE'):
+    from DHLLDV import Profiler
+    Profiler.enable_from_environment()
@@ -0,0 +1,63 @@
+"""
+head_reduction.py - Pump head reduction (Hr) for settling slurries, from the WACS figures.
+
+The head ratio of a centrifugal pump on slurry is HR = Hm/Hw = 1 - Hr, where Hm is the head in m of mixture
+and Hw the head on water. Hr is tabulated at a delivered concentration of 0.15 (Hr15) against the particle
+and impeller diameters in WACS_Hr_tables (compiled from src/Wilson/WACS2_Hr.xlsx and WACS3_Hr.xlsx), and
+scaled to other concentrations and solids densities:
+    Hr = Hr15 * (Cv/0.15) * (Ss/2.65)
+"""
+
+import numpy as np
+
+from . import WACS_Hr_tables
+
+_grids = {}     # {table name: (log10(dpart), dimp, Hr15) as numpy arrays}
+
+
+def hr_grid(table='WACS3'):
+    """Return the Hr15 grid for the named table ('WACS2' or 'WACS3') as numpy arrays
+
+    returns (log10 of particle diameter in mm, impeller diameter in m, Hr15[particle, impeller])"""
+    if table not in _grids:
+        try:
+            t = getattr(WACS_Hr_tables, table)
+        except AttributeError:
+            raise ValueError(f"Unknown head reduction table '{table}', use 'WACS2' or 'WACS3'") from None
+        _grids[table] = (np.log10(np.array(t['dpart'])), np.array(t['dimp']), np.array(t['Hr15']))
+    return _grids[table]
+
+
+def Hr15(D50, impeller, table='WACS3'):
+    """Return the head reduction at Cv = 0.15, by bilinear interpolation in log10(D50) and the impeller diameter
+
+    D50: particle diameter in m (float or array)
+    impeller: impeller diameter in m (float or array, broadcast against D50)
+    table: 'WACS2' or 'WACS3'
+    Values outside the table are held at the edge of the table."""
+    logd, dimp, hr = hr_grid(table)
+    x = np.clip(np.log10(np.asarray(D50, dtype=float) * 1000), logd[0], logd[-1])
+    y = np.clip(np.asarray(impeller, dtype=float), dimp[0], dimp[-1])
+    i = np.clip(np.searchsorted(logd, x, side='right') - 1, 0, len(logd) - 2)
+    j = np.clip(np.searchsorted(dimp, y, side='right') - 1, 0, len(dimp) - 2)
+    fx = (x - logd[i]) / (logd[i+1] - logd[i])
+    fy = (y - dimp[j]) / (dimp[j+1] - dimp[j])
+    return ((hr[i, j]*(1 - fx) + hr[i+1, j]*fx)*(1 - fy)
+            + (hr[i, j+1]*(1 - fx) + hr[i+1, j+1]*fx)*fy)
+
+
+def Hr(D50, Cv, impeller, Ss=2.65, table='WACS3'):
+    """Return the head reduction Hr = 1 - Hm/Hw
+
+    D50: particle diameter in m
+    Cv: delivered volumetric concentration (-)
+    impeller: impeller diameter in m
+    Ss: solids specific gravity relative to the carrier fluid (-)
+    table: 'WACS2' or 'WACS3'
+    All but table may be arrays, which are broadcast together"""
+    return Hr15(D50, impeller, table) * np.asarray(Cv, dtype=float) / 0.15 * np.asarray(Ss, dtype=float) / 2.65
+
+
+def head_ratio(D50, Cv, impeller, Ss=2.65, table='WACS3'):
+    """Return the head ratio HR = Hm/Hw = 1 - Hr, see Hr for the parameters"""
+    return 1 - Hr(D50, Cv, impeller, Ss, table)
@@ -5,6 +5,8 @@ Created on Feb 21, 2015
 @author: rcriii
 '''
 
+import numpy as np
+
 from .DHLLDV_constants import gravity, Arel_to_beta, musf, particle_ratio
 from . import homogeneous
 
@@ -89,7 +91,7 @@ def Srs(vls, Dp,  d, epsilon, nu, rhol, rhos, use_sqrtcx=True):
     return 8.5**2 * (1/lbdl) * (1/sqrtcx(vt, d))**(3.) * ((nu*gravity)**(1./3.)/vls)**2  # Eqn 8.6-2
 
 
-def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True):
+def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True, musf=musf):
     """Relative excess pressure gradient, per equations 8.6-1 & 8.6-2
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -100,6 +102,7 @@ def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
        use_sf: Whether to apply the sliding flow correction
+       musf: The sliding friction coefficient of the sliding flow correction
     """
     Erhg_ho = Shr(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs) + \
               Srs(vls, Dp,  d, epsilon, nu, rhol, rhos, use_sqrtcx)   # Eqn 8.6-1 & 8.6-2
@@ -112,6 +115,35 @@ def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True
         return (Erhg_ho + (f - 1) * musf) / f
 
 
+def Srs_array(vls, Dp,  d, epsilon, nu, rhol, rhos, use_sqrtcx=True):
+    """Vectorized version of Srs, for an array of vls"""
+    Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
+    vt = vt_ruby(d, Rsd, nu)
+    vls = np.asarray(vls, dtype=float)
+    lbdl = homogeneous.swamee_jain_ff_array(vls * Dp / nu, Dp, epsilon)
+    if not use_sqrtcx:
+        return 8.5**2 * (1/lbdl) * (vt/(gravity*d)**0.5)**(10./3.) * ((nu*gravity)**(1./3.)/vls)**2  # Eqn 8.6-2
+    return 8.5**2 * (1/lbdl) * (1/sqrtcx(vt, d))**(3.) * ((nu*gravity)**(1./3.)/vls)**2  # Eqn 8.6-2
+
+
+def Erhg_array(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True, musf=musf):
+    """Vectorized version of Erhg, for an array of vls and a float or array of Cvs
+
+    Where Cvs is above the KC of Shr the result is nan (where Erhg returns a complex number)"""
+    vls = np.asarray(vls, dtype=float)
+    Cvs = np.asarray(Cvs, dtype=float)
+    with np.errstate(invalid='ignore'):
+        Erhg_ho = Shr(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs) + \
+                  Srs_array(vls, Dp,  d, epsilon, nu, rhol, rhos, use_sqrtcx)   # Eqn 8.6-1 & 8.6-2
+
+    f = d/(particle_ratio * Dp)  # eqn 8.8-4
+    if not use_sf or f < 1:
+        return Erhg_ho
+    else:
+        # Sliding flow per equation 8.8-5
+        return (Erhg_ho + (f - 1) * musf) / f
+
+
 def heterogeneous_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, use_sqrtcx=True):
     """Return the pressure loss (delta_pm in kPa per m) for heterogeneous flow.
        vls = average line speed (velocity, m/sec)
@@ -9,6 +9,8 @@ Created on Oct 7, 2014
 import functools
 from math import log, exp
 
+import numpy as np
+
 from .DHLLDV_constants import gravity, musf, particle_ratio
 
 Acv = 3.0   # coefficient homogeneous regime, see note after Eqn 8.7-8
@@ -71,6 +73,33 @@ def fluid_head_loss(vls, Dp, epsilon, nu, rhol=1.0):
     return lmbda * vls**2 / (2 * gravity * Dp)  # Eqn 8.2-6 / 8.7-5
 
 
+def swamee_jain_ff_array(Re, Dp, epsilon):
+    """
+    Vectorized version of swamee_jain_ff, return an array of friction factors
+    Re: array of Reynolds numbers
+    Dp: Pipe diameter in m (float or array)
+    epsilon: pipe absolute roughness in m (float or array)
+    """
+    Re = np.asarray(Re, dtype=float)
+    c1 = epsilon / (3.7 * Dp)
+    turbulent = 1.325 / np.log(c1 + 5.75 / np.maximum(Re, 2320)**0.9)**2  # Eqn 8.2-7 / 8.7-3
+    return np.where(Re <= 2320, 64. / np.maximum(Re, 1e-12), turbulent)
+
+
+def fluid_head_loss_array(vls, Dp, epsilon, nu, rhol=1.0):
+    """
+    Vectorized version of fluid_head_loss, return an array of head losses (il in m.l.c) per m of pipe
+    vls: array of line speeds in m/sec
+    Dp: Pipe diameter in m
+    epsilon: pipe absolute roughness in m
+    nu: fluid kinematic viscosity in m2/sec
+    rhol: fluid density in ton/m3, included for compatibility
+    """
+    vls = np.asarray(vls, dtype=float)
+    lmbda = swamee_jain_ff_array(vls * Dp / nu, Dp, epsilon)
+    return lmbda * vls**2 / (2 * gravity * Dp)  # Eqn 8.2-6 / 8.7-5
+
+
 def apparent_density(rhol, rhos, Cvs, X):
     """
     Return the apparent density of the fluid given the fraction of fines
@@ -123,7 +152,7 @@ def limiting_particle(Dp, nu, rhol, rhos, Stk=0.03):
     return (top/bottom)**0.5  # Eqn 8.15-2
 
 
-def Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=True):
+def Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, musf=musf):
     """Return the Erhg value for homogeneous flow.
     Use the Talmon (2013) correction for slurry density.
     vls: line speed in m/sec
@@ -135,6 +164,7 @@ def Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=True):
     rhos: particle density in ton/m3
     Cvs - spatial (insitu) volume concentration of solids
     use_sf: Whether to apply the sliding flow correction
+    musf: The sliding friction coefficient of the sliding flow correction
     """
     Re = pipe_reynolds_number(vls, Dp, nu)
     lambda1 = swamee_jain_ff(Re, Dp, epsilon)
@@ -154,6 +184,30 @@ def Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=True):
         return (il*(1-(1-top/bottom)*(1-deltav_to_d)) + (f-1)*musf)/f
 
 
+def Erhg_array(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=True, musf=musf):
+    """Vectorized version of Erhg, return an array of the homogeneous Erhg
+    vls: array of line speeds in m/sec
+    Cvs - spatial (insitu) volume concentration of solids (float or array)
+    The other arguments as Erhg
+    """
+    vls = np.asarray(vls, dtype=float)
+    lambda1 = swamee_jain_ff_array(vls * Dp / nu, Dp, epsilon)
+    Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
+    rhom = rhol+Cvs*(rhos-rhol)
+    deltav_to_d = np.minimum((11.6*nu)/((lambda1/8)**0.5*vls*d), 1)    # Eqn 8.7-7
+
+    sb = ((Acv/kvK)*np.log(rhom/rhol)*(lambda1/8)**0.5+1)**2
+    top = 1+Rsd*Cvs - sb
+    bottom = Rsd*Cvs*sb
+    il = lambda1 * vls**2 / (2 * gravity * Dp)  # Eqn 8.2-6 / 8.7-5
+    f = d/(particle_ratio * Dp)  # Eqn 8.8-4 in 2nd ed B, overridden in 3rd edition
+    if not use_sf or f < 1:
+        return il*(1-(1-top/bottom)*(1-deltav_to_d))            # Eqn 8.7-8
+    else:
+        # Sliding flow per equation 8.8-5 in 2nd ed B, overridden in 3rd edition
+        return (il*(1-(1-top/bottom)*(1-deltav_to_d)) + (f-1)*musf)/f
+
+
 def homogeneous_pressure_loss(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs):
     """
     Return the pressure loss (delta_pm in kPa per m) for (pseudo) homogeneous flow incorporating viscosity correction.
@@ -6,26 +6,30 @@ Created on Oct 22, 2014
 @author: RCRamsdell
 '''
 
-import functools
 from math import pi, sin, log
 
-from .DHLLDV_constants import gravity, Arel_to_beta, musf, Cvb, alpha_tel
+import numpy as np
+
+from .DHLLDV_constants import gravity, Arel_to_beta, alpha_tel
 from . import homogeneous
+from . import ModelOptions
+from . import SolverSettings
+from . import SolverTelemetry
 
 
-def beta(Cvs):
-    """Return the angle beta based on the Cvs and Cvb"""
-    return Arel_to_beta[Cvs/Cvb]
+def beta(Cvs, options=None):
+    """Return the angle beta based on the Cvs and Cvb (from the ModelOptions)"""
+    return Arel_to_beta[Cvs/ModelOptions.resolve(options).Cvb]
 
 
-def perimeters(Dp, Cvs):
+def perimeters(Dp, Cvs, options=None):
     """Return the four perimeters:
        Op  = The perimeter of the pipe
        O1  = The length of pipewall above the bed
        O12 = The width of the top of the bed
        O2  = The length of pipewall/bed contact
     """
-    B = beta(Cvs)
+    B = beta(Cvs, options=options)
     Op = pi * Dp        # Eqn 8.4-1
     O1 = (pi - B) * Dp  # Eqn 8.4-2
     O2 = Op - O1        # Eqn 8.4-3
@@ -33,13 +37,13 @@ def perimeters(Dp, Cvs):
     return Op, O1, O12, O2
 
 
-def areas(Dp, Cvs):
+def areas(Dp, Cvs, options=None):
     """Return the three areas in the pipe:
        Ap = pipe area
        A1 = Area of clear fluid above the bed
        A2 = Area of bed
     """
-    Arel = Cvs/Cvb
+    Arel = Cvs/ModelOptions.resolve(options).Cvb
     Ap = pi*(Dp/2)**2   # Eqn 8.4-5
     A2 = Ap * Arel      # Eqn 8.4-6
     A1 = Ap - A2        # Eqn 8.4-7
@@ -92,8 +96,8 @@ def lambda12_sf(Dp_H, d, v1, v2, epsilon, nu_l, rhol, rhos):
     return 0.83*lambda1(Dp_H, v1, epsilon, nu_l) + 0.37*first*second    # Eqn 8.4-14
 
 
-@functools.lru_cache(maxsize=3000)
-def fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+@ModelOptions.lru_cache(maxsize=3000)
+def fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """Return the pressure loss for fluid above a fixed bed.
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -103,9 +107,10 @@ def fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
        rhol = density of the fluid (ton/m3)
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
+       options = The ModelOptions, None for the current options
     """
-    Ap, A1, A2 = areas(Dp, Cvs)
-    Op, O1, O12, O2 = perimeters(Dp, Cvs)
+    Ap, A1, A2 = areas(Dp, Cvs, options=options)
+    Op, O1, O12, O2 = perimeters(Dp, Cvs, options=options)
     DH1 = 4*A1/(O1 + O12)   # Eqn 8.4-8
     v1 = vls*Ap/A1          # Eqn 8.4-10 with v2 = 0
     v2 = 0.0                # Velocity of the bed
@@ -119,7 +124,7 @@ def fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
     return (F1_l + F12_l)/A1        # Eqn 8.4-17
 
 
-def fb_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+def fb_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """Return the head loss for fluid above a fixed bed.
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -129,23 +134,51 @@ def fb_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
        rhol = density of the fluid (ton/m3)
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
+       options = The ModelOptions, None for the current options
     """
-    delta_p = fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs)
+    delta_p = fb_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=options)
     return delta_p / (rhol * gravity)  # Eqn 8.2-6 with deltaL = 1.0
 
 
-@functools.lru_cache(maxsize=3000)
-def fb_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+@ModelOptions.lru_cache(maxsize=3000)
+def fb_Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """Return the ERHG for the fixed-bed case.
     """
     Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
     il = homogeneous.fluid_head_loss(vls, Dp, epsilon, nu, rhol)
-    im = fb_head_loss(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs)
+    im = fb_head_loss(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options)
+    return (im - il)/(Rsd * Cvs)    # Eqn 8.2-9
+
+
+def fb_Erhg_array(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
+    """Vectorized version of fb_Erhg, for an array of vls and a float or array of Cvs
+
+    The areas, perimeters and friction factors of fb_pressure_loss are calculated for all the vls at once.
+    """
+    Cvb = ModelOptions.resolve(options).Cvb
+    vls = np.asarray(vls, dtype=float)
+    Cvs = np.asarray(Cvs, dtype=float)
+    Arel = Cvs / Cvb
+    B = Arel_to_beta.interp(Arel)
+    Ap = pi*(Dp/2)**2           # Eqn 8.4-5
+    A1 = Ap - Ap * Arel         # Eqn 8.4-6 & 8.4-7
+    O1 = (pi - B) * Dp          # Eqn 8.4-2
+    O12 = Dp * np.sin(B)        # Eqn 8.4-4
+    DH1 = 4*A1/(O1 + O12)       # Eqn 8.4-8
+    v1 = vls*Ap/A1              # Eqn 8.4-10 with v2 = 0
+    lbd1 = 1.325/np.log(0.27*epsilon/DH1 + 5.75/(v1*DH1/nu)**0.9)**2     # Eqn 8.4-12
+    Rsd = (rhos - rhol)/rhol    # Eqn 8.2-1
+    lbd12 = np.maximum(1.325*alpha_tel/np.log(0.27*d/DH1 + 5.75/(v1*DH1/nu)**0.9)**2,     # Eqn 8.4-13
+                       0.83*lbd1 + 0.37*(v1/(2*gravity*DH1*Rsd)**0.5)**2.73 *
+                       ((rhos*(pi/6)*d**3)/rhol)**0.094)                # Eqn 8.4-14
+    delta_p = (lbd1*O1 + lbd12*O12)*rhol*v1**2/8/A1                     # Eqn 8.4-15 to 8.4-17
+    im = delta_p / (rhol * gravity)                                     # Eqn 8.2-6 with deltaL = 1.0
+    il = homogeneous.fluid_head_loss_array(vls, Dp, epsilon, nu, rhol)
     return (im - il)/(Rsd * Cvs)    # Eqn 8.2-9
 
 
 def vls_FBSB(Dp,  d, epsilon, nu, rhol, rhos, Cvs,
-             max_steps=20, e=0.415/1000):
+             max_steps=None, e=None, settings=None, options=None):
     """Return the transition line speed between fixed and sliding bed.
        This is the same as the limit of stationary deposition, Vls_lsdv.
            Dp = Pipe diameter (m)
@@ -155,27 +188,41 @@ def vls_FBSB(Dp,  d, epsilon, nu, rhol, rhos, Cvs,
            rhol = density of the fluid (ton/m3)
            rhos = particle density (ton/m3)
            Cvs = insitu volume concentration
-           max_steps = The maximum steps to take (default 20)
-           e = The error term (default musf/1000)
+           max_steps = The maximum steps to take (default settings.FBSB_max_steps, 20)
+           e = The absolute error term (default settings.FBSB_rtol * options.musf, musf/1000)
+           settings = The SolverSettings, None for the current settings, or a preset name
+           options = The ModelOptions, None for the current options
 
         Note you could calculate this using eqn 7.8-10, but that is implicit in lambda,
         which is a function of vls. Instead I use Newton's method on the calculated Ergh.
         """
+    settings = SolverSettings.resolve(settings)
+    options = ModelOptions.resolve(options)
+    musf = options.musf
+    if max_steps is None:
+        max_steps = settings.FBSB_max_steps
+    if e is None:
+        e = settings.FBSB_rtol * musf
     vls_fb = 1
     dv = 0.1
+    t0 = SolverTelemetry.start()
     for n in range(max_steps):
-        fn = fb_Erhg(vls_fb, Dp,  d, epsilon, nu, rhol, rhos, Cvs)-musf
+        fn = fb_Erhg(vls_fb, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=options)-musf
         if abs(fn) < e:
+            if t0 is not None:
+                SolverTelemetry.record('vls_FBSB', n, True, fn, t0)
             return vls_fb
-        dfndv = (fb_Erhg(vls_fb + dv, Dp, d, epsilon, nu, rhol, rhos, Cvs) - musf - fn) / dv
+        dfndv = (fb_Erhg(vls_fb + dv, Dp, d, epsilon, nu, rhol, rhos, Cvs, options=options) - musf - fn) / dv
         vls_fb = vls_fb - fn/dfndv
+    if t0 is not None:
+        SolverTelemetry.record('vls_FBSB', max_steps, False, fn, t0)
     return vls_fb
 
 
 vls_lsdv = vls_FBSB  # Theses are the same value, see discussion in section 7.8.6
 
 
-def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """Return the relative excess hydraulic gradient for a sliding bed
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -185,11 +232,12 @@ def Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
        rhol = density of the fluid (ton/m3)
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
+       options = The ModelOptions, None for the current options
     """
-    return musf  # Eqn 8.5-1
+    return ModelOptions.resolve(options).musf  # Eqn 8.5-1
 
 
-def sliding_bed_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, Cvb=0.6):
+def sliding_bed_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, Cvb=0.6, options=None):
     """Return the head loss for sliding bed.
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -199,13 +247,14 @@ def sliding_bed_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, Cvb=0.6):
        rhol = density of the fluid (ton/m3)
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
+       options = The ModelOptions, None for the current options
     """
     il = homogeneous.fluid_head_loss(vls, Dp, epsilon, nu, rhol)
     Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
-    return Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs)*Rsd*Cvs + il  # Eqn 8.5-2
+    return Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=options)*Rsd*Cvs + il  # Eqn 8.5-2
 
 
-def sliding_bed_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
+def sliding_bed_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs, options=None):
     """Return the pressure loss for a sliding bed.
        vls = average line speed (velocity, m/sec)
        Dp = Pipe diameter (m)
@@ -215,8 +264,10 @@ def sliding_bed_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs):
        rhol = density of the fluid (ton/m3)
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
+       options = The ModelOptions, None for the current options
     """
-    return sliding_bed_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs)*gravity*rhol    # Eqn 8.5-3
+    return sliding_bed_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, Cvs,
+                                 options=options)*gravity*rhol    # Eqn 8.5-3
 
 
 if __name__ == '__main__':
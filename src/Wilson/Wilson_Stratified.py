@@ -2,9 +2,13 @@
 Wilson Stratified - Implementing the Wilson stratified model as presented in section 6.20.1
 """
 
+import functools
 from math import log
 
+import numpy as np
+
 from DHLLDV.homogeneous import fluid_head_loss, swamee_jain_ff, pipe_reynolds_number
+from DHLLDV.homogeneous import fluid_head_loss_array, swamee_jain_ff_array
 from DHLLDV.DHLLDV_constants import gravity
 
 def Vsm_max(Dp, d, rhol, rhos, musf=0.4, f=None):
@@ -43,6 +47,25 @@ def Cvr_max(Dp, d, rhol, rhos):
     Cvrmx = 0.16*Dp**0.4 * d_mm**-0.84 * (Rsd/1.65)**-0.17  # Eqn. 6.20-35
     return min(0.66, max(0.05, Cvrmx))
 
+@functools.lru_cache(maxsize=1024)
+def Vsm_terms(Dp, d, rhol, rhos, musf):
+    """Return the terms of Vsm that do not depend on the velocity or concentration
+        Dp = Pipe diameter (m)
+        d = Particle diameter (m)
+        rhol = density of the fluid (ton/m3)
+        rhos = particle density (ton/m3)
+        musf = The coefficient of sliding friction
+    returns a tuple: (Cvr_max,
+                      Vsm_max without the friction factor (top/bottom, m/s),
+                      the factor on (0.018/f)**0.13 in Vsm_max with the friction factor (m/s),
+                      alpha if Cvr_max <= 0.33, else beta)"""
+    Cvrmx = Cvr_max(Dp, d, rhol, rhos)
+    if Cvrmx <= 0.33:
+        exponent = log(0.333)/log(Cvrmx)
+    else:
+        exponent = log(0.666)/log(1-Cvrmx)
+    return Cvrmx, Vsm_max(Dp, d, rhol, rhos, musf), (2 * gravity*Dp*(rhos/rhol-1))**0.5, exponent
+
 def Vsm(Dp, d, rhol, rhos, musf, Cv, Cvb=0.6, f=None):
     """Return the velocity at the limit of stationary deposition
         Dp = Pipe diameter (m)
@@ -54,18 +77,33 @@ def Vsm(Dp, d, rhol, rhos, musf, Cv, Cvb=0.6, f=None):
         Cvb = The bed concentration
         f =The friction factor, if given use WASC2 Eqn 5.1
     """
-    Cvrmx = Cvr_max(Dp, d, rhol, rhos)
-    Vsmx = Vsm_max(Dp, d, rhol, rhos, musf, f=f)
+    Cvrmx, Vsmx, alt_factor, exponent = Vsm_terms(Dp, d, rhol, rhos, musf)
+    if f is not None:
+        Vsmx = min((0.018/f)**0.13 * alt_factor, Vsmx)
     Cvr = Cv/Cvb
     if Cvrmx <= 0.33:
-        alpha = log(0.333)/log(Cvrmx)
+        alpha = exponent
         Vs = Vsmx * 6.75 * (Cvr**alpha) * (1 - Cvr**alpha)**2 # Eqn. 6.20-36
     else:
-        beta = log(0.666)/log(1-Cvrmx)
+        beta = exponent
         Vs = Vsmx * 6.75 * (1-Cvr)**2*beta * (1-(1-Cvr)**beta)  # Eqn. 6.20-36
 
     return min(Vs, Vsmx)
 
+def Vsm_array(Dp, d, rhol, rhos, musf, Cv, Cvb=0.6, f=None):
+    """Vectorized version of Vsm, return the velocity at the limit of stationary deposition
+       Cv and f may be arrays, which are broadcast together, see Vsm for the parameters
+    """
+    Cvrmx, Vsmx, alt_factor, exponent = Vsm_terms(Dp, d, rhol, rhos, musf)
+    if f is not None:
+        Vsmx = np.minimum((0.018/np.asarray(f, dtype=float))**0.13 * alt_factor, Vsmx)
+    Cvr = np.asarray(Cv, dtype=float)/Cvb
+    if Cvrmx <= 0.33:
+        Vs = Vsmx * 6.75 * (Cvr**exponent) * (1 - Cvr**exponent)**2  # Eqn. 6.20-36
+    else:
+        Vs = Vsmx * 6.75 * (1-Cvr)**2*exponent * (1-(1-Cvr)**exponent)  # Eqn. 6.20-36
+    return np.minimum(Vs, Vsmx)
+
 def Erhg(Vls, Dp, d, epsilon, nu, rhol, rhos, musf, Cvt, Cvb=0.6):
     """Return the relative excess head loss
        Assume that Eqn. 6.20-41 is calibrated for musf=0.4, and adjust accordingly
@@ -78,7 +116,12 @@ def Erhg(Vls, Dp, d, epsilon, nu, rhol, rhos, musf, Cvt, Cvb=0.6):
             rhos = particle density (ton/m3)
             musf = The oefficient of sliding friction
             Cv = The delivered volume concentration
+       Vls and Cvt may be arrays, which are broadcast together
         """
+    if np.ndim(Vls) or np.ndim(Cvt):
+        Vls = np.asarray(Vls, dtype=float)
+        f = swamee_jain_ff_array(Vls * Dp / nu, Dp, epsilon)
+        return musf/0.4 * (0.55*Vsm_array(Dp, d, rhol, rhos, musf, Cvt, f=f)/Vls)**0.25  # Eqn. 6.20-41
     Re = pipe_reynolds_number(Vls, Dp, nu)
     f = swamee_jain_ff(Re, Dp, epsilon)
     return musf/0.4 * (0.55*Vsm(Dp, d, rhol, rhos, musf, Cvt, f=f)/Vls)**0.25 # Eqn. 6.20-41 modified for musf
@@ -94,6 +137,7 @@ def stratified_pressure_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, musf, Cvt, Cv
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
        musf = The coefficient of sliding friction
+       vls and Cvt may be arrays, which are broadcast together
     """
     return stratified_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, musf, Cvt, Cvb=0.6)*gravity*rhol
 
@@ -109,7 +153,12 @@ def stratified_head_loss(vls, Dp,  d, epsilon, nu, rhol, rhos, musf, Cvt, Cvb=0.
             rhos = particle density (ton/m3)
             musf = The oefficient of sliding friction
             Cvt = The delivered volume concentration
+       vls and Cvt may be arrays, which are broadcast together
         """
     Rsd = (rhos - rhol) / rhol  # Eqn 8.2-1
-    il = fluid_head_loss(vls, Dp, epsilon, nu, rhol)
+    if np.ndim(vls) or np.ndim(Cvt):
+        il = fluid_head_loss_array(vls, Dp, epsilon, nu, rhol)
+        Cvt = np.asarray(Cvt, dtype=float)
+    else:
+        il = fluid_head_loss(vls, Dp, epsilon, nu, rhol)
     return il + Rsd*Cvt * Erhg(vls, Dp,  d, epsilon, nu, rhol, rhos, musf, Cvt, Cvb)
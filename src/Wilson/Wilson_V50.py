@@ -1,10 +1,16 @@
 """
 Wilson_V50.py - Heterogenous transport using the Wilson V50 model
 """
+import functools
 from math import cosh, log, sqrt
+
+import numpy as np
+
+from DHLLDV import SolverSettings, SolverTelemetry
 from DHLLDV.heterogeneous import vt_ruby
 from DHLLDV.DHLLDV_constants import gravity
 from DHLLDV.homogeneous import pipe_reynolds_number, swamee_jain_ff, fluid_head_loss
+from DHLLDV.homogeneous import swamee_jain_ff_array, fluid_head_loss_array
 
 
 def w(d, nu, rhol, rhos):
@@ -33,6 +39,7 @@ def sigma(Dp, d50, d85, nu, rhol, rhos):
     return log(top/bottom, 10)
 
 
+@functools.lru_cache(maxsize=1024)
 def M(Dp, d50, d85, nu, rhol, rhos):
     """Return M, the exponent related to the grain size distribution
             Dp = Pipe diameter (m)
@@ -46,7 +53,8 @@ def M(Dp, d50, d85, nu, rhol, rhos):
     return max(0.25, min(1.7, _M))
 
 
-def V50(Dp, d50, d85, epsilon, nu, rhol, rhos):
+@SolverSettings.lru_cache(maxsize=1024)
+def V50(Dp, d50, d85, epsilon, nu, rhol, rhos, settings=None):
     """Return the V50 (m/s), the velocity at which half the particles are in contact with the pipe wall
             Dp = Pipe diameter (m)
             d50 = Median Particle diameter (m)
@@ -55,21 +63,60 @@ def V50(Dp, d50, d85, epsilon, nu, rhol, rhos):
             nu = fluid kinematic viscosity in m2/sec
             rhol = density of the fluid (ton/m3)
             rhos = particle density (ton/m3)
+            settings = The SolverSettings, None for the current settings, or a preset name
+        Iterates until settings.V50_digits digits of the friction factor agree, or settings.V50_max_steps
         """
-
+    settings = SolverSettings.resolve(settings)
+    scale = 10**settings.V50_digits
     w50 = w(d50, nu, rhol, rhos)
     ff_last = 0.012
     v50_last = w50 * sqrt(8/ff_last) * cosh(60*d50/Dp)
     Re = pipe_reynolds_number(v50_last, Dp, nu)
     ff_this = swamee_jain_ff(Re, Dp, epsilon)
-    while int(ff_this*10000) != int(ff_last*10000):  # 4 digit agreement
+    t0 = SolverTelemetry.start()
+    steps = 0
+    while int(ff_this*scale) != int(ff_last*scale) and steps < settings.V50_max_steps:  # V50_digits agreement
         ff_last = ff_this
         v50_last = w50 * sqrt(8 / ff_last) * cosh(60 * d50 / Dp)
         Re = pipe_reynolds_number(v50_last, Dp, nu)
         ff_this = swamee_jain_ff(Re, Dp, epsilon)
+        steps += 1
+    if t0 is not None:
+        SolverTelemetry.record('V50', steps, int(ff_this*scale) == int(ff_last*scale), ff_this - ff_last, t0)
     return w50 * sqrt(8/ff_this) * cosh(60*d50/Dp)
 
 
+def V50_array(Dp, d50, d85, epsilon, nu, rhol, rhos, max_steps=None, settings=None):
+    """Vectorized version of V50, converge the V50 (m/s) of many cases at once
+            All parameters may be arrays, they are broadcast together, see V50 for the parameters
+            max_steps = The maximum number of iterations, default settings.V50_max_steps
+        Each case iterates until settings.V50_digits digits of its friction factor agree, as in V50
+        """
+    settings = SolverSettings.resolve(settings)
+    scale = 10**settings.V50_digits
+    if max_steps is None:
+        max_steps = settings.V50_max_steps
+    Dp, d50, epsilon, nu, rhol, rhos = np.broadcast_arrays(*[np.asarray(x, dtype=float)
+                                                             for x in (Dp, d50, epsilon, nu, rhol, rhos)])
+    w50_cosh = w(d50, nu, rhol, rhos) * np.cosh(60*d50/Dp)
+    ff_last = np.full(Dp.shape, 0.012)
+    ff_this = swamee_jain_ff_array(w50_cosh * np.sqrt(8/ff_last) * Dp / nu, Dp, epsilon)
+    active = (ff_this*scale).astype(int) != (ff_last*scale).astype(int)  # settings.V50_digits digit agreement
+    t0 = SolverTelemetry.start()
+    steps = 0
+    while active.any() and steps < max_steps:
+        ff_last[active] = ff_this[active]
+        Re = w50_cosh[active] * np.sqrt(8/ff_last[active]) * Dp[active] / nu[active]
+        ff_this[active] = swamee_jain_ff_array(Re, Dp[active], epsilon[active])
+        active[active] = (ff_this[active]*scale).astype(int) != (ff_last[active]*scale).astype(int)
+        steps += 1
+    if t0 is not None:
+        unconverged = int(np.count_nonzero(active))
+        SolverTelemetry.record('V50_array', steps, unconverged == 0, np.max(np.abs(ff_this - ff_last), initial=0.0),
+                               t0, unconverged=unconverged)
+    return w50_cosh * np.sqrt(8/ff_this)
+
+
 def Erhg(vls, Dp, d50, d85, epsilon, nu, rhol, rhos, musf):
     """Return the relative excess head loss using the Wilson V50 model
             Vls = average line speed (velocity, m/sec)
@@ -81,7 +128,10 @@ def Erhg(vls, Dp, d50, d85, epsilon, nu, rhol, rhos, musf):
             rhol = density of the fluid (ton/m3)
             rhos = particle density (ton/m3)
             musf = The coefficient of sliding friction
+        vls may be an array, M and V50 are calculated once for the other parameters
         """
+    if np.ndim(vls):
+        vls = np.asarray(vls, dtype=float)
     _M = M(Dp, d50, d85, nu, rhol, rhos)
     _V50 = V50(Dp, d50, d85, epsilon, nu, rhol, rhos)
     return (musf/2)*(_V50/vls)**_M
@@ -115,7 +165,11 @@ def heterogeneous_head_loss(vls, Dp, d50, d85, epsilon, nu, rhol, rhos, Cvs, mus
        rhos = particle density (ton/m3)
        Cvs = insitu volume concentration
        musf = The coefficient of sliding friction
+       vls may be an array
     """
-    il = fluid_head_loss(vls, Dp, epsilon, nu, rhol)
+    if np.ndim(vls):
+        il = fluid_head_loss_array(vls, Dp, epsilon, nu, rhol)
+    else:
+        il = fluid_head_loss(vls, Dp, epsilon, nu, rhol)
     Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
     return Erhg(vls, Dp, d50, d85, epsilon, nu, rhol, rhos, musf)*Rsd*Cvs + il
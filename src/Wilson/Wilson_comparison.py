@@ -0,0 +1,186 @@
+"""
+Wilson_comparison - Compare the DHLLDV and Wilson models on a shared grid of (Dp, d50, d85, Cv, vls) cases
+
+The grid is a dict of equal length columns, one row per case, see make_grid. Models are registered by name with
+register_model, each model is a function model(columns, terms, fluid) that returns the Erhg of every row:
+    columns = dict of the grid columns for the rows to evaluate
+    terms = dict of the fluid friction terms of the rows, see common_terms
+    fluid = dict of the fluid and pipe properties: epsilon, nu, rhol, rhos, musf (for the Wilson models), and the
+            DHLLDV ModelOptions
+Each model is evaluated over arrays, one call per group of rows with the same pipe and sand.
+compare evaluates the models in chunks of rows, optionally in parallel processes, and returns the columns with the
+results added. Models registered outside this module are only available in parallel on platforms that fork.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, ModelOptions, SolverSettings
+from DHLLDV.DHLLDV_constants import gravity
+from DHLLDV.homogeneous import swamee_jain_ff_array
+from Wilson import Wilson_framework, Wilson_Stratified, Wilson_V50
+
+grid_columns = ('Dp', 'd50', 'd85', 'Cv', 'vls')
+
+models = {}
+
+
+def register_model(name):
+    """Decorator to register a model function under the given name, see the module docstring"""
+    def register(func):
+        models[name] = func
+        return func
+    return register
+
+
+def make_grid(Dp, d50, Cv, vls, d85=None, d85_ratio=1.5):
+    """Return the grid of all combinations of the given values as a dict of columns {name: array}
+
+        Dp = list of pipe diameters (m)
+        d50 = list of median particle diameters (m)
+        Cv = list of volume concentrations
+        vls = list of line speeds (m/sec)
+        d85 = list of d85 particle diameters (m), if None use d85_ratio * d50
+        d85_ratio = the ratio d85/d50 to use if d85 is None
+    """
+    if d85 is None:
+        rows = [(D, d, d * d85_ratio, c, v) for D, d, c, v in product(Dp, d50, Cv, vls)]
+    else:
+        rows = list(product(Dp, d50, d85, Cv, vls))
+    return {name: np.array(col, dtype=float) for name, col in zip(grid_columns, list(zip(*rows)) or [()]*5)}
+
+
+def common_terms(columns, fluid):
+    """Return the fluid friction terms, as a dict of arrays for the rows in columns
+
+    The il gives the im columns of compare, the terms are passed to the models and are part of the result.
+        lambda = The Darcy-Weisbach friction factor (Swamee-Jain)
+        il = The fluid head loss (m.w.c. per m)
+    """
+    Dp = columns['Dp']
+    vls = columns['vls']
+    lmbda = swamee_jain_ff_array(vls * Dp / fluid['nu'], Dp, fluid['epsilon'])
+    return {'lambda': lmbda,
+            'il': lmbda * vls**2 / (2 * gravity * Dp),  # Eqn 8.2-6 / 8.7-5
+            }
+
+
+def _groups(columns, names):
+    """Yield (values, index) for each unique combination of values in the named columns"""
+    keys, inverse = np.unique(np.column_stack([columns[n] for n in names]), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    for i, values in enumerate(keys):
+        yield tuple(float(v) for v in values), np.flatnonzero(inverse == i)
+
+
+@register_model('DHLLDV')
+def DHLLDV_Erhg(columns, terms, fluid):
+    """The DHLLDV framework Cvt_Erhg for a uniform sand of the d50, see DHLLDV_framework.Cvt_Erhg_array"""
+    f = fluid
+    result = np.empty(len(columns['vls']))
+    for (Dp, d50, Cv), index in _groups(columns, ('Dp', 'd50', 'Cv')):
+        Erhg_obj = DHLLDV_framework.Cvt_Erhg_array(columns['vls'][index], Dp, d50, f['epsilon'], f['nu'], f['rhol'],
+                                                   f['rhos'], Cv, options=f['options'])
+        result[index] = DHLLDV_framework.regime_Erhg(Erhg_obj)
+    return result
+
+
+@register_model('Wilson stratified')
+def stratified_Erhg(columns, terms, fluid):
+    """The Wilson stratified (sliding bed) model for the d50, see Wilson_Stratified.Erhg"""
+    f = fluid
+    result = np.empty(len(columns['vls']))
+    for (Dp, d50), index in _groups(columns, ('Dp', 'd50')):
+        result[index] = Wilson_Stratified.Erhg(columns['vls'][index], Dp, d50, f['epsilon'], f['nu'], f['rhol'],
+                                               f['rhos'], f['musf'], columns['Cv'][index])
+    return result
+
+
+@register_model('Wilson V50')
+def V50_Erhg(columns, terms, fluid):
+    """The Wilson V50 (heterogeneous) model"""
+    f = fluid
+    result = np.empty(len(columns['vls']))
+    for (Dp, d50, d85), index in _groups(columns, ('Dp', 'd50', 'd85')):
+        result[index] = Wilson_V50.Erhg(columns['vls'][index], Dp, d50, d85, f['epsilon'], f['nu'], f['rhol'],
+                                        f['rhos'], f['musf'])
+    return result
+
+
+@register_model('Wilson')
+def Wilson_Erhg(columns, terms, fluid):
+    """The Wilson framework, the lesser of the stratified and V50 models, see Wilson_framework.Erhg"""
+    f = fluid
+    result = np.empty(len(columns['vls']))
+    for (Dp, d50, d85), index in _groups(columns, ('Dp', 'd50', 'd85')):
+        result[index] = Wilson_framework.Erhg(columns['vls'][index], Dp, {0.50: d50, 0.85: d85}, f['epsilon'],
+                                              f['nu'], f['rhol'], f['rhos'], columns['Cv'][index], f['musf'])
+    return result
+
+
+def _compare_chunk(columns, model_names, fluid):
+    """Evaluate the named models for the rows in columns, return a dict of the shared terms and model Erhg"""
+    terms = common_terms(columns, fluid)
+    result = dict(terms)
+    with DHLLDV_framework.solver_settings(fluid['settings']):
+        for name in model_names:
+            result[name] = models[name](columns, terms, fluid)
+    return result
+
+
+def compare(columns, model_names=None, reference=None, epsilon=DHLLDV_constants.steel_roughness,
+            nu=DHLLDV_constants.water_viscosity[20], rhol=DHLLDV_constants.water_density[20], rhos=2.65,
+            musf=0.4, options=None, chunk_size=1000, processes=1):
+    """Evaluate the models on the grid and return the columnar result
+
+        columns = dict of the grid columns, see make_grid
+        model_names = list of registered model names to evaluate, default all
+        reference = the model the others are compared to, default the first model
+        epsilon = absolute pipe roughness (m)
+        nu = fluid kinematic viscosity in m2/sec
+        rhol = density of the fluid (ton/m3)
+        rhos = particle density (ton/m3)
+        musf = The coefficient of sliding friction for the Wilson models, the default value of 0.4 is that used
+               by Wilson et al. The DHLLDV model uses the musf of its options
+        options = The ModelOptions for the DHLLDV model, None for the current options of this thread
+                  The models use the SolverSettings of this thread, also in the worker processes
+        chunk_size = The number of rows evaluated together
+        processes = the number of processes to evaluate the chunks in, 1 to evaluate in this process
+    returns a dict of columns: the grid columns,
+                               the shared terms (see common_terms),
+                               '<model>': the Erhg of each model,
+                               '<model> im': the head loss (m.w.c. per m) of each model,
+                               '<model> - <reference>': the difference in Erhg of each other model
+    """
+    if model_names is None:
+        model_names = list(models)
+    unknown = [n for n in model_names if n not in models]
+    if unknown:
+        raise ValueError(f'Wilson_comparison.compare: Unknown models {unknown}, use from {list(models)}')
+    if reference is None:
+        reference = model_names[0]
+    if reference not in model_names:
+        raise ValueError(f"Wilson_comparison.compare: The reference '{reference}' is not in {model_names}")
+    fluid = {'epsilon': epsilon, 'nu': nu, 'rhol': rhol, 'rhos': rhos, 'musf': musf,
+             'options': ModelOptions.resolve(options), 'settings': SolverSettings.current()}
+    columns = {name: np.asarray(columns[name], dtype=float) for name in grid_columns}
+    num_rows = len(columns['vls'])
+    chunks = [{name: col[i:i + chunk_size] for name, col in columns.items()}
+              for i in range(0, num_rows, chunk_size)] or [columns]
+    if processes == 1:
+        chunk_results = [_compare_chunk(c, model_names, fluid) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [executor.submit(_compare_chunk, c, model_names, fluid) for c in chunks]
+            chunk_results = [f.result() for f in futures]
+    result = dict(columns)
+    for name in chunk_results[0]:
+        result[name] = np.concatenate([r[name] for r in chunk_results])
+    Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
+    for name in model_names:
+        result[f'{name} im'] = result['il'] + Rsd * columns['Cv'] * result[name]
+    for name in model_names:
+        if name != reference:
+            result[f'{name} - {reference}'] = result[name] - result[reference]
+    return result
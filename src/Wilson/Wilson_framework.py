@@ -0,0 +1,79 @@
+"""
+Wilson_framework - The Wilson model, taking the lesser of the stratified (sliding bed) and V50 (heterogeneous)
+results, evaluated over arrays of velocity and concentration for comparison with DHLLDV_framework.Cvt_Erhg
+"""
+from math import log10
+
+import numpy as np
+
+from DHLLDV.DHLLDV_constants import gravity
+from DHLLDV.DHLLDV_Utils import interpDict
+from DHLLDV.homogeneous import fluid_head_loss_array
+from Wilson import Wilson_Stratified, Wilson_V50
+
+
+def get_dx(GSD, frac):
+    """Return the grain size (m) at the given fraction of a GSD, as in SlurryObj.Slurry.get_dx
+
+        GSD = dict {fraction passing (-): grain size (m)}, or a single grain size (m) for a uniform sand
+        frac = The fraction passing (-)
+    """
+    if not isinstance(GSD, dict):
+        return GSD
+    if frac in GSD:
+        return GSD[frac]
+    fracs = sorted(GSD.keys())
+    log10_interp = interpDict(*zip(fracs, [log10(GSD[x]) for x in fracs]),
+                              extrapolate_high=True, extrapolate_low=True)
+    return 10**log10_interp[frac]
+
+
+def Erhg(vls, Dp, GSD, epsilon, nu, rhol, rhos, Cvt, musf=0.4, get_dict=False):
+    """Return the relative excess head loss of the lesser of the Wilson stratified and V50 models
+        vls = average line speed (velocity, m/sec), float or array
+        Dp = Pipe diameter (m)
+        GSD = dict {fraction passing (-): grain size (m)}, or a single grain size (m) for a uniform sand.
+              The stratified model uses the d50, the V50 model the d50 and d85
+        epsilon = absolute pipe roughness (m)
+        nu = fluid kinematic viscosity in m2/sec
+        rhol = density of the fluid (ton/m3)
+        rhos = particle density (ton/m3)
+        Cvt = The delivered volume concentration, float or array broadcast against vls
+        musf = The coefficient of sliding friction, the default value of 0.4 is that used by Wilson et al.
+        get_dict: if true return a dict with both models
+    returns the Erhg as a numpy array, or the dict {'il': the fluid head loss,
+                                                  'Stratified': Erhg of the stratified model,
+                                                  'V50': Erhg of the V50 model,
+                                                  'regime': 'Stratified' or 'V50', the governing model at each point,
+                                                  'Erhg': the governing Erhg}
+    """
+    d50 = get_dx(GSD, 0.50)
+    d85 = get_dx(GSD, 0.85)
+    vls, Cvt = np.broadcast_arrays(np.asarray(vls, dtype=float), np.asarray(Cvt, dtype=float))
+    stratified = Wilson_Stratified.Erhg(vls, Dp, d50, epsilon, nu, rhol, rhos, musf, Cvt)
+    V50 = Wilson_V50.Erhg(vls, Dp, d50, d85, epsilon, nu, rhol, rhos, musf)
+    Erhg_lesser = np.minimum(stratified, V50)
+    if not get_dict:
+        return Erhg_lesser
+    return {'il': fluid_head_loss_array(vls, Dp, epsilon, nu, rhol),
+            'Stratified': stratified,
+            'V50': V50,
+            'regime': np.where(stratified <= V50, 'Stratified', 'V50'),
+            'Erhg': Erhg_lesser,
+            }
+
+
+def head_loss(vls, Dp, GSD, epsilon, nu, rhol, rhos, Cvt, musf=0.4):
+    """Return the head loss (m.w.c per m) of the lesser of the Wilson stratified and V50 models
+        See Erhg for the parameters, vls and Cvt may be arrays
+    """
+    Erhg_obj = Erhg(vls, Dp, GSD, epsilon, nu, rhol, rhos, Cvt, musf, get_dict=True)
+    Rsd = (rhos - rhol)/rhol     # Eqn 8.2-1
+    return Erhg_obj['il'] + Rsd * np.asarray(Cvt, dtype=float) * Erhg_obj['Erhg']
+
+
+def pressure_loss(vls, Dp, GSD, epsilon, nu, rhol, rhos, Cvt, musf=0.4):
+    """Return the pressure loss (delta_pm in kPa per m) of the lesser of the Wilson stratified and V50 models
+        See Erhg for the parameters, vls and Cvt may be arrays
+    """
+    return head_loss(vls, Dp, GSD, epsilon, nu, rhol, rhos, Cvt, musf)*gravity*rhol
@@ -7,6 +7,7 @@ import unittest
 
 from DHLLDV import DHLLDV_constants
 from DHLLDV import DHLLDV_framework
+from DHLLDV import ModelOptions
 
 
 class Test(unittest.TestCase):
@@ -20,13 +21,12 @@ class Test(unittest.TestCase):
         rhos = 2.65
         rhol = DHLLDV_constants.water_density[20]
         Cvs = 0.1
-        DHLLDV_framework.use_sqrtcx = False
-        Erhg_obj = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
+        with DHLLDV_framework.model_options(use_sqrtcx=False):
+            Erhg_obj = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
         self.assertAlmostEqual(Erhg_obj['FB'], 0.13631182, places=6)
         self.assertAlmostEqual(Erhg_obj['SB'], 0.415)
         self.assertAlmostEqual(Erhg_obj['He'], 0.2495003)
         self.assertAlmostEqual(Erhg_obj['Ho'], 0.00640100645523)
-        DHLLDV_framework.use_sqrtcx = True
 
     def testCvs_Erhg_obj2(self):
         # test at a higher velocity to trigger He
@@ -38,13 +38,12 @@ class Test(unittest.TestCase):
         rhos = 2.65
         rhol = DHLLDV_constants.water_density[20]
         Cvs = 0.1
-        DHLLDV_framework.use_sqrtcx = False
-        Erhg_obj = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
+        with DHLLDV_framework.model_options(use_sqrtcx=False):
+            Erhg_obj = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, get_dict=True)
         self.assertAlmostEqual(Erhg_obj['FB'], 0.44104037, places=5)
         self.assertAlmostEqual(Erhg_obj['SB'], 0.415)
         self.assertAlmostEqual(Erhg_obj['He'], 0.1451765)
         self.assertAlmostEqual(Erhg_obj['Ho'], 0.01051754196773)
-        DHLLDV_framework.use_sqrtcx = True
 
     def testCvs_Erhg_result(self):
         vls = 3.0
@@ -68,10 +67,9 @@ class Test(unittest.TestCase):
         rhos = 2.65
         rhol = DHLLDV_constants.water_density[20]
         Cvs = 0.1
-        DHLLDV_framework.use_sqrtcx = False
-        Erhg = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs)
+        Erhg = DHLLDV_framework.Cvs_Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs,
+                                         options=ModelOptions.resolve(use_sqrtcx=False))
         self.assertAlmostEqual(Erhg, 0.1451765, places=6)
-        DHLLDV_framework.use_sqrtcx = True
 
     def testCvs_Erhg_regime(self):
         vls = 3.0
@@ -94,6 +92,58 @@ class Test(unittest.TestCase):
         rhol = DHLLDV_constants.water_density[20]
         self.assertAlmostEqual(DHLLDV_framework.pseudo_dlim(Dp, nu, rhol, rhos)*10**5, 9.4907896)
 
+    def test_model_constant(self):
+        """Test that model_constant sets musf in the models and restores it"""
+        args = (3.0, 0.5, 0.4/1000, DHLLDV_constants.steel_roughness, 1.0508e-6, 1.0248103, 2.65, 0.1)
+        SB = DHLLDV_framework.Cvs_Erhg(*args, get_dict=True)['SB']
+        with DHLLDV_framework.model_constant('musf', 0.5):
+            self.assertEqual(ModelOptions.current().musf, 0.5)
+            self.assertAlmostEqual(DHLLDV_framework.Cvs_Erhg(*args, get_dict=True)['SB'], 0.5)
+        self.assertEqual(ModelOptions.current().musf, DHLLDV_constants.musf)
+        self.assertEqual(DHLLDV_framework.Cvs_Erhg(*args, get_dict=True)['SB'], SB)
+        for name in ('mu_sf', 'gravity', 'Acv'):
+            with self.subTest(msg=f'Test model_constant rejects {name}'):
+                with self.assertRaises(ValueError):
+                    with DHLLDV_framework.model_constant(name, 0.5):
+                        pass
+
+    def test_deprecated_options(self):
+        """Test the deprecated module globals read and set the current ModelOptions, with a warning"""
+        token = ModelOptions.set_current(ModelOptions.current())
+        try:
+            for name, value in (('use_sf', False), ('use_sqrtcx', False), ('alpha_xi', 0.4)):
+                with self.subTest(msg=f'Test DHLLDV_framework.{name}'):
+                    with self.assertWarns(DeprecationWarning):
+                        self.assertEqual(getattr(DHLLDV_framework, name), getattr(ModelOptions.default, name))
+                    with self.assertWarns(DeprecationWarning):
+                        setattr(DHLLDV_framework, name, value)
+                    self.assertEqual(getattr(ModelOptions.current(), name), value)
+                    self.assertNotIn(name, vars(DHLLDV_framework))
+        finally:
+            ModelOptions.reset(token)
+        self.assertIs(ModelOptions.current(), ModelOptions.default)
+        with self.assertRaises(AttributeError):
+            DHLLDV_framework.use_sf_correction
+
+    def test_Cvt_Erhg_array(self):
+        """Test the vectorized Cvt and Cvs Erhg against the scalar versions, in all the regimes"""
+        vls = [0.5, 1.0, 2.0, 3.0, 4.5, 6.0, 8.0]
+        regimes = set()
+        for Dp, d, Cv in [(0.762, 0.3/1000, 0.175), (0.3, 5.0/1000, 0.1)]:
+            args = (Dp, d, DHLLDV_constants.steel_roughness, DHLLDV_constants.water_viscosity[20],
+                    DHLLDV_constants.water_density[20], 2.65, Cv)
+            for name, array_func, func in [('Cvt', DHLLDV_framework.Cvt_Erhg_array, DHLLDV_framework.Cvt_Erhg),
+                                           ('Cvs', DHLLDV_framework.Cvs_Erhg_array, DHLLDV_framework.Cvs_Erhg)]:
+                Erhg_obj = array_func(vls, *args)
+                Erhg = DHLLDV_framework.regime_Erhg(Erhg_obj)
+                regimes.update(Erhg_obj['regime'])
+                for i, v in enumerate(vls):
+                    expected = func(v, *args, get_dict=True)
+                    with self.subTest(msg=f'Test {name} Erhg of {d*1000} mm in {Dp} m at {v} m/sec'):
+                        self.assertEqual(Erhg_obj['regime'][i], expected['regime'])
+                        self.assertAlmostEqual(Erhg[i], expected[expected['regime']], places=12)
+        self.assertEqual(regimes, {'FB', 'SB', 'He', 'Ho'})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,84 @@
+"""Tests of the model options"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import unittest
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, ModelOptions
+from DHLLDV.PipeObj import Pipe, Pipeline
+from DHLLDV.SlurryObj import Slurry
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.args = (3.0, 0.762, 0.5/1000, DHLLDV_constants.steel_roughness, DHLLDV_constants.water_viscosity[20],
+                     DHLLDV_constants.water_density[20], 2.65, 0.175)
+        DHLLDV_framework.clear_caches()
+
+    def test_resolve(self):
+        """Test the default, the overrides and the errors"""
+        self.assertIs(ModelOptions.resolve(), ModelOptions.default)
+        self.assertEqual(ModelOptions.default.musf, DHLLDV_constants.musf)
+        self.assertEqual(ModelOptions.default.Cvb, DHLLDV_constants.Cvb)
+        options = ModelOptions.resolve(use_sf=False, musf=0.45)
+        self.assertEqual((options.use_sf, options.use_sqrtcx, options.musf), (False, True, 0.45))
+        self.assertIs(ModelOptions.resolve(options), options)
+        with self.assertRaises(ValueError):
+            ModelOptions.resolve(mu_sf=0.45)
+        with self.assertRaises(TypeError):
+            ModelOptions.resolve('default')
+
+    def test_cache_keys(self):
+        """Test the lru_caches are keyed on the options, so they do not serve results of other options"""
+        default = DHLLDV_framework.Cvt_Erhg(*self.args, get_dict=True)
+        with DHLLDV_framework.model_options(musf=0.5) as options:
+            self.assertIs(ModelOptions.current(), options)
+            changed = DHLLDV_framework.Cvt_Erhg(*self.args, get_dict=True)
+        self.assertIs(ModelOptions.current(), ModelOptions.default)
+        self.assertEqual(changed['SB'] * (1 - changed['Xi']), 0.5)
+        self.assertNotEqual(changed['Xi'], default['Xi'])
+        self.assertEqual(DHLLDV_framework.Cvt_Erhg.cache_info().currsize, 2)
+        self.assertIs(DHLLDV_framework.Cvt_Erhg(*self.args, get_dict=True), default)
+        self.assertIs(DHLLDV_framework.Cvt_Erhg(*self.args, get_dict=True, options=options), changed)
+        for name, value in (('use_sqrtcx', False), ('alpha_xi', 0.4), ('Cvb', 0.55)):
+            with self.subTest(msg=f'Test the option {name}'):
+                result = DHLLDV_framework.Cvt_Erhg(*self.args, get_dict=True,
+                                                   options=ModelOptions.resolve(**{name: value}))
+                self.assertNotEqual([result[k] for k in ('Xi', 'FB', 'He')],
+                                    [default[k] for k in ('Xi', 'FB', 'He')])
+
+    def test_threads(self):
+        """Test that threads can run with different options at the same time"""
+        musf_list = [0.3, 0.415, 0.5, 0.6]
+        expected = [DHLLDV_framework.Cvt_Erhg(*self.args, options=ModelOptions.resolve(musf=m)) for m in musf_list]
+        DHLLDV_framework.clear_caches()
+        barrier = threading.Barrier(len(musf_list))
+
+        def run(musf):
+            with DHLLDV_framework.model_options(musf=musf):
+                barrier.wait()
+                return [DHLLDV_framework.Cvt_Erhg(*self.args) for _ in range(3)]
+
+        with ThreadPoolExecutor(max_workers=len(musf_list)) as executor:
+            results = list(executor.map(run, musf_list))
+        for musf, e, r in zip(musf_list, expected, results):
+            with self.subTest(msg=f'Test the thread with musf={musf}'):
+                self.assertEqual(r, [e] * 3)
+        self.assertIs(ModelOptions.current(), ModelOptions.default)
+
+    def test_curves(self):
+        """Test the slurry curves and pipeline fingerprint follow the options"""
+        s = Slurry()
+        pipeline = Pipeline(pipe_list=[Pipe('Discharge', 0.762, 1000, 0, 0)], slurry=s)
+        Erhg = s.Erhg_curves['SB']
+        fingerprint = pipeline.fingerprint()
+        with DHLLDV_framework.model_options(musf=0.5):
+            self.assertTrue(s.curves_stale)
+            self.assertNotEqual(s.Erhg_curves['SB'], Erhg)
+            self.assertNotEqual(pipeline.fingerprint(), fingerprint)
+        self.assertEqual(s.Erhg_curves['SB'], Erhg)
+        self.assertEqual(pipeline.fingerprint(), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
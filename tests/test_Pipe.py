@@ -2,9 +2,12 @@
 
 import unittest
 
+import numpy as np
+
 from DHLLDV.DHLLDV_Utils import interpDict
-from DHLLDV.PipeObj import Pipe, Pipeline
+from DHLLDV.PipeObj import Pipe, Pipeline, PipelineTemplate, OperatingPointError
 from DHLLDV.PumpObj import Pump
+from DHLLDV.SlurryObj import Slurry
 from DHLLDV.stratified import areas
 
 Ladder_Pump600 = Pump(name="0.600x0.600x1.118m Pump at 300 RPM",
@@ -208,6 +211,266 @@ class MyTestCase(unittest.TestCase):
         qop = self.pipeline.find_operating_point(flow_list)
         self.assertAlmostEqual(qop, 1.55425794, places=3)
 
+    def test_intersection_smooth(self):
+        """Test the operating point calculation with smooth pump curves (Newton's method)"""
+        for i, p in enumerate(self.pipeline.pipesections):
+            if isinstance(p, Pump):
+                self.pipeline.pipesections[i] = Pump(p.name, p.design_speed, p.design_impeller, p.suction_dia,
+                                                     p.disch_dia, p.design_QH_curve, p.design_QP_curve,
+                                                     avail_power=p.avail_power, limited=p.limited,
+                                                     curve_fit='pchip')
+        flow_list = [self.pipeline.pipesections[-1].flow(v) for v in self.pipeline.slurry.vls_list]
+        qop = self.pipeline.find_operating_point(flow_list)
+        self.assertAlmostEqual(qop, 1.55425794, places=3)
+
+    def test_system_head_pump_train(self):
+        """Test the system head with the pump train against evaluating each pump"""
+        flow_list = [self.pipeline.pipesections[-1].flow(v) for v in self.pipeline.slurry.vls_list]
+        train = self.pipeline.pump_train(flow_list)
+        self.assertIs(train, self.pipeline.pump_train(flow_list))
+        Hpipe_m, Hpipe_l, Hpump_l, Hpump_m = self.pipeline.calc_system_head(1.5)
+        train_heads = self.pipeline.calc_system_head(1.5, train)
+        self.assertEqual((Hpipe_m, Hpipe_l), train_heads[:2])
+        self.assertAlmostEqual(Hpump_l, train_heads[2], places=2)
+        self.assertAlmostEqual(Hpump_m, train_heads[3], places=2)
+
+    def test_station_pressures(self):
+        """Test the pump station pressures against the hydraulic gradient"""
+        loc_list, head_list, _ = self.pipeline.hydraulic_gradient(1.5)
+        stations = self.pipeline.station_pressures(1.5)
+        self.assertEqual(len(stations), 2)
+        for i, s in enumerate(stations):
+            with self.subTest(msg=f'Test station {i} pressures'):
+                self.assertEqual(s.location, loc_list[2 + 2*i])
+                self.assertAlmostEqual(s.suction, head_list[2 + 2*i])
+                self.assertAlmostEqual(s.discharge, head_list[3 + 2*i])
+        self.assertFalse(stations[0].ok)
+        self.assertTrue(stations[1].ok)
+
+    def test_station_limited_flow(self):
+        """Test the flow with the pump speeds reduced to meet the pump station suction pressure limits"""
+        flow_list = [self.pipeline.pipesections[-1].flow(v) for v in self.pipeline.slurry.vls_list]
+        qop = self.pipeline.find_operating_point(flow_list)
+        speeds = [p.current_speed for p in self.pipeline.pumps]
+        q, stations, limited_speeds = self.pipeline.find_station_limited_flow(flow_list, min_suction=[-8.0, 10.0])
+        self.assertEqual(q, qop)
+        self.assertEqual(limited_speeds, speeds)
+        for min_suction, slowed in (([-8.0, 15.0], [1]), ([-5.5, 10.0], [0, 1])):
+            with self.subTest(msg=f'Test the station limited flow with min_suction {min_suction}'):
+                q, stations, limited_speeds = self.pipeline.find_station_limited_flow(flow_list,
+                                                                                      min_suction=min_suction)
+                self.assertLess(q, qop)
+                self.assertAlmostEqual(min(s.margin for s in stations), 0.0, places=4)
+                self.assertTrue(all(s.ok for s in stations))
+                for i, n in enumerate(speeds):
+                    if i in slowed:
+                        self.assertLess(limited_speeds[i], n)
+                    else:
+                        self.assertEqual(limited_speeds[i], n)
+                self.assertEqual([p.current_speed for p in self.pipeline.pumps], speeds)
+                for p, n in zip(self.pipeline.pumps, limited_speeds):
+                    p.current_speed = n
+                self.assertAlmostEqual(self.pipeline.find_operating_point(flow_list), q)
+                for p, n in zip(self.pipeline.pumps, speeds):
+                    p.current_speed = n
+        self.assertRaises(OperatingPointError, self.pipeline.find_station_limited_flow, flow_list,
+                          min_suction=[-8.0, 500.0])
+
+    def test_station_pressure_arrays(self):
+        """Test the vectorized station pressures against the station pressures at each flow"""
+        flows = [0.5, 1.0, 1.5, 2.0]
+        suction, discharge, speeds, _ = self.pipeline.station_pressure_arrays(flows)
+        self.assertEqual(suction.shape, (4, 2))
+        for i, q in enumerate(flows):
+            for j, s in enumerate(self.pipeline.station_pressures(q)):
+                with self.subTest(msg=f'Test station {j} pressures at {q:0.2f}'):
+                    self.assertAlmostEqual(suction[i, j], s.suction)
+                    self.assertAlmostEqual(discharge[i, j], s.discharge)
+
+    def test_NPSH_margins(self):
+        """Test the NPSH margin with and without an NPSH required curve"""
+        flows = [0.5, 1.0, 1.5]
+        suction, _, _, Hv = self.pipeline.station_pressure_arrays(flows)
+        margins = self.pipeline.NPSH_margins(flows)
+        rhom = self.pipeline.slurry.rhom
+        self.assertAlmostEqual(margins[1, 0], (10.33 + suction[1, 0] - 0.24) / rhom + Hv[1, 0])
+        ladder = self.pipeline.pumps[0]
+        ladder.design_NPSHr_curve = interpDict({0.0: 2.0, 2.0: 4.0, 4.0: 8.0}, extrapolate_high=True)
+        try:
+            self.assertAlmostEqual(margins[1, 0] - self.pipeline.NPSH_margins(flows)[1, 0], 3.0)
+            self.assertAlmostEqual(margins[1, 1], self.pipeline.NPSH_margins(flows)[1, 1])
+        finally:
+            ladder.design_NPSHr_curve = None
+
+    def test_production_curve(self):
+        """Test the production curve against the operating point at each Cv"""
+        flow_list = [self.pipeline.pipesections[-1].flow(v) for v in self.pipeline.slurry.vls_list]
+        Cv_orig = self.pipeline.Cv
+        curve = self.pipeline.production_curve([0.1, 0.2, 0.3], flow_list)
+        self.assertEqual(self.pipeline.Cv, Cv_orig)
+        self.assertEqual(curve['Cv'], [0.1, 0.2, 0.3])
+        for i, Cv in enumerate(curve['Cv']):
+            self.pipeline.Cv = Cv
+            with self.subTest(msg=f'Test production curve at Cv={Cv:0.2f}'):
+                self.assertAlmostEqual(curve['flow'][i], self.pipeline.find_operating_point(flow_list), places=6)
+                self.assertAlmostEqual(curve['production'][i], self.pipeline.slurry.Cvi * curve['flow'][i] * 3600)
+                self.assertGreater(curve['velocity'][i], curve['LDV'][i])
+
+    def test_production_curve_LDV(self):
+        """Test that the production curve stops when a pipe velocity is below the LDV"""
+        self.pipeline.slurry.D50 = 0.0005
+        self.pipeline.update_slurries()
+        curve = self.pipeline.production_curve([0.1, 0.2, 0.3])
+        self.assertEqual(curve['Cv'], [0.1])
+
+    def test_booster_line(self):
+        """Test the station pressures along a long line with booster pumps"""
+        pipe_list = [Pipe('Entrance', 0.5, 0, 0.5, -4.0), Pipe('Suction', 0.5, 10.0, 0.1, 5.0), Main_Pump500]
+        for _ in range(4):
+            pipe_list.extend([Pipe('Line', 0.5, 1000.0, 0.5, 0.0), Main_Pump500])
+        pipe_list.append(Pipe('Discharge', 0.5, 1000.0, 1.0, 1.0))
+        pipeline = Pipeline(name="booster line", pipe_list=pipe_list, slurry=Slurry(Dp=0.5, D50=0.0003, Cv=0.1))
+        flow_list = [pipeline.pipesections[-1].flow(v) for v in pipeline.slurry.vls_list]
+        qop = pipeline.find_operating_point(flow_list)
+        stations = pipeline.station_pressures(qop)
+        self.assertEqual([s.location for s in stations], [10.0, 1010.0, 2010.0, 3010.0, 4010.0])
+        Hpipe_m, _, _, Hpump_m = pipeline.calc_system_head(qop)
+        self.assertAlmostEqual(stations[-1].discharge - stations[-1].suction, Hpump_m / 5)
+        self.assertEqual([s.ok for s in stations], [False, False, False, False, True])
+
+    def test_system_head_slope(self):
+        """Test the system and pump head slopes against a finite difference"""
+        d = 1e-4
+        Hsys_hi, _, _, Hpump_hi = self.pipeline.calc_system_head(1.5 + d)
+        Hsys_lo, _, _, Hpump_lo = self.pipeline.calc_system_head(1.5 - d)
+        dHsys, dHpump = self.pipeline.system_head_slope(1.5)
+        self.assertAlmostEqual(dHsys, (Hsys_hi - Hsys_lo) / (2 * d), delta=0.01 * abs(dHsys))
+        self.assertAlmostEqual(dHpump, (Hpump_hi - Hpump_lo) / (2 * d), delta=0.01 * abs(dHpump))
+
+    def test_pipeline_template(self):
+        """Test a dig depth sweep with a pipeline template against new pipelines, reusing the slurries"""
+        def ladder_pipes(dig_depth, discharge_length):
+            return [Pipe('Entrance', 0.6, 0, 0.5, -dig_depth),
+                    Pipe('LP Suction', 0.6, 10.0, 0.1, dig_depth / 3),
+                    Ladder_Pump600,
+                    Pipe('LP Discharge', 0.6, 20.0, 0.1, 1.0 + dig_depth * 2 / 3),
+                    Main_Pump500,
+                    Pipe('Discharge', 0.5, discharge_length, 1.0, 1.0)]
+        template = PipelineTemplate(Pipeline(pipe_list=ladder_pipes(0.0, 1.0), slurry=Slurry(Dp=0.5)),
+                                    {'dig_depth': 10.0, 'discharge_length': 1000.0},
+                                    {(0, 'elev_change'): lambda dig_depth: -dig_depth,
+                                     (1, 'elev_change'): lambda dig_depth: dig_depth / 3,
+                                     (3, 'elev_change'): lambda dig_depth: 1.0 + dig_depth * 2 / 3,
+                                     (5, 'length'): lambda discharge_length: discharge_length})
+        slurries = dict(template.pipeline.slurries)
+        self.assertEqual(template.pipeline.pipesections[5].length, 1000.0)
+        self.assertEqual(template.update(discharge_length=800.0, dig_depth=10.0), [(5, 'length')])
+        flow_list = template.pipeline.flow_list
+        depths = [5.0, 10.0, 15.0, 20.0, 25.0, 30.0]
+        qops = template.sweep('dig_depth', depths, lambda pl: pl.find_operating_point(flow_list))
+        self.assertEqual(template.params['dig_depth'], 10.0)
+        self.assertEqual(template.pipeline.pipesections[0].elev_change, -10.0)
+        self.assertEqual(template.pipeline.slurries, slurries)
+        for depth, qop in zip(depths, qops):
+            with self.subTest(msg=f'Test template at dig depth {depth}'):
+                pipeline = Pipeline(pipe_list=ladder_pipes(depth, 800.0), slurry=Slurry(Dp=0.5))
+                self.assertAlmostEqual(qop, pipeline.find_operating_point(flow_list))
+        self.assertRaises(ValueError, template.update, depth=5.0)
+        self.assertRaises(ValueError, PipelineTemplate, template.pipeline, {'D': 0.5}, {(5, 'diameter'): lambda D: D})
+        self.assertRaises(ValueError, PipelineTemplate, template.pipeline, {}, {(5, 'length'): lambda L: L})
+
+    def test_fingerprint(self):
+        """Test that the pipeline fingerprint follows the sections, pumps and slurry"""
+        fp = self.pipeline.fingerprint()
+        self.pipeline.update_slurries()
+        self.assertEqual(self.pipeline.fingerprint(), fp)
+        changes = [(self.pipe, 'length', 20.0),
+                   (self.pipeline.slurry, 'Cv', 0.2),
+                   (Main_Pump500, 'current_speed', Main_Pump500.design_speed * 0.9),
+                   (Ladder_Pump600, 'current_impeller', Ladder_Pump600.design_impeller * 0.95)]
+        for obj, name, value in changes:
+            with self.subTest(msg=f'Test fingerprint with {name}'):
+                orig = getattr(obj, name)
+                setattr(obj, name, value)
+                self.assertNotEqual(self.pipeline.fingerprint(), fp)
+                setattr(obj, name, orig)
+                self.assertEqual(self.pipeline.fingerprint(), fp)
+        self.pipe.name = 'Renamed'
+        self.assertEqual(self.pipeline.fingerprint(), fp)
+
+    def test_memo(self):
+        """Test that repeated and reverted states return the kept results"""
+        calls = []
+        calc_system_head = self.pipeline.calc_system_head
+        self.pipeline.calc_system_head = lambda *args: calls.append(args) or calc_system_head(*args)
+        flow_list = self.pipeline.flow_list
+        qop = self.pipeline.find_operating_point(flow_list)
+        locs, heads, elevs = self.pipeline.hydraulic_gradient(qop)
+        curve = self.pipeline.system_curve(flow_list)
+        self.assertEqual(curve[0][10], self.pipeline.calc_system_head(flow_list[10])[0])
+        heads.append(0.0)
+        self.pipeline.slurry.Cv = 0.2
+        self.pipeline.update_slurries()
+        self.assertNotEqual(self.pipeline.find_operating_point(flow_list), qop)
+        n_calls = len(calls)
+        self.pipeline.slurry.Cv = 0.175
+        self.pipeline.update_slurries()
+        self.assertEqual(self.pipeline.find_operating_point(flow_list), qop)
+        self.assertEqual(self.pipeline.hydraulic_gradient(qop), (locs, heads[:-1], elevs))
+        self.assertEqual(self.pipeline.system_curve(flow_list), curve)
+        self.assertEqual(len(calls), n_calls)
+        flows = np.linspace(0.1, 1.5, 2000)
+        changed = flows.copy()
+        changed[1000] = 1.4
+        with self.subTest(msg='Test the memo is keyed on the content of long arrays'):
+            self.pipeline.calc_system_head = lambda Q: (Q, Q, Q, Q)
+            curve = self.pipeline.system_curve(flows)
+            self.assertNotEqual(self.pipeline.system_curve(changed)[0][1000], curve[0][1000])
+
+    def test_memo_size(self):
+        """Test that the memo is bounded and keeps the OperatingPointError"""
+        self.pipeline.memo_size = 2
+        flow_list = self.pipeline.flow_list
+        for Q in flow_list[:5]:
+            self.pipeline.hydraulic_gradient(Q)
+        self.assertEqual(len(self.pipeline._memo), 2)
+        self.pipe.elev_change = 500.0
+        for _ in range(2):
+            with self.subTest(msg='Test memoized OperatingPointError'):
+                self.assertRaises(OperatingPointError, self.pipeline.find_operating_point, flow_list)
+
+    def test_sensitivity(self):
+        """Test the sensitivity Jacobian against operating points of changed pipelines"""
+        fp = self.pipeline.fingerprint()
+        flow_list = self.pipeline.flow_list
+        names = ['Cv', 'D50', 'epsilon', 'musf', 'speed']
+        base, jacobian = self.pipeline.sensitivity(names)
+        self.assertEqual(jacobian.shape, (3, 5))
+        self.assertEqual(self.pipeline.fingerprint(), fp)
+        qop = self.pipeline.find_operating_point(flow_list)
+        self.assertAlmostEqual(base[0], qop)
+        self.assertAlmostEqual(base[2], self.pipeline.slurry.Cvi * qop * 3600)
+        for p in self.pipeline.pumps:
+            self.assertIs(p.slurry, self.pipeline.slurry)
+        Cv = self.pipeline.Cv
+        self.pipeline.Cv = Cv * 1.01
+        dQ_dCv = (self.pipeline.find_operating_point(flow_list) - qop) / (Cv * 0.01)
+        self.pipeline.Cv = Cv
+        self.assertAlmostEqual(jacobian[0, 0], dQ_dCv, delta=0.01 * abs(dQ_dCv))
+        for p in self.pipeline.pumps:
+            p.current_speed = p.design_speed * 0.99
+        dQ_dspeed = (qop - self.pipeline.find_operating_point(flow_list)) / 0.01
+        for p in self.pipeline.pumps:
+            p.current_speed = p.design_speed
+        self.assertAlmostEqual(jacobian[0, 4], dQ_dspeed, delta=0.001 * abs(dQ_dspeed))
+        _, forward = self.pipeline.sensitivity(names[:3], central=False)
+        for i, name in enumerate(names[:3]):
+            with self.subTest(msg=f'Test forward difference for {name}'):
+                self.assertAlmostEqual(forward[0, i], jacobian[0, i], delta=0.02 * abs(jacobian[0, i]))
+        _, parallel = self.pipeline.sensitivity(names, processes=2)
+        self.assertLess(abs(parallel - jacobian).max(), 1e-9 * abs(jacobian).max())
+        self.assertRaises(ValueError, self.pipeline.sensitivity, ['rhos'])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+"""Test the pipeline design optimizer"""
+
+from copy import copy
+import unittest
+
+from DHLLDV import PipelineDesign
+from DHLLDV.PipeObj import Pipe, Pipeline
+from tests.test_Pipe import Ladder_Pump600, Main_Pump500
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pipeline = Pipeline(name="test pipeline",
+                                 pipe_list=[Pipe('Entrance', 0.6, 0, 0.5, -4.0),
+                                            Pipe(diameter=0.6, length=10.0, total_K=0.1, elev_change=5.0),
+                                            Ladder_Pump600,
+                                            Pipe('MP Suction', 0.6, 25.0, 0.1, 0.0),
+                                            Main_Pump500,
+                                            Pipe('MP Discharge', 0.5, 20.0, 0.2, -1.0),
+                                            Pipe('Discharge', 0.5, 1000.0, 1.0, 1.0)])
+        self.pipeline.slurry.fluid = 'salt'
+        self.pipeline.update_slurries()
+
+    def test_build_candidate(self):
+        """Test the pipeline built for a candidate"""
+        candidate = PipelineDesign.DesignCandidate(0.55, 0.9, 2)
+        pipeline = PipelineDesign.build_candidate(self.pipeline, candidate, booster=Main_Pump500)
+        self.assertEqual(pipeline.num_pumps, 4)
+        self.assertAlmostEqual(pipeline.total_length, self.pipeline.total_length)
+        self.assertAlmostEqual(pipeline.total_lift, self.pipeline.total_lift)
+        self.assertEqual(sorted(pipeline.slurries), [0.55, 0.6])
+        for p in pipeline.pumps:
+            with self.subTest(msg=f'Test speed of {p.name}'):
+                self.assertAlmostEqual(p.current_speed, p.design_speed * 0.9)
+        self.assertEqual(Main_Pump500.current_speed, Main_Pump500.design_speed)
+        self.assertEqual(self.pipeline.num_pumps, 2)
+        booster = copy(Main_Pump500)
+        booster.current_impeller = 0.95 * booster.design_impeller
+        booster.max_driver_speed = 0.95 * booster.design_speed
+        pipeline = PipelineDesign.build_candidate(self.pipeline, candidate, booster=booster)
+        for p in pipeline.pumps[2:]:
+            with self.subTest(msg=f'Test the trimmed booster {p.name}'):
+                self.assertIsNot(p, booster)
+                self.assertEqual(p.current_impeller, booster.current_impeller)
+                self.assertEqual(p.max_driver_speed, booster.max_driver_speed)
+                self.assertEqual(p.driver_name, booster.driver_name)
+        self.assertEqual(booster.name, Main_Pump500.name)
+
+    def test_candidate_result(self):
+        """Test that a candidate result matches the operating point of the pipeline"""
+        best, results = PipelineDesign.optimize_design(self.pipeline, [0.5])
+        flow_list = [self.pipeline.pipesections[-1].flow(v) for v in self.pipeline.slurry.vls_list]
+        qop = self.pipeline.find_operating_point(flow_list)
+        self.assertEqual(len(results), 1)
+        self.assertAlmostEqual(results[0].flow, qop)
+        self.assertAlmostEqual(results[0].production, self.pipeline.slurry.Cvi * qop * 3600)
+        self.assertAlmostEqual(results[0].power, sum(p.point(qop)[2] for p in self.pipeline.pumps))
+
+    def test_optimize(self):
+        """Test that the best design is the feasible one with the most production or least specific energy"""
+        diameters = [0.45, 0.5, 0.6]
+        best, results = PipelineDesign.optimize_design(self.pipeline, diameters, [0.9, 1.0], [0, 1],
+                                                       booster=Main_Pump500)
+        self.assertEqual(len(results), 12)
+        feasible = [r for r in results if r.feasible]
+        self.assertTrue(feasible)
+        self.assertEqual(best.production, max(r.production for r in feasible))
+        best, _ = PipelineDesign.optimize_design(self.pipeline, diameters, [0.9, 1.0], [0, 1],
+                                                 booster=Main_Pump500, objective='specific_energy')
+        self.assertEqual(best.specific_energy, min(r.specific_energy for r in feasible))
+        for r in results:
+            with self.subTest(msg=f'Test LDV of {r.candidate}'):
+                if r.feasible:
+                    self.assertGreaterEqual(r.velocity, r.LDV)
+
+    def test_parallel(self):
+        """Test that the parallel evaluation gives the same results"""
+        _, serial = PipelineDesign.optimize_design(self.pipeline, [0.5, 0.6], [1.0], [0, 1], booster=Main_Pump500)
+        _, parallel = PipelineDesign.optimize_design(self.pipeline, [0.5, 0.6], [1.0], [0, 1],
+                                                     booster=Main_Pump500, processes=2)
+        for s, p in zip(serial, parallel):
+            with self.subTest(msg=f'Test parallel {s.candidate}'):
+                self.assertEqual(s.candidate, p.candidate)
+                self.assertAlmostEqual(s.flow, p.flow)
+
+    def test_optimize_speeds(self):
+        """Test that the minimum power speeds make the target flow with the least power"""
+        for Cv in [0.1, 0.25]:
+            self.pipeline.Cv = Cv
+            solution = PipelineDesign.optimize_speeds(self.pipeline, margin=0.25)
+            with self.subTest(msg=f'Test speeds at Cv {Cv}'):
+                self.assertTrue(solution.feasible, solution.message)
+                self.assertEqual([p.current_speed for p in self.pipeline.pumps],
+                                 [p.design_speed for p in self.pipeline.pumps])
+                full_power = sum(p.point(solution.flow)[2] for p in self.pipeline.pumps)
+                self.assertLess(solution.power, full_power)
+                for p, n in zip(self.pipeline.pumps, solution.speeds):
+                    p.current_speed = n
+                qop = self.pipeline.find_operating_point(self.pipeline.flow_list)
+                self.assertAlmostEqual(qop, solution.flow, places=5)
+                self.assertAlmostEqual(sum(p.point(qop)[2] for p in self.pipeline.pumps), solution.power, delta=1)
+                for Dp, s in self.pipeline.slurries.items():
+                    LDV = PipelineDesign.DHLLDV_framework.LDV(1, Dp, s.D50, s.epsilon, s.nu, s.rhol, s.rhos, Cv)
+                    self.assertGreaterEqual(Pipe(diameter=Dp).velocity(qop), LDV + 0.25 - 1e-4)
+                warm = PipelineDesign.optimize_speeds(self.pipeline, margin=0.25, n_start=solution.speeds)
+                self.assertAlmostEqual(warm.power, solution.power, places=3)
+                for p in self.pipeline.pumps:
+                    p.current_speed = p.design_speed
+
+    def test_optimize_speeds_infeasible(self):
+        """Test the speeds when the pumps cannot make the target flow"""
+        self.pipeline.Cv = 0.15
+        solution = PipelineDesign.optimize_speeds(self.pipeline, margin=0.25)
+        self.assertFalse(solution.feasible)
+        self.assertIn('system head', solution.message)
+        self.assertRaises(ValueError, PipelineDesign.optimize_speeds, Pipeline(pipe_list=[Pipe()]))
+
+    def test_unknown_objective(self):
+        self.assertRaises(ValueError, PipelineDesign.optimize_design, self.pipeline, [0.5], objective='profit')
+
+
+if __name__ == '__main__':
+    unittest.main()
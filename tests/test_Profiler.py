@@ -0,0 +1,80 @@
+"""Tests of the profiling hooks"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, homogeneous, Profiler
+from DHLLDV.SlurryObj import Slurry
+from Wilson import Wilson_V50
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.args = (0.762, 0.5/1000, DHLLDV_constants.steel_roughness, DHLLDV_constants.water_viscosity[20],
+                     DHLLDV_constants.water_density[20], 2.65, 0.175)
+        DHLLDV_framework.clear_caches()
+
+    def test_profiling(self):
+        """Test the call counts and the breakdown by caller"""
+        expected = [DHLLDV_framework.Cvt_Erhg(v, *self.args) for v in (2.0, 4.0, 6.0)]
+        DHLLDV_framework.clear_caches()
+        with Profiler.profiling() as prof:
+            result = [DHLLDV_framework.Cvt_Erhg(v, *self.args) for v in (2.0, 4.0, 6.0)]
+            DHLLDV_framework.Cvt_Erhg(2.0, *self.args)
+        self.assertEqual(result, expected)
+        self.assertEqual(prof.stats['DHLLDV_framework.Cvt_Erhg'][0], 4)
+        self.assertEqual(prof.callers[('<top>', 'DHLLDV_framework.Cvt_Erhg')][0], 4)
+        self.assertEqual(prof.callers[('DHLLDV_framework.Cvt_Erhg', 'DHLLDV_framework.Cvs_from_Cvt')][0], 3)
+        for name, (calls, total, self_time) in prof.stats.items():
+            with self.subTest(msg=f'Test the times of {name}'):
+                self.assertGreater(calls, 0)
+                self.assertLessEqual(self_time, total + 1e-9)
+        self.assertEqual(json.loads(json.dumps(prof.to_dict()))['stats'].keys(), prof.stats.keys())
+
+    def test_methods(self):
+        """Test the methods of the classes are profiled"""
+        with Profiler.profiling() as prof:
+            s = Slurry()
+            s.generate_curves()
+        self.assertEqual(prof.stats['SlurryObj.Slurry.generate_curves'][0], 1)
+        self.assertIn(('SlurryObj.Slurry.generate_curves', 'SlurryObj.Slurry.generate_Erhg_curves'), prof.callers)
+
+    def test_uninstall(self):
+        """Test the original functions are restored, including imported references, and nesting is an error"""
+        fluid_head_loss = homogeneous.fluid_head_loss
+        Cvt_Erhg = DHLLDV_framework.Cvt_Erhg
+        with Profiler.profiling():
+            self.assertIsNot(homogeneous.fluid_head_loss, fluid_head_loss)
+            self.assertIs(Wilson_V50.fluid_head_loss, homogeneous.fluid_head_loss)
+            self.assertTrue(hasattr(DHLLDV_framework.Cvt_Erhg, 'cache_clear'))
+            with self.assertRaises(RuntimeError):
+                with Profiler.profiling():
+                    pass
+        self.assertIs(homogeneous.fluid_head_loss, fluid_head_loss)
+        self.assertIs(Wilson_V50.fluid_head_loss, fluid_head_loss)
+        self.assertIs(DHLLDV_framework.Cvt_Erhg, Cvt_Erhg)
+
+    def test_chrome_trace(self):
+        """Test the Chrome trace export"""
+        with Profiler.profiling(trace=True) as prof:
+            DHLLDV_framework.LDV(None, *self.args)
+        with tempfile.TemporaryDirectory() as path:
+            fname = os.path.join(path, 'trace.json')
+            prof.write_chrome_trace(fname)
+            with open(fname) as f:
+                trace = json.load(f)
+        events = trace['traceEvents']
+        self.assertEqual(len(events), sum(s[0] for s in prof.stats.values()))
+        LDV = [e for e in events if e['name'] == 'DHLLDV_framework.LDV']
+        self.assertEqual(len(LDV), 1)
+        for e in events:
+            with self.subTest(msg=f'Test the event {e["name"]}'):
+                self.assertEqual(e['ph'], 'X')
+                self.assertGreaterEqual(e['ts'], LDV[0]['ts'])
+                self.assertLessEqual(e['ts'] + e['dur'], LDV[0]['ts'] + LDV[0]['dur'] + 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,15 @@
 
 Added by R. Ramsdell 14 September 2021"""
 
+from copy import copy
 import unittest
 
+import numpy as np
+import scipy.optimize
+
+from DHLLDV import SolverTelemetry
 from DHLLDV.DHLLDV_Utils import interpDict
-from DHLLDV.PumpObj import Pump
+from DHLLDV.PumpObj import Pump, PumpTrain
 from DHLLDV.DriverObj import Driver
 
 
@@ -90,6 +95,27 @@ class MyTestCase(unittest.TestCase):
         Q, H, P, N = self.pump.point(2.854054)
         self.assertAlmostEqual(Q, 2.854054, places=6)
 
+    def test_scaled_curves_follow_speed(self):
+        """Test the cached scaled curves are rebuilt when the speed or impeller changes"""
+        QH, QP = self.pump.scaled_curves
+        self.assertIs(QH, self.pump.scaled_curves[0])
+        self.pump.current_speed = 3.377719
+        self.assertIsNot(QH, self.pump.scaled_curves[0])
+        self.assertAlmostEqual(self.pump.scaled_curves[0][2.854054], 24.97872, places=3)
+        QH = self.pump.scaled_curves[0]
+        self.pump.current_impeller = 1.8
+        self.assertIsNot(QH, self.pump.scaled_curves[0])
+
+    def test_trimmed_impeller(self):
+        """Test the head and power at the current speed match the affinity laws with a trimmed impeller"""
+        self.pump.current_impeller = 1.8
+        ratio = 1.8 / 1.88
+        Q, H, P, N = self.pump.point(2.5)
+        with self.subTest(msg='Test the trimmed impeller head'):
+            self.assertAlmostEqual(H, self.pump.design_QH_curve[2.5 / ratio**2] * ratio**2 * self.pump.slurry.rhom)
+        with self.subTest(msg='Test the trimmed impeller power'):
+            self.assertAlmostEqual(P, self.pump.design_QP_curve[2.5 / ratio**2] * ratio**5 * self.pump.slurry.rhom)
+
     def test_power_power_limited(self):
         """Test the output point for the power limited case"""
         self.pump.limited = 'power'
@@ -97,9 +123,9 @@ class MyTestCase(unittest.TestCase):
         with self.subTest(msg='Test the power limited flow'):
             self.assertAlmostEqual(Q, 2.854054, places=6)
         with self.subTest(msg='Test the power limited power'):
-            self.assertAlmostEqual(P, 894.97, places=2)
+            self.assertAlmostEqual(P, 895.00, places=2)
         with self.subTest(msg='Test the power limited head'):
-            self.assertAlmostEqual(H, 25.131, places=3)
+            self.assertAlmostEqual(H, 25.1316, places=3)
 
     def test_power_torque_limited(self):
         """Test the output point for the power limited case"""
@@ -108,9 +134,24 @@ class MyTestCase(unittest.TestCase):
         with self.subTest(msg='Test the torque limited flow'):
             self.assertAlmostEqual(Q, 3.03243, places=6)
         with self.subTest(msg='Test the torque limited power'):
-            self.assertAlmostEqual(P, 805.0921, places=2)
+            self.assertAlmostEqual(P, 804.9788, places=2)
         with self.subTest(msg='Test the torque limited head'):
-            self.assertAlmostEqual(H, 20.928, places=3)
+            self.assertAlmostEqual(H, 20.925, places=3)
+
+    def test_torque_limited_tolerance(self):
+        """Test the torque limited speed solves to the given power tolerance"""
+        self.pump.limited = 'torque'
+        for tol in [0.1, 0.001, 1e-6]:
+            N = self.pump.find_torque_limited_speed(3.03243, tol=tol)
+            with self.subTest(msg=f'Test the torque limited power gap for tol={tol}'):
+                self.assertLess(abs(self.pump.power_available(N) - self.pump.power_required(3.03243, N)), tol)
+
+    def test_power_limited_low_flow(self):
+        """Test the power limited speed on the first segment of the power curve"""
+        self.pump.limited = 'power'
+        self.pump.avail_power = 200
+        N = self.pump.find_power_limited_speed(0.5)
+        self.assertAlmostEqual(self.pump.power_required(0.5, N), 200, places=3)
 
     def test_power_avail_power_limited(self):
         """Test the right result for the power limited case"""
@@ -146,6 +187,212 @@ class MyTestCase(unittest.TestCase):
         self.pump.limited = None
         self.assertAlmostEqual(self.pump.power_available(3.0), 1915.670989 * (3/3.5)**3 * self.pump.slurry.rhom+1)
 
+    def test_point_array(self):
+        """Test the vectorized point against the scalar point for each limit type"""
+        flows = [0.5, 1.5, 2.5, 2.854054, 3.03243, 4.0, 5.0]
+        driver = Driver("test driver", interpDict({0.5: 500.0,
+                                                   0.6: 600.0,
+                                                   0.75: 750.0,
+                                                   0.85: 825.0,
+                                                   0.95: 852.0,
+                                                   1.00: 895.0,
+                                                   }))
+        for limited in ['none', 'torque', 'power', 'curve']:
+            self.pump.limited = limited
+            if limited == 'curve':
+                self.pump.driver = driver
+                self.pump.gear_ratio = 1 / self.pump.design_speed
+            Qs, Hs, Ps, Ns = self.pump.point_array(flows)
+            for i, q in enumerate(flows):
+                Q, H, P, N = self.pump.point(q)
+                with self.subTest(msg=f'Test {limited} limited head at {q:0.3f}'):
+                    self.assertAlmostEqual(H, Hs[i], places=4)
+                with self.subTest(msg=f'Test {limited} limited power at {q:0.3f}'):
+                    self.assertAlmostEqual(P, Ps[i], places=2)
+                with self.subTest(msg=f'Test {limited} limited speed at {q:0.3f}'):
+                    self.assertAlmostEqual(N, Ns[i], places=4)
+
+    def test_head_derating(self):
+        """Test that the head is derated by the head ratio on slurry but not on water"""
+        derated = Pump(self.pump.name, self.pump.design_speed, self.pump.design_impeller, self.pump.suction_dia,
+                       self.pump.disch_dia, self.pump.design_QH_curve, self.pump.design_QP_curve,
+                       avail_power=self.pump.avail_power, limited='torque', head_derating='WACS3')
+        self.pump.limited = 'torque'
+        derated.slurry = self.pump.slurry
+        derated.slurry.Cv = 0.2
+        HR = derated.head_ratio()
+        self.assertTrue(0.8 < HR < 1.0)
+        for q in [1.0, 4.5]:
+            with self.subTest(msg=f'Test derated head at {q:0.3f}'):
+                self.assertAlmostEqual(derated.point(q)[1], self.pump.point(q)[1] * HR)
+                self.assertAlmostEqual(derated.point_array([q])[1][0], self.pump.point(q)[1] * HR)
+            with self.subTest(msg=f'Test derated power at {q:0.3f}'):
+                self.assertAlmostEqual(derated.point(q)[2], self.pump.point(q)[2])
+            with self.subTest(msg=f'Test water head at {q:0.3f}'):
+                self.assertAlmostEqual(derated.point(q, water=True)[1], self.pump.point(q, water=True)[1])
+        derated.slurry.Cv = 0.1
+        self.assertAlmostEqual(1 - derated.head_ratio(), (1 - HR) / 2)
+
+    def test_NPSHr(self):
+        """Test the NPSH required with the affinity laws"""
+        self.assertEqual(self.pump.NPSHr(2.0), 0)
+        self.pump.design_NPSHr_curve = interpDict({0.0: 2.0, 2.0: 4.0, 4.0: 8.0})
+        self.assertAlmostEqual(float(self.pump.NPSHr(2.0)), 4.0)
+        self.assertAlmostEqual(float(self.pump.NPSHr(1.0, self.pump.design_speed / 2)), 1.0)
+
+    def test_head(self):
+        """Test the head at a given speed, without the driver limits"""
+        self.pump.limited = 'None'
+        for q in [0.5, 2.957377, 4.5]:
+            for water in [False, True]:
+                with self.subTest(msg=f'Test head at {q:0.3f} water {water}'):
+                    self.assertAlmostEqual(self.pump.head(q, self.pump.current_speed, water),
+                                           self.pump.point(q, water)[1])
+        self.pump.current_speed = self.pump.design_speed * 0.8
+        H = self.pump.point(2.0)[1]
+        self.pump.current_speed = self.pump.design_speed
+        self.assertAlmostEqual(self.pump.head(2.0, self.pump.design_speed * 0.8), H)
+        self.assertEqual(self.pump.head(2.0, 0), 0)
+
+    def test_pump_train(self):
+        """Test the combined head of a pump train against the sum of the pumps"""
+        second = Pump("Second Pump", self.pump.design_speed, self.pump.design_impeller, self.pump.suction_dia,
+                      self.pump.disch_dia, self.pump.design_QH_curve, self.pump.design_QP_curve,
+                      avail_power=self.pump.avail_power, limited='torque', slurry=self.pump.slurry)
+        self.pump.limited = 'torque'
+        train = PumpTrain([self.pump, second], [0.5, 1.0, 2.0, 3.0, 4.0, 5.0])
+        for q in [0.5, 1.5, 2.957377, 4.5, 5.2]:
+            for water in [False, True]:
+                H = self.pump.point(q, water=water)[1] + second.point(q, water=water)[1]
+                with self.subTest(msg=f'Test train head at {q:0.3f} water {water}'):
+                    self.assertAlmostEqual(train.head(q, water=water), H, delta=0.001*H)
+
+    def test_pump_train_rebuild(self):
+        """Test that the pump train curves are rebuilt when a pump speed, gear ratio or driver curve changes"""
+        train = PumpTrain([self.pump], [0.5, 1.0, 2.0, 3.0, 4.0, 5.0])
+        heads = train.heads
+        self.assertIs(heads, train.heads)
+        self.pump.current_speed = 3.0
+        self.assertIsNot(heads, train.heads)
+        self.assertAlmostEqual(train.head(2.0), self.pump.point(2.0)[1], places=2)
+        self.pump.driver = Driver("test driver", interpDict({0.5: 500.0, 0.6: 600.0, 0.75: 750.0, 0.85: 825.0,
+                                                             0.95: 852.0, 1.00: 895.0}))
+        self.pump.gear_ratio = 1 / self.pump.design_speed
+        self.pump.limited = 'curve'
+        changes = [('gear ratio', 'gear_ratio', 0.95 / self.pump.design_speed),
+                   ('driver curve', 'driver', Driver("test driver", interpDict({0.5: 400.0, 0.6: 480.0, 0.75: 600.0,
+                                                                               0.85: 660.0, 0.95: 680.0,
+                                                                               1.00: 716.0})))]
+        for label, name, value in changes:
+            with self.subTest(msg=f'Test the train is rebuilt when the {label} changes'):
+                heads = train.heads
+                setattr(self.pump, name, value)
+                self.assertIsNot(heads, train.heads)
+                self.assertAlmostEqual(train.head(4.5), self.pump.point(4.5)[1], places=2)
+
+    def test_driver_speed_at_power(self):
+        """Test that speed_at_power inverts the driver power curve"""
+        for fit in [None, 'pchip']:
+            driver = Driver("test driver", interpDict({0.5: 500.0, 0.6: 600.0, 0.75: 750.0, 0.85: 825.0,
+                                                       0.95: 852.0, 1.00: 895.0}), curve_fit=fit)
+            speeds = [0.5, 0.55, 0.8, 0.97, 1.0]
+            powers = driver.power(speeds)
+            for n, p in zip(speeds, powers):
+                with self.subTest(msg=f'Test {fit} driver speed at {p:0.1f} kW'):
+                    self.assertAlmostEqual(driver.speed_at_power(p), n, places=4)
+                    self.assertAlmostEqual(driver.power(n), p)
+            self.assertRaises(IndexError, driver.speed_at_power, 900.0)
+
+    def test_curve_limited_bisection(self):
+        """Test that the curve limited speed matches a root found by brentq on the power gap"""
+        self.pump.driver = Driver("test driver", interpDict({0.5: 500.0, 0.6: 600.0, 0.75: 750.0, 0.85: 825.0,
+                                                             0.95: 852.0, 1.00: 895.0}))
+        self.pump.gear_ratio = 1 / self.pump.design_speed
+        self.pump.limited = 'curve'
+        for q in [3.0, 3.5, 4.0, 4.5, 5.0]:
+            with self.subTest(msg=f'Test curve limited speed at {q:0.3f}'):
+                speeds = self.pump.driver.speeds / self.pump.gear_ratio
+                gap = lambda n: self.pump.power_available(n) - self.pump.power_required(q, n)
+                if gap(speeds[-1]) >= 0:
+                    n = speeds[-1]
+                elif gap(speeds[0]) < 0:
+                    n = speeds[0]
+                else:
+                    n = scipy.optimize.brentq(gap, speeds[0], speeds[-1], xtol=1e-12)
+                self.assertAlmostEqual(self.pump.find_curve_limited_speed(q), n, places=5)
+
+    def test_curve_limited_minimum_speed(self):
+        """Test one warning for the flows where the curve limited pump is held at the minimum driver speed"""
+        self.pump.driver = Driver("test driver", interpDict({0.5: 500.0, 0.6: 600.0, 0.75: 750.0, 0.85: 825.0,
+                                                             0.95: 852.0, 1.00: 895.0}))
+        self.pump.gear_ratio = 1 / self.pump.design_speed
+        self.pump.limited = 'curve'
+        with self.assertWarnsRegex(RuntimeWarning, 'minimum driver speed for 7 of 11 flows') as w:
+            speeds = self.pump.find_limited_speed_array(np.linspace(3.0, 8.0, 11))
+        self.assertEqual(len(w.warnings), 1)
+        np.testing.assert_array_equal(speeds[4:], self.pump.driver.speeds[0] / self.pump.gear_ratio)
+
+    def test_smooth_curves(self):
+        """Test that a pump with smooth curves is close to the pump with linear interpolation"""
+        smooth = Pump(self.pump.name, self.pump.design_speed, self.pump.design_impeller, self.pump.suction_dia,
+                      self.pump.disch_dia, self.pump.design_QH_curve, self.pump.design_QP_curve,
+                      avail_power=self.pump.avail_power, limited='power', curve_fit='pchip')
+        smooth.slurry = self.pump.slurry
+        self.pump.limited = 'power'
+        for q in [1.0, 2.957377, 4.5]:
+            Q, H, P, N = self.pump.point(q)
+            Qs, Hs, Ps, Ns = smooth.point(q)
+            with self.subTest(msg=f'Test smooth head at {q:0.3f}'):
+                self.assertAlmostEqual(H, Hs, delta=0.03*H)
+            with self.subTest(msg=f'Test smooth speed at {q:0.3f}'):
+                self.assertAlmostEqual(N, Ns, delta=0.02*N)
+        with SolverTelemetry.recording() as records:
+            smooth.point(4.5)
+        self.assertEqual([(r.solver, r.stage, r.converged) for r in records],
+                         [('Pump.solve_limited_speed_smooth', 'power', True)])
+
+    def test_array_telemetry(self):
+        """Test the records of the vectorized speed solvers, and that telemetry does not change the results"""
+        self.pump.limited = 'power'
+        flows = np.linspace(3.0, 4.5, 7)
+        off = self.pump.solve_limited_speed(4.5, 0.0, self.pump.avail_power, max_steps=0)
+        with SolverTelemetry.recording() as records:
+            self.assertEqual(self.pump.solve_limited_speed(4.5, 0.0, self.pump.avail_power, max_steps=0), off)
+        self.assertEqual([(r.solver, r.iterations, r.converged) for r in records],
+                         [('Pump.solve_limited_speed', 0, False)])
+        curve_pump = copy(self.pump)
+        curve_pump.driver = Driver("test driver", interpDict({0.5: 500.0, 0.6: 600.0, 0.75: 750.0, 0.85: 825.0,
+                                                              0.95: 852.0, 1.00: 895.0}))
+        curve_pump.gear_ratio = 1 / curve_pump.design_speed
+        curve_pump.limited = 'curve'
+        for pump, solver in [(self.pump, 'Pump.solve_limited_speed_array'),
+                             (curve_pump, 'Pump.find_curve_limited_speed_array')]:
+            with self.subTest(msg=f'Test the {solver} record'):
+                speeds = pump.find_limited_speed_array(flows)
+                with SolverTelemetry.recording() as records:
+                    np.testing.assert_array_equal(pump.find_limited_speed_array(flows), speeds)
+                    pump.find_limited_speed_array(flows, max_steps=1, tol=1e-9)
+                self.assertEqual([r.solver for r in records], [solver, solver])
+                self.assertTrue(records[0].converged)
+                self.assertEqual(records[0].unconverged, 0)
+                self.assertGreater(records[0].iterations, 0)
+                self.assertFalse(records[1].converged)
+                self.assertGreater(records[1].unconverged, 0)
+                self.assertGreater(records[1].residual, 1e-9)
+
+    def test_head_slope(self):
+        """Test the analytic head slope against a finite difference, including the limited range"""
+        for limited in ['none', 'torque', 'power']:
+            pump = Pump(self.pump.name, self.pump.design_speed, self.pump.design_impeller, self.pump.suction_dia,
+                        self.pump.disch_dia, self.pump.design_QH_curve, self.pump.design_QP_curve,
+                        avail_power=self.pump.avail_power, limited=limited, curve_fit='pchip')
+            pump.slurry = self.pump.slurry
+            for q in [1.0, 3.5, 4.5]:
+                d = 1e-5
+                fd = (pump.point(q + d)[1] - pump.point(q - d)[1]) / (2 * d)
+                with self.subTest(msg=f'Test {limited} limited head slope at {q:0.3f}'):
+                    self.assertAlmostEqual(pump.head_slope(q), fd, places=3)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -66,6 +66,14 @@ class Test(unittest.TestCase):
         vls = self.slurry.vls_list[42]
         self.assertEqual(self.slurry.im(vls), self.slurry.im_curves['graded_Cvt_im'][42])
 
+    def test_im_array(self):
+        """Test the vectorized im against the im at each velocity"""
+        vls = self.slurry.vls_list[5::20]
+        im = self.slurry.im_array(vls)
+        for v, im_v in zip(vls, im):
+            with self.subTest(msg=f'Test im at {v:0.2f} m/sec'):
+                self.assertAlmostEqual(im_v, self.slurry.im(v), places=12)
+
     # Test all the setters and getters and auto-updating of curves
     def test_fluid(self):
         self.assertEqual(self.slurry.fluid, 'fresh')
@@ -160,6 +168,21 @@ class Test(unittest.TestCase):
         s = SlurryObj.Slurry(name=new_name)
         self.assertEqual(s.name, new_name)
 
+    def test_fingerprint(self):
+        """Test that the fingerprint follows the slurry parameters, but not the name"""
+        s = SlurryObj.Slurry(name='Other')
+        s.fluid = 'fresh'
+        s.Dp = 0.5
+        self.assertEqual(s.fingerprint(), self.slurry.fingerprint())
+        s.D50 = 0.5/1000
+        self.assertNotEqual(s.fingerprint(), self.slurry.fingerprint())
+        self.slurry.D50 = 0.5/1000
+        self.assertEqual(s.fingerprint(), self.slurry.fingerprint())
+        s.Cv = 0.2
+        self.assertNotEqual(s.fingerprint(), self.slurry.fingerprint())
+        s.Cv = self.slurry.Cv
+        self.assertEqual(s.fingerprint(), self.slurry.fingerprint())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+"""Tests of the solver settings presets"""
+
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, ModelOptions, SolverSettings, stratified
+from Wilson import Wilson_V50
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.args = (0.762, 0.5/1000, DHLLDV_constants.steel_roughness, DHLLDV_constants.water_viscosity[20],
+                     DHLLDV_constants.water_density[20], 2.65, 0.175)
+        DHLLDV_framework.clear_caches()
+
+    def test_resolve(self):
+        """Test the presets, the overrides and the errors"""
+        self.assertIs(SolverSettings.resolve(), SolverSettings.current())
+        self.assertEqual(SolverSettings.resolve('default'), SolverSettings.Settings())
+        s = SolverSettings.resolve('reference', LDV_max_steps=20)
+        self.assertEqual(s.LDV_max_steps, 20)
+        self.assertEqual(s.LDV_rtol, SolverSettings.presets['reference'].LDV_rtol)
+        self.assertIs(SolverSettings.resolve(s), s)
+        with self.assertRaises(ValueError):
+            SolverSettings.resolve('fast')
+        with self.assertRaises(ValueError):
+            SolverSettings.resolve(LDV_tol=0.1)
+
+    def test_context(self):
+        """Test that solver_settings sets the current settings and restores them, the caches are keyed on them"""
+        default = DHLLDV_framework.Cvt_Erhg(4.0, *self.args)
+        with DHLLDV_framework.solver_settings('interactive', pump_tol=0.01) as s:
+            self.assertIs(SolverSettings.current(), s)
+            self.assertEqual(s.pump_tol, 0.01)
+            interactive = DHLLDV_framework.Cvt_Erhg(4.0, *self.args)
+            self.assertEqual(DHLLDV_framework.Cvt_Erhg.cache_info().currsize, 2)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                other = executor.submit(lambda: (SolverSettings.current(), DHLLDV_framework.Cvt_Erhg(4.0, *self.args)))
+                self.assertEqual(other.result(), (SolverSettings.presets['default'], default))
+        self.assertIs(SolverSettings.current(), SolverSettings.presets['default'])
+        self.assertNotEqual(interactive, default)
+        self.assertAlmostEqual(interactive, default, places=3)
+        self.assertEqual(DHLLDV_framework.Cvt_Erhg(4.0, *self.args), default)
+        self.assertEqual(DHLLDV_framework.Cvt_Erhg.cache_info().currsize, 2)
+        V50_args = (*self.args[:2], 2*self.args[1], *self.args[2:-1])
+        with DHLLDV_framework.solver_settings('interactive'):
+            interactive = Wilson_V50.V50(*V50_args)
+        self.assertEqual(Wilson_V50.V50(*V50_args, settings='interactive'), interactive)
+        Wilson_V50.V50(*V50_args)
+        self.assertEqual(Wilson_V50.V50.cache_info().currsize, 2)
+
+    def test_accuracy(self):
+        """Test the presets are close to the reference, and the per call settings"""
+        for name in ('interactive', 'default'):
+            with self.subTest(msg=f'Test the {name} preset'):
+                reference = DHLLDV_framework.LDV(None, *self.args, settings='reference')
+                self.assertAlmostEqual(DHLLDV_framework.LDV(None, *self.args, settings=name) / reference, 1.0,
+                                       places=3)
+                reference = stratified.vls_FBSB(*self.args, settings='reference')
+                self.assertAlmostEqual(stratified.vls_FBSB(*self.args, settings=name) / reference, 1.0, places=2)
+                reference = Wilson_V50.V50(*self.args[:2], 2*self.args[1], *self.args[2:-1], settings='reference')
+                self.assertAlmostEqual(Wilson_V50.V50(*self.args[:2], 2*self.args[1], *self.args[2:-1],
+                                                      settings=name) / reference, 1.0, places=3)
+        self.assertEqual(DHLLDV_framework.LDV(None, *self.args, max_steps=5, settings='interactive'),
+                         DHLLDV_framework.LDV(None, *self.args, settings='interactive'))
+
+
+    def test_FBSB_rtol(self):
+        """Test the vls_FBSB tolerance is relative to the musf of the options"""
+        for musf in (0.3, 0.415, 0.6):
+            with self.subTest(msg=f'Test vls_FBSB with musf={musf}'):
+                options = ModelOptions.resolve(musf=musf)
+                vls = stratified.vls_FBSB(*self.args, options=options)
+                Erhg = stratified.fb_Erhg(vls, *self.args, options=options)
+                self.assertLess(abs(Erhg - musf), SolverSettings.current().FBSB_rtol * musf)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests of the solver telemetry records"""
+
+import unittest
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework, SolverTelemetry, stratified
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.args = (0.762, 0.5/1000, DHLLDV_constants.steel_roughness, DHLLDV_constants.water_viscosity[20],
+                     DHLLDV_constants.water_density[20], 2.65, 0.175)
+        DHLLDV_framework.clear_caches()
+
+    def test_off(self):
+        """Test that nothing is recorded by default"""
+        self.assertFalse(SolverTelemetry.enabled)
+        DHLLDV_framework.LDV(None, *self.args)
+        self.assertEqual(SolverTelemetry.records, [])
+
+    def test_recording(self):
+        """Test the records of the LDV stages and vls_FBSB"""
+        with SolverTelemetry.recording() as records:
+            LDV = DHLLDV_framework.LDV(None, *self.args, max_steps=25)
+            stratified.vls_FBSB(*self.args)
+        self.assertFalse(SolverTelemetry.enabled)
+        self.assertEqual(LDV, DHLLDV_framework.LDV(None, *self.args, max_steps=25))
+        names = [r.name for r in records]
+        self.assertEqual(names, ['LDV very small', 'LDV small', 'LDV large', 'LDV lower limit', 'vls_FBSB'])
+        for r in records:
+            with self.subTest(msg=f'Test the {r.name} record'):
+                self.assertTrue(r.converged)
+                self.assertLess(r.residual, 0.001)
+                self.assertGreaterEqual(r.wall_time, 0.0)
+                self.assertGreater(r.iterations, 0)
+
+    def test_not_converged(self):
+        """Test that stopping at max_steps is recorded as not converged"""
+        with SolverTelemetry.recording() as records:
+            DHLLDV_framework.LDV(None, *self.args, max_steps=1)
+        for r in records:
+            with self.subTest(msg=f'Test the {r.name} record'):
+                self.assertEqual(r.iterations, 1)
+                self.assertFalse(r.converged)
+
+    def test_summary(self):
+        """Test the summary and histogram, and nested recordings"""
+        Cv_list = [0.1, 0.2, 0.3]
+        with SolverTelemetry.recording() as outer:
+            with SolverTelemetry.recording() as records:
+                for Cv in Cv_list:
+                    DHLLDV_framework.LDV(None, *self.args[:-1], Cv, max_steps=3)
+            self.assertTrue(SolverTelemetry.enabled)
+            DHLLDV_framework.LDV(None, *self.args)
+        self.assertEqual(len(outer), 4)
+        summary = SolverTelemetry.summary(records)
+        self.assertEqual(set(summary), {'LDV very small', 'LDV small', 'LDV large', 'LDV lower limit'})
+        for name, s in summary.items():
+            with self.subTest(msg=f'Test the {name} summary'):
+                self.assertEqual(s['calls'], len(Cv_list))
+                self.assertEqual(s['unconverged_elements'], 0)
+                self.assertEqual(sum(s['iterations'].values()), len(Cv_list))
+                self.assertLessEqual(max(s['iterations']), 3)
+                self.assertAlmostEqual(s['mean_time'] * len(Cv_list), s['total_time'])
+        counts, _ = SolverTelemetry.histogram(records, 'LDV small', 'iterations', bins=3)
+        self.assertEqual(sum(counts), len(Cv_list))
+
+
+if __name__ == '__main__':
+    unittest.main()
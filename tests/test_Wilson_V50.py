@@ -4,8 +4,12 @@ Slurry Transport Using Centrifugal Pumps, 2nd ed.,
 by Wilson, Addie, Sellgren and Clift (WASC2)"""
 
 import unittest
+
+import numpy as np
+
 import Wilson.Wilson_V50
 import DHLLDV.DHLLDV_constants
+import DHLLDV.SolverTelemetry
 
 
 class MyTestCase(unittest.TestCase):
@@ -47,6 +51,34 @@ class MyTestCase(unittest.TestCase):
                                                        self.rhos, 0.2, self.musf)
         self.assertAlmostEqual(im, 0.0612, places=1)
 
+    def test_V50_array(self):
+        """Test the vectorized V50 against the scalar version over pipe and particle diameters"""
+        Dp, d50 = np.meshgrid([0.15, 0.3, 0.65, 1.0], [0.1/1000, 0.3/1000, 0.7/1000, 2.0/1000])
+        v50 = Wilson.Wilson_V50.V50_array(Dp, d50, 2*d50, self.epsilon, self.nu, self.rhol, self.rhos)
+        self.assertEqual(v50.shape, Dp.shape)
+        for D, d, v in zip(Dp.flat, d50.flat, v50.flat):
+            with self.subTest(msg=f'Test V50 array Dp={D} d50={d}'):
+                self.assertAlmostEqual(v, Wilson.Wilson_V50.V50(D, d, 2*d, self.epsilon, self.nu, self.rhol,
+                                                                self.rhos), places=10)
+        with DHLLDV.SolverTelemetry.recording() as records:
+            Wilson.Wilson_V50.V50_array(Dp, d50, 2*d50, self.epsilon, self.nu, self.rhol, self.rhos)
+            Wilson.Wilson_V50.V50_array(Dp, d50, 2*d50, self.epsilon, self.nu, self.rhol, self.rhos, max_steps=1)
+        self.assertEqual([(r.solver, r.converged, r.unconverged == 0) for r in records],
+                         [('V50_array', True, True), ('V50_array', False, False)])
+        self.assertEqual(records[1].iterations, 1)
+
+    def test_head_loss_array(self):
+        """Test the Erhg and head loss over an array of velocities against the scalar version"""
+        vls = np.linspace(1.0, 8.0, 15)
+        args = (0.65, 0.7/1000, 1.0/1000, self.epsilon, self.nu, self.rhol, self.rhos)
+        Erhg = Wilson.Wilson_V50.Erhg(vls, *args, self.musf)
+        im = Wilson.Wilson_V50.heterogeneous_head_loss(vls, *args, 0.2, self.musf)
+        for i, v in enumerate(vls):
+            with self.subTest(msg=f'Test head loss array at {v:0.2f}'):
+                self.assertAlmostEqual(Erhg[i], Wilson.Wilson_V50.Erhg(v, *args, self.musf), places=12)
+                self.assertAlmostEqual(im[i], Wilson.Wilson_V50.heterogeneous_head_loss(v, *args, 0.2, self.musf),
+                                       places=12)
+
 
 if __name__ == '__main__':
     unittest.main()
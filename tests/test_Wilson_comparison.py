@@ -0,0 +1,87 @@
+"""Tests of the comparison of the DHLLDV and Wilson models on a grid"""
+
+import unittest
+
+import numpy as np
+
+from DHLLDV import DHLLDV_constants, DHLLDV_framework
+from DHLLDV.homogeneous import fluid_head_loss
+from Wilson import Wilson_comparison, Wilson_Stratified, Wilson_V50
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fluid = {'epsilon': DHLLDV_constants.steel_roughness,
+                      'nu': 1.003e-06,
+                      'rhol': 0.9982,
+                      'rhos': 2.65,
+                      'musf': 0.4}
+        self.grid = Wilson_comparison.make_grid(Dp=[0.5, 0.762], d50=[0.3/1000, 0.7/1000], Cv=[0.1, 0.2],
+                                                vls=[2.0, 4.0, 6.0])
+
+    def test_make_grid(self):
+        """Test the grid columns"""
+        self.assertEqual(set(self.grid), set(Wilson_comparison.grid_columns))
+        for name, col in self.grid.items():
+            with self.subTest(msg=f'Test grid column {name}'):
+                self.assertEqual(len(col), 2 * 2 * 2 * 3)
+        np.testing.assert_allclose(self.grid['d85'], self.grid['d50'] * 1.5)
+        grid = Wilson_comparison.make_grid(Dp=[0.5], d50=[0.7/1000], Cv=[0.1], vls=[2.0, 4.0], d85=[1/1000, 2/1000])
+        self.assertEqual(list(grid['d85']), [1/1000, 1/1000, 2/1000, 2/1000])
+
+    def test_compare(self):
+        """Test the model results against the scalar model functions"""
+        result = Wilson_comparison.compare(self.grid, reference='DHLLDV', chunk_size=5, **self.fluid)
+        f = self.fluid
+        Rsd = (f['rhos'] - f['rhol'])/f['rhol']
+        for i in range(len(self.grid['vls'])):
+            Dp, d50, d85, Cv, vls = (float(self.grid[n][i]) for n in Wilson_comparison.grid_columns)
+            il = fluid_head_loss(vls, Dp, f['epsilon'], f['nu'], f['rhol'])
+            expected = {'DHLLDV': DHLLDV_framework.Cvt_Erhg(vls, Dp, d50, f['epsilon'], f['nu'], f['rhol'],
+                                                            f['rhos'], Cv),
+                        'Wilson stratified': Wilson_Stratified.Erhg(vls, Dp, d50, f['epsilon'], f['nu'], f['rhol'],
+                                                                    f['rhos'], f['musf'], Cv),
+                        'Wilson V50': Wilson_V50.Erhg(vls, Dp, d50, d85, f['epsilon'], f['nu'], f['rhol'],
+                                                      f['rhos'], f['musf'])}
+            expected['Wilson'] = min(expected['Wilson stratified'], expected['Wilson V50'])
+            with self.subTest(msg=f'Test comparison row {i}'):
+                self.assertAlmostEqual(result['il'][i], il, places=12)
+                for name, Erhg in expected.items():
+                    self.assertAlmostEqual(result[name][i], Erhg, places=10)
+                    self.assertAlmostEqual(result[f'{name} im'][i], il + Rsd * Cv * Erhg, places=10)
+                    if name != 'DHLLDV':
+                        self.assertAlmostEqual(result[f'{name} - DHLLDV'][i], Erhg - expected['DHLLDV'], places=10)
+        fluid = {k: v for k, v in self.fluid.items() if k != 'musf'}
+        default = Wilson_comparison.compare(self.grid, ['Wilson', 'DHLLDV'], **fluid)
+        with self.subTest(msg='Test the Wilson models default to their own musf'):
+            np.testing.assert_allclose(default['Wilson'], result['Wilson'])
+            np.testing.assert_allclose(default['DHLLDV'], result['DHLLDV'])
+
+    def test_parallel(self):
+        """Test that the parallel comparison matches the serial comparison"""
+        serial = Wilson_comparison.compare(self.grid, ['Wilson', 'DHLLDV'], **self.fluid)
+        parallel = Wilson_comparison.compare(self.grid, ['Wilson', 'DHLLDV'], chunk_size=7, processes=2,
+                                             **self.fluid)
+        self.assertEqual(set(serial), set(parallel))
+        self.assertIn('DHLLDV - Wilson', serial)
+        for name in serial:
+            with self.subTest(msg=f'Test parallel column {name}'):
+                np.testing.assert_allclose(parallel[name], serial[name])
+
+    def test_register_model(self):
+        """Test a registered model, and an unknown model"""
+        @Wilson_comparison.register_model('Test fluid')
+        def fluid_Erhg(columns, terms, fluid):
+            return np.zeros_like(terms['il'])
+        try:
+            result = Wilson_comparison.compare(self.grid, ['Test fluid', 'Wilson V50'], **self.fluid)
+            np.testing.assert_allclose(result['Test fluid im'], result['il'])
+            np.testing.assert_allclose(result['Wilson V50 - Test fluid'], result['Wilson V50'])
+        finally:
+            del Wilson_comparison.models['Test fluid']
+        with self.assertRaises(ValueError):
+            Wilson_comparison.compare(self.grid, ['Test fluid'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Tests of the Wilson framework, the lesser of the stratified and V50 models"""
+
+import unittest
+
+import numpy as np
+
+from DHLLDV import DHLLDV_constants
+from Wilson import Wilson_framework, Wilson_Stratified, Wilson_V50
+
+
+class MyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.epsilon = DHLLDV_constants.steel_roughness
+        self.nu = 1.003e-06
+        self.rhol = 0.9982
+        self.rhos = 2.65
+        self.GSD = {0.15: 0.5/1000, 0.50: 0.7/1000, 0.85: 1.0/1000}
+
+    def test_get_dx(self):
+        """Test the grain sizes from a GSD, and a single grain size"""
+        self.assertEqual(Wilson_framework.get_dx(self.GSD, 0.85), 1.0/1000)
+        self.assertAlmostEqual(Wilson_framework.get_dx({0.15: 0.001, 0.85: 0.004}, 0.5), 0.002)
+        self.assertEqual(Wilson_framework.get_dx(0.7/1000, 0.85), 0.7/1000)
+
+    def test_lesser(self):
+        """Test that the framework takes the lesser of the two models at each point"""
+        vls = np.linspace(1.0, 10.0, 19)
+        Erhg_obj = Wilson_framework.Erhg(vls, 0.65, self.GSD, self.epsilon, self.nu, self.rhol, self.rhos, 0.2,
+                                         get_dict=True)
+        self.assertEqual(set(Erhg_obj['regime']), {'Stratified', 'V50'})
+        for i, v in enumerate(vls):
+            stratified = Wilson_Stratified.Erhg(v, 0.65, 0.7/1000, self.epsilon, self.nu, self.rhol, self.rhos,
+                                                0.4, 0.2)
+            V50 = Wilson_V50.Erhg(v, 0.65, 0.7/1000, 1.0/1000, self.epsilon, self.nu, self.rhol, self.rhos, 0.4)
+            with self.subTest(msg=f'Test Wilson framework at {v:0.2f}'):
+                self.assertAlmostEqual(Erhg_obj['Erhg'][i], min(stratified, V50), places=12)
+                self.assertEqual(Erhg_obj['regime'][i], 'Stratified' if stratified <= V50 else 'V50')
+
+    def test_head_loss(self):
+        """Test the head and pressure loss over velocity and concentration arrays"""
+        vls = np.linspace(1.0, 10.0, 10)[:, np.newaxis]
+        Cvt = np.array([0.1, 0.2, 0.3])
+        args = (vls, 0.65, self.GSD, self.epsilon, self.nu, self.rhol, self.rhos, Cvt)
+        im = Wilson_framework.head_loss(*args)
+        self.assertEqual(im.shape, (10, 3))
+        Erhg_obj = Wilson_framework.Erhg(*args, get_dict=True)
+        Rsd = (self.rhos - self.rhol)/self.rhol
+        np.testing.assert_allclose(im, Erhg_obj['il'] + Rsd*Cvt*Erhg_obj['Erhg'])
+        np.testing.assert_allclose(Wilson_framework.pressure_loss(*args), im*DHLLDV_constants.gravity*self.rhol)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,9 @@ by Wilson, Addie, Sellgren and Clift (WASC2)"""
 
 import unittest
 
+import numpy as np
+
+from DHLLDV import DHLLDV_constants
 from Wilson import Wilson_Stratified
 
 
@@ -61,6 +64,26 @@ class MyTestCase(unittest.TestCase):
                                                        0.0714)
         self.assertAlmostEqual(p, 553./1000, delta=.015)
 
+    def test_head_loss_array(self):
+        """Test the stratified Erhg and losses over velocity and concentration arrays against the scalar version"""
+        vls = np.linspace(1.0, 8.0, 8)
+        Cvt = np.array([0.05, 0.15, 0.3, 0.45])
+        epsilon = DHLLDV_constants.steel_roughness
+        for Dp, d in [(0.5, 0.5/1000), (0.15, 2.0/1000), (1.0, 10.0/1000)]:
+            args = (Dp, d, epsilon, 1.003e-06, 0.9982, 2.65, 0.4)
+            Erhg = Wilson_Stratified.Erhg(vls[:, np.newaxis], *args, Cvt)
+            im = Wilson_Stratified.stratified_head_loss(vls[:, np.newaxis], *args, Cvt)
+            dp = Wilson_Stratified.stratified_pressure_loss(vls[:, np.newaxis], *args, Cvt)
+            self.assertEqual(im.shape, (8, 4))
+            for i, v in enumerate(vls):
+                for j, c in enumerate(Cvt):
+                    with self.subTest(msg=f'Test stratified arrays Dp={Dp} d={d} vls={v} Cvt={c}'):
+                        self.assertAlmostEqual(Erhg[i, j], Wilson_Stratified.Erhg(v, *args, c), places=12)
+                        self.assertAlmostEqual(im[i, j], Wilson_Stratified.stratified_head_loss(v, *args, c),
+                                               places=12)
+                        self.assertAlmostEqual(dp[i, j], Wilson_Stratified.stratified_pressure_loss(v, *args, c),
+                                               places=12)
+
 
 if __name__ == '__main__':
     unittest.main()
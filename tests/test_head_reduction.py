@@ -0,0 +1,51 @@
+"""Test the pump head reduction from the WACS tables"""
+
+import unittest
+
+import numpy as np
+
+from DHLLDV import head_reduction
+
+
+class MyTestCase(unittest.TestCase):
+    def test_grid_points(self):
+        """Test that the table points are returned at Cv = 0.15 and Ss = 2.65"""
+        cases = [('WACS2', 0.001, 0.3, 0.12806),
+                 ('WACS2', 0.0002, 0.7, 0.02696),
+                 ('WACS3', 0.001, 0.89, 0.0743052),
+                 ('WACS3', 0.0001, 2.52, 0.00592414)]
+        for table, d, imp, hr in cases:
+            with self.subTest(msg=f'Test {table} Hr at d={d*1000:0.1f} mm, impeller {imp:0.2f} m'):
+                self.assertAlmostEqual(float(head_reduction.Hr(d, 0.15, imp, 2.65, table)), hr, places=6)
+
+    def test_scaling(self):
+        """Test the concentration and solids density scaling"""
+        hr15 = float(head_reduction.Hr15(0.0005, 0.6))
+        self.assertAlmostEqual(float(head_reduction.Hr(0.0005, 0.3, 0.6, 2.65)), 2 * hr15)
+        self.assertAlmostEqual(float(head_reduction.Hr(0.0005, 0.15, 0.6, 5.3)), 2 * hr15)
+        self.assertAlmostEqual(float(head_reduction.head_ratio(0.0005, 0.15, 0.6)), 1 - hr15)
+
+    def test_interpolation(self):
+        """Test that the interpolation lies between the neighbouring table points"""
+        low = float(head_reduction.Hr15(0.001, 0.3))
+        high = float(head_reduction.Hr15(0.002, 0.3))
+        mid = float(head_reduction.Hr15(0.0015, 0.3))
+        self.assertTrue(low < mid < high)
+
+    def test_array(self):
+        """Test the vectorized lookup against the scalar lookup"""
+        d50 = np.array([0.0001, 0.0003, 0.001, 0.01])
+        cv = np.array([0.1, 0.15, 0.2, 0.3])
+        hrs = head_reduction.Hr(d50[:, np.newaxis], cv[np.newaxis, :], 0.8)
+        for i, d in enumerate(d50):
+            for j, c in enumerate(cv):
+                with self.subTest(msg=f'Test array Hr at d={d*1000:0.1f} mm, Cv={c:0.2f}'):
+                    self.assertAlmostEqual(hrs[i, j], float(head_reduction.Hr(d, c, 0.8)))
+
+    def test_unknown_table(self):
+        """Test an unknown table name"""
+        self.assertRaises(ValueError, head_reduction.Hr, 0.001, 0.15, 0.6, 2.65, 'WACS4')
+
+
+if __name__ == '__main__':
+    unittest.main()
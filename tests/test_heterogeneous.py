@@ -5,6 +5,8 @@ Created on Feb 22, 2015
 """
 import unittest
 
+import numpy as np
+
 from DHLLDV import heterogeneous
 from DHLLDV import DHLLDV_constants
 
@@ -80,6 +82,24 @@ class Test(unittest.TestCase):
         self.assertAlmostEqual(heterogeneous.heterogeneous_head_loss(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=False, use_sqrtcx=False)*10, 0.0531630*10)
         self.assertAlmostEqual(heterogeneous.heterogeneous_pressure_loss(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs, use_sf=False, use_sqrtcx=False), 0.5204125)
 
+    def test_Erhg_array(self):
+        """Test the vectorized Erhg against the scalar version, and nan where the scalar is complex"""
+        Dp = 0.5
+        epsilon = DHLLDV_constants.steel_roughness
+        nu = 0.001005/(0.9982*1000)
+        rhol = DHLLDV_constants.water_density[20]
+        vls = [1.0, 3.0, 6.0]
+        for d in [0.2/1000, 10./1000]:
+            for use_sqrtcx in [False, True]:
+                Erhg = heterogeneous.Erhg_array(vls, Dp, d, epsilon, nu, rhol, 2.65, [0.1, 0.2, 0.3],
+                                                use_sqrtcx=use_sqrtcx)
+                for v, Cvs, Erhg_v in zip(vls, [0.1, 0.2, 0.3], Erhg):
+                    with self.subTest(msg=f'Test heterogeneous Erhg of {d*1000} mm at {v} m/sec, '
+                                          f'use_sqrtcx={use_sqrtcx}'):
+                        self.assertAlmostEqual(Erhg_v, heterogeneous.Erhg(v, Dp, d, epsilon, nu, rhol, 2.65, Cvs,
+                                                                          use_sqrtcx=use_sqrtcx), places=12)
+        self.assertTrue(np.isnan(heterogeneous.Erhg_array(vls, Dp, 10./1000, epsilon, nu, rhol, 2.65, 0.6)).all())
+
 
 if __name__ == "__main__":
     unittest.main()
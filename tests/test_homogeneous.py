@@ -102,7 +102,17 @@ class Test(unittest.TestCase):
                                0.011876232*10)
         self.assertAlmostEqual(homogeneous.fluid_pressure_loss(vls, Dp, epsilon, nu, rhol),
                                0.011876232*g*rhol)
-    
+
+    def test_fluid_head_loss_array(self):
+        """Test the vectorized fluid head loss against the scalar version, including laminar flow"""
+        epsilon = DHLLDV_constants.steel_roughness
+        nu = DHLLDV_constants.water_viscosity[20]
+        vls = [0.001, 0.004, 0.5, 3.0, 8.0]
+        il = homogeneous.fluid_head_loss_array(vls, 0.5, epsilon, nu)
+        for v, il_v in zip(vls, il):
+            with self.subTest(msg=f'Test fluid head loss at {v} m/sec'):
+                self.assertAlmostEqual(il_v, homogeneous.fluid_head_loss(v, 0.5, epsilon, nu), places=12)
+
     def test_Erhg_med_sand(self):
         vls = 3.0
         Dp = 0.5
@@ -127,6 +137,19 @@ class Test(unittest.TestCase):
                                0.00465260820521)
         self.assertAlmostEqual(homogeneous.Erhg(vls, Dp, d, epsilon, nu, rhol, rhos, Cvs), 0.0302993)
 
+    def test_Erhg_array(self):
+        """Test the vectorized Erhg against the scalar version, with and without sliding flow"""
+        epsilon = DHLLDV_constants.steel_roughness
+        rhol = DHLLDV_constants.water_density[20]
+        nu = DHLLDV_constants.water_viscosity[20]
+        vls = [0.5, 1.5, 3.0, 6.0]
+        for d in [0.4/1000, 8.0/1000]:
+            Erhg = homogeneous.Erhg_array(vls, 0.5, d, epsilon, nu, rhol, 2.65, 0.25)
+            for v, Erhg_v in zip(vls, Erhg):
+                with self.subTest(msg=f'Test homogeneous Erhg of {d*1000} mm at {v} m/sec'):
+                    self.assertAlmostEqual(Erhg_v, homogeneous.Erhg(v, 0.5, d, epsilon, nu, rhol, 2.65, 0.25),
+                                           places=12)
+
 
 if __name__ == "__main__":
     unittest.main()
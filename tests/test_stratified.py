@@ -82,6 +82,21 @@ class Test(unittest.TestCase):
                                0.20994945, places=4)
         self.assertAlmostEqual(stratified.fb_Erhg(vls, Dp, d, epsilon, nu_l, rho_l, rho_s, Cvs),
                                1.19697717, places=4)
+
+    def test_fb_Erhg_array(self):
+        """Test the vectorized fixed bed Erhg against the scalar version, for arrays of vls and Cvs"""
+        Dp = 0.5
+        epsilon = DHLLDV_constants.steel_roughness
+        nu_l = DHLLDV_constants.water_viscosity[20]
+        rho_l = DHLLDV_constants.water_density[20]
+        vls = [0.5, 1.5, 3.0, 6.0]
+        Cvs = [0.05, 0.1, 0.3, 0.5]
+        for d in [0.3/1000, 0.3]:
+            Erhg = stratified.fb_Erhg_array(vls, Dp, d, epsilon, nu_l, rho_l, 2.65, Cvs)
+            for v, c, Erhg_v in zip(vls, Cvs, Erhg):
+                with self.subTest(msg=f'Test fixed bed Erhg of {d*1000} mm at {v} m/sec, Cvs {c}'):
+                    self.assertAlmostEqual(Erhg_v, stratified.fb_Erhg(v, Dp, d, epsilon, nu_l, rho_l, 2.65, c),
+                                           places=10)
         
     def test_sliding_bed_pressure_loss(self):
         vls = 3.0
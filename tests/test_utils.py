@@ -4,6 +4,7 @@ Created on Oct 23, 2014
 @author: RCRamsdell
 """
 
+import pickle
 import unittest
 
 from DHLLDV import DHLLDV_Utils
@@ -44,6 +45,49 @@ class TestInterpDict(unittest.TestCase):
         t1 = DHLLDV_Utils.interpDict((1, 20), (2, 30), (3, 50), extrapolate_low=True)
         self.assertEqual(t1[0.5], 15)
 
+    def test_interp_array(self):
+        t1 = DHLLDV_Utils.interpDict((1, 20), (2, 30), (3, 50), extrapolate_high=True)
+        for x, y in zip([1, 1.5, 2, 2.5, 3, 3.5], t1.interp([1, 1.5, 2, 2.5, 3, 3.5])):
+            with self.subTest(msg=f'Test interp at {x}'):
+                self.assertAlmostEqual(y, t1[x])
+
+    def test_interp_array_out_of_range(self):
+        t1 = DHLLDV_Utils.interpDict((1, 20), (2, 30), (3, 50))
+        self.assertRaises(IndexError, t1.interp, [0.5, 2.0])
+
+    def test_smooth_through_points(self):
+        t1 = DHLLDV_Utils.smoothCurve((1, 20), (2, 30), (3, 50), (4, 60))
+        for x in [1, 2, 3, 4]:
+            with self.subTest(msg=f'Test pchip at {x}'):
+                self.assertAlmostEqual(t1[x], dict.__getitem__(t1, x))
+
+    def test_smooth_derivative(self):
+        for fit in ['pchip', 'poly']:
+            t1 = DHLLDV_Utils.smoothCurve((1, 20), (2, 30), (3, 50), (4, 60), fit=fit, extrapolate_high=True)
+            for x in [1.5, 2.5, 3.9, 4.5]:
+                with self.subTest(msg=f'Test {fit} derivative at {x}'):
+                    d = 1e-6
+                    self.assertAlmostEqual(float(t1.derivative(x)), (t1[x+d] - t1[x-d])/(2*d), places=4)
+
+    def test_smooth_out_of_range(self):
+        t1 = DHLLDV_Utils.smoothCurve((1, 20), (2, 30), (3, 50), fit='poly', degree=2)
+        self.assertRaises(IndexError, t1.__getitem__, 60)
+
+    def test_smooth_unknown_fit(self):
+        self.assertRaises(ValueError, DHLLDV_Utils.smoothCurve, (1, 20), (2, 30), (3, 50), fit='spline')
+
+    def test_pickle(self):
+        """Test that curves survive pickling with their settings, for parallel processes"""
+        for t1 in (DHLLDV_Utils.interpDict((1, 20), (2, 30), (3, 50), extrapolate_high=True),
+                   DHLLDV_Utils.smoothCurve((1, 20), (2, 30), (3, 50), fit='poly', degree=2,
+                                                         extrapolate_high=True)):
+            with self.subTest(msg=f'Test pickle of {t1.__class__.__name__}'):
+                t2 = pickle.loads(pickle.dumps(t1))
+                self.assertIs(type(t2), type(t1))
+                self.assertEqual(dict(t2), dict(t1))
+                self.assertEqual(t2.settings(), t1.settings())
+                self.assertAlmostEqual(t2[3.5], t1[3.5])
+
 
 if __name__ == "__main__":
     unittest.main()